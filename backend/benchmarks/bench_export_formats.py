@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark MOM export: one Markdown parse, then a renderer per format
+
+Reports the cost of parsing a MOM into the Markdown AST (cold and from the
+parse cache) and of rendering that AST to each download format, in
+milliseconds and KB of output per second. Uses the given Markdown file, or
+a generated MOM when none is passed.
+
+Usage:
+    python benchmarks/bench_export_formats.py [--mom FILE] [--items 50] [--repeats 20]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Tuple
+
+# Add backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.file_converter import DOCX_AVAILABLE, FileConverter
+from services.markdown_ast import MarkdownParser, parse_markdown_uncached
+
+
+def make_sample_mom(items: int) -> str:
+    """Build a MOM in the layout the model produces, with ``items`` rows per section"""
+    lines = [
+        "# Minutes of Meeting",
+        "",
+        "**Date:** 30-Sep-2025  **Time:** 10:00 IST  **Venue:** Conference Room 4",
+        "",
+        "## Attendees",
+        "| # | Name | Role | Present |",
+        "|---|------|------|---------|",
+    ]
+    lines += [f"| {n} | Attendee {n} | **Engineer** | Yes |" for n in range(1, items + 1)]
+    lines += ["", "## Discussion"]
+    lines += [f"- Point {n} about the *quarterly* roadmap and [ticket {n}](https://example.com/{n})" for n in range(1, items + 1)]
+    lines += ["", "## Action Items", "| # | Action | Owner | Due |", "|---|--------|-------|-----|"]
+    lines += [f"| {n} | Follow up on item {n} | Owner {n} | 15-Oct-2025 |" for n in range(1, items + 1)]
+    lines += ["", "## Next Steps"]
+    lines += [f"{n}. Step {n} with **bold** detail" for n in range(1, items + 1)]
+    return "\n".join(lines) + "\n"
+
+
+def best_of(repeats: int, fn: Callable[[], object]) -> Tuple[float, object]:
+    """Best wall time over several runs, with the last result"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MOM parsing and per-format rendering")
+    parser.add_argument("--mom", help="Markdown file to export (default: generated MOM)")
+    parser.add_argument("--items", type=int, default=50, help="Rows per section in the generated MOM")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per measurement")
+    args = parser.parse_args()
+
+    if args.mom:
+        with open(args.mom, encoding="utf-8") as mom_file:
+            content = mom_file.read()
+    else:
+        content = make_sample_mom(args.items)
+
+    print(f"MOM: {len(content) / 1024:.1f} KB, {content.count(chr(10))} lines")
+    print(f"{'step':<22} {'ms':>9} {'out KB':>9} {'KB/s':>10}")
+
+    parse_seconds, document = best_of(args.repeats, lambda: parse_markdown_uncached(content))
+    print(f"{'parse (cold)':<22} {parse_seconds * 1000:>9.2f} {'':>9} {len(content) / 1024 / parse_seconds:>10.0f}")
+
+    cached_parser = MarkdownParser(cache_size=1)
+    cached_parser.parse(content)
+    cached_seconds, _ = best_of(args.repeats, lambda: cached_parser.parse(content))
+    print(f"{'parse (cached)':<22} {cached_seconds * 1000:>9.2f}")
+
+    renderers = [("txt", lambda: FileConverter.render_txt(document).encode("utf-8"))]
+    if DOCX_AVAILABLE:
+        renderers.append(("docx", lambda: FileConverter.render_docx(document).getvalue()))
+
+    for name, render in renderers:
+        seconds, output = best_of(args.repeats, render)
+        kilobytes = len(output) / 1024
+        print(f"{'render ' + name:<22} {seconds * 1000:>9.2f} {kilobytes:>9.1f} {kilobytes / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,32 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import mimetypes
 import os
+import re
 from dotenv import load_dotenv
 import uvicorn
 
 from services.gemini_service import GeminiService
 from services.file_converter import FileConverter
-from models.requests import TextProcessRequest, ImageProcessRequest, DownloadRequest
+from services.markdown_ast import markdown_parser
+from services.mom_store import MOM_MEDIA_TYPES
+from services.token_budget import BudgetExceededError
+from services.admission import AdmissionRejected, PRIORITY_FILES, PRIORITY_INTERACTIVE
+from services.job_queue import JobQueue, JOB_KIND_FILES, JOB_KIND_TEXT
+from services.batch_runner import BatchRunner
+from services.errors import error_status
+from models.requests import TextProcessRequest, ImageProcessRequest, JobRequest, BatchRequest, DownloadRequest
 from utils.timezone_helper import TimezoneHelper
+from utils.sse import format_sse
+from utils.ndjson import format_ndjson
+from utils.http_cache import RangeNotSatisfiable, etag_matches, parse_range
+from utils.compression import RequestDecompressionMiddleware, ResponseCompressionMiddleware
+from utils.metrics import MetricsMiddleware, metrics_payload, record_error
+from utils.tracing import TracingMiddleware, tracing
+from utils.profiling import ProfilingMiddleware, run_sync
 
 # Load environment variables
 load_dotenv()
@@ -44,8 +60,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# On-demand CPU and memory profiles of single requests (X-Profile-Token)
+app.add_middleware(ProfilingMiddleware)
+
+# gzip/zstd request bodies in, compressed responses out
+app.add_middleware(RequestDecompressionMiddleware)
+app.add_middleware(ResponseCompressionMiddleware)
+
+# Outside the compression layers, so request timing and input bytes cover decompression and the whole response
+app.add_middleware(MetricsMiddleware)
+
+# Outermost: server span per request, continuing the frontend's traceparent; stages become child spans
+app.add_middleware(TracingMiddleware)
+
 # Initialize services
 gemini_service = GeminiService()
+job_queue = JobQueue(gemini_service)
+batch_runner = BatchRunner(gemini_service)
+
+@app.on_event("startup")
+async def start_extraction_pool():
+    gemini_service.extraction_pool.warm_up()
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_extraction_pool():
+    gemini_service.extraction_pool.shutdown()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    tracing.shutdown()
 
 @app.get("/")
 async def root():
@@ -59,6 +110,39 @@ async def health_check():
         "service": "MOM Builder Free Backend"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latency histograms, tokens, cache lookups and errors by endpoint"""
+    payload = metrics_payload()
+    if payload is None:
+        raise HTTPException(status_code=503, detail="Metrics require prometheus-client: pip install prometheus-client")
+    
+    # Passed as a header, since Starlette would append a second charset to the media type
+    body, content_type = payload
+    return Response(body, headers={"Content-Type": content_type})
+
+@app.get("/api/stats")
+async def service_stats():
+    """Runtime statistics for the processing pipeline"""
+    return {
+        "extraction_pool": gemini_service.extraction_pool.stats(),
+        "extraction_cache": gemini_service.extraction_pool.cache.stats(),
+        "result_cache": gemini_service.result_cache.stats(),
+        "prompt_cache": gemini_service.prompt_cache.stats(),
+        "image_preprocessing": gemini_service.image_preprocessor.stats(),
+        "admission": gemini_service.admission.stats(),
+        "jobs": job_queue.stats(),
+        "markdown_parse_cache": markdown_parser.stats(),
+        "mom_store": gemini_service.mom_store.stats(),
+        "structured_output": gemini_service.structured.stats()
+    }
+
+def _http_exception(error: Exception, context: str) -> HTTPException:
+    """The HTTPException a failed generation maps to (see services.errors.error_status)"""
+    failure = error_status(error, context)
+    headers = {"Retry-After": str(failure.retry_after)} if failure.retry_after is not None else None
+    return HTTPException(status_code=failure.status, detail=failure.detail, headers=headers)
+
 @app.post("/api/process-text")
 async def process_text(request: TextProcessRequest):
     """Process text input and generate MOM"""
@@ -66,14 +150,19 @@ async def process_text(request: TextProcessRequest):
         if not request.text or not request.text.strip():
             raise HTTPException(status_code=400, detail="Text input is required")
         
-        result = await gemini_service.generate_mom_from_text(request.text)
+        with gemini_service.admission.request_context(PRIORITY_INTERACTIVE) as ticket:
+            result = await gemini_service.generate_mom_from_text(request.text)
+        result["queue_wait_ms"] = ticket.wait_ms
         
         return {
             "success": True,
             "data": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process text: {str(e)}")
+        record_error(e)
+        raise _http_exception(e, "Failed to process text")
 
 @app.post("/api/process-images")
 async def process_files(request: ImageProcessRequest):
@@ -94,7 +183,51 @@ async def process_files(request: ImageProcessRequest):
             if not file_data.startswith('data:'):
                 raise HTTPException(status_code=400, detail=f"Invalid file format at index {i}")
         
-        result = await gemini_service.generate_mom_from_files(request.images)
+        with gemini_service.admission.request_context(PRIORITY_FILES) as ticket:
+            result = await gemini_service.generate_mom_from_files(request.images)
+        result["queue_wait_ms"] = ticket.wait_ms
+        
+        return {
+            "success": True,
+            "data": result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error(e)
+        raise _http_exception(e, "Failed to process files")
+
+def _upload_mime_type(upload: UploadFile) -> str:
+    """Mime type of an uploaded file, guessed from its name when the client sent none"""
+    mime_type = upload.content_type
+    if not mime_type or mime_type == 'application/octet-stream':
+        mime_type = mimetypes.guess_type(upload.filename or '')[0] or 'application/octet-stream'
+    return mime_type
+
+@app.post("/api/process-files")
+async def process_uploaded_files(files: List[UploadFile] = File(...)):
+    """Process multipart file uploads (images, PDFs, DOCX, TXT) and generate MOM
+    
+    Each part is spooled to a temporary file while the body is parsed, so the
+    extractors read from file handles instead of one large base64 JSON payload.
+    """
+    try:
+        if not files or len(files) == 0:
+            raise HTTPException(status_code=400, detail="At least one file is required")
+        
+        if len(files) > 10:
+            raise HTTPException(status_code=400, detail="Maximum 10 files allowed")
+        
+        uploads = []
+        for i, upload in enumerate(files):
+            if not upload.filename and not upload.size:
+                raise HTTPException(status_code=400, detail=f"Invalid file data at index {i}")
+            
+            uploads.append((_upload_mime_type(upload), upload.file))
+        
+        with gemini_service.admission.request_context(PRIORITY_FILES) as ticket:
+            result = await gemini_service.generate_mom_from_uploads(uploads)
+        result["queue_wait_ms"] = ticket.wait_ms
         
         return {
             "success": True,
@@ -103,7 +236,141 @@ async def process_files(request: ImageProcessRequest):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process files: {str(e)}")
+        record_error(e)
+        raise _http_exception(e, "Failed to process files")
+    finally:
+        for upload in files or []:
+            await upload.close()
+
+# Headers that keep proxies from buffering streamed responses (SSE and NDJSON)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _check_admission():
+    """Reject a streaming request up front, before the 200 response starts, when the queue is full"""
+    try:
+        gemini_service.admission.check()
+    except AdmissionRejected as e:
+        raise _http_exception(e, "Failed to generate MOM")
+
+async def _sse_stream(events, priority: str, files: Optional[List[UploadFile]] = None):
+    """Serialize MOM generation events as SSE, reporting failures as an error event"""
+    try:
+        with gemini_service.admission.request_context(priority) as ticket:
+            async for event in events:
+                if event["event"] == "done":
+                    event["data"]["queue_wait_ms"] = ticket.wait_ms
+                yield format_sse(event["event"], event["data"])
+    except BudgetExceededError as e:
+        record_error(e)
+        yield format_sse("error", {"detail": str(e), "budget": e.budget})
+    except AdmissionRejected as e:
+        record_error(e)
+        yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        record_error(e)
+        yield format_sse("error", {"detail": f"Failed to generate MOM: {str(e)}"})
+    finally:
+        for upload in files or []:
+            await upload.close()
+
+@app.post("/api/process-text/stream")
+async def process_text_stream(request: TextProcessRequest):
+    """Process text input and stream the MOM as Server-Sent Events"""
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text input is required")
+    
+    _check_admission()
+    
+    return StreamingResponse(
+        _sse_stream(gemini_service.stream_mom_from_text(request.text), PRIORITY_INTERACTIVE),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.post("/api/process-files/stream")
+async def process_files_stream(files: List[UploadFile] = File(...)):
+    """Process multipart file uploads and stream the MOM as Server-Sent Events"""
+    if not files or len(files) == 0:
+        raise HTTPException(status_code=400, detail="At least one file is required")
+    
+    if len(files) > 10:
+        raise HTTPException(status_code=400, detail="Maximum 10 files allowed")
+    
+    _check_admission()
+    
+    uploads = [(_upload_mime_type(upload), upload.file) for upload in files]
+    
+    return StreamingResponse(
+        _sse_stream(gemini_service.stream_mom_from_uploads(uploads), PRIORITY_FILES, files),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """Queue MOM generation for text or files (base64 data URLs) and return the job id immediately"""
+    if bool(request.text and request.text.strip()) == bool(request.images):
+        raise HTTPException(status_code=400, detail="Provide either text or images")
+    
+    if request.images:
+        if len(request.images) > 10:
+            raise HTTPException(status_code=400, detail="Maximum 10 files allowed")
+        
+        for i, file_data in enumerate(request.images):
+            if not isinstance(file_data, str) or not file_data.startswith('data:'):
+                raise HTTPException(status_code=400, detail=f"Invalid file format at index {i}")
+    
+    try:
+        if request.images:
+            job = await job_queue.submit(JOB_KIND_FILES, request.images)
+        else:
+            job = await job_queue.submit(JOB_KIND_TEXT, request.text)
+    except AdmissionRejected as e:
+        raise _http_exception(e, "Failed to queue job")
+    
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "data": job},
+        headers={"Location": f"/api/jobs/{job['id']}"}
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, stage timings (ms) and, once finished, the result or error of a job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "success": True,
+        "data": job
+    }
+
+async def _ndjson_stream(records):
+    """Serialize batch records as NDJSON"""
+    async for record in records:
+        yield format_ndjson(record)
+
+@app.post("/api/batch")
+async def process_batch(request: BatchRequest):
+    """Generate MOMs for many meetings and stream each result as an NDJSON line when it finishes
+    
+    Every item is either ``{"text": ...}`` or ``{"images": [...]}`` with an
+    optional ``id`` echoed back. Failed items produce an error line with the
+    HTTP status the single-item endpoint would have returned; a final
+    ``summary`` line reports the totals.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    
+    if len(request.items) > batch_runner.max_items:
+        raise HTTPException(status_code=400, detail=f"Maximum {batch_runner.max_items} items allowed")
+    
+    return StreamingResponse(
+        _ndjson_stream(batch_runner.run(request.items)),
+        media_type="application/x-ndjson",
+        headers=SSE_HEADERS
+    )
 
 @app.post("/api/download-mom/{format}")
 async def download_mom(format: str, request: DownloadRequest):
@@ -130,7 +397,8 @@ async def download_mom(format: str, request: DownloadRequest):
         elif format == 'docx':
             # Convert to DOCX
             try:
-                docx_io = FileConverter.markdown_to_docx(request.content)
+                # Rendering takes tens of milliseconds, keep it off the event loop
+                docx_io = await run_sync(FileConverter.markdown_to_docx, request.content)
                 
                 return StreamingResponse(
                     iter([docx_io.getvalue()]),
@@ -147,6 +415,50 @@ async def download_mom(format: str, request: DownloadRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to convert to {format}: {str(e)}")
 
+@app.get("/api/mom/{mom_id}.{format}")
+async def get_mom(mom_id: str, format: str, request: Request, filename: Optional[str] = None):
+    """Download a generated MOM by its mom_id as md, txt or docx
+    
+    Rendered files are cached. Responses carry a strong ETag, answer a
+    matching If-None-Match with 304 and honour a single byte Range.
+    """
+    if format not in MOM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format. Supported formats: md, txt, docx")
+    
+    try:
+        # DOCX rendering takes tens of milliseconds, keep it off the event loop
+        artifact = await run_sync(gemini_service.mom_store.artifact, mom_id, format)
+    except ImportError as ie:
+        raise HTTPException(status_code=500, detail=f"Missing dependency: {str(ie)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to convert to {format}: {str(e)}")
+    
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="MOM not found or expired")
+    
+    body, etag = artifact
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    name = re.sub(r'[^\w\s-]', '', filename or '').strip() or "mom"
+    headers["Content-Disposition"] = f'attachment; filename="{name}.{format}"'
+    
+    # A Range only applies if the client's partial copy is still current
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), len(body))
+        except RangeNotSatisfiable as e:
+            return Response(status_code=416, headers={**headers, "Content-Range": str(e)})
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+        return Response(body[start:end + 1], status_code=206, media_type=MOM_MEDIA_TYPES[format], headers=headers)
+    
+    return Response(body, media_type=MOM_MEDIA_TYPES[format], headers=headers)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
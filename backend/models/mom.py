@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class Attendee(BaseModel):
+    name: str
+    role: Optional[str] = None
+
+class Decision(BaseModel):
+    decision: str
+    owner: Optional[str] = None
+    effective_date: Optional[str] = None
+
+class ActionItem(BaseModel):
+    action: str
+    owner: str = "TBD"
+    due_date: str = "TBD"
+    status: str = "Open"
+
+class Risk(BaseModel):
+    risk: str
+    mitigation: Optional[str] = None
+
+class OpenQuestion(BaseModel):
+    fragment: str
+    needed: Optional[str] = None
+
+class MeetingMinutes(BaseModel):
+    title: str
+    date: str = "TBD"
+    time: str = "TBD"
+    mode: str = "TBD"
+    location: Optional[str] = None
+    attendees: List[Attendee] = []
+    absent: List[str] = []
+    agenda: List[str] = []
+    discussion_points: List[str] = []
+    decisions: List[Decision] = []
+    action_items: List[ActionItem] = []
+    risks: List[Risk] = []
+    next_steps: List[str] = []
+    next_meeting: Optional[str] = None
+    open_questions: List[OpenQuestion] = []
+
+class MomDocument(BaseModel):
+    meetings: List[MeetingMinutes] = []
+    # Set instead of meetings when the input could not be read
+    message: Optional[str] = None
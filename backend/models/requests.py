@@ -7,6 +7,18 @@ class TextProcessRequest(BaseModel):
 class ImageProcessRequest(BaseModel):
     images: List[str]
 
+class JobRequest(BaseModel):
+    text: Optional[str] = None
+    images: Optional[List[str]] = None
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    text: Optional[str] = None
+    images: Optional[List[str]] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
 class DownloadRequest(BaseModel):
     content: str
     filename: Optional[str] = None
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from utils.stage_timer import stage
+
+# Priority classes, highest first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_FILES = "files"
+PRIORITY_BATCH = "batch"
+PRIORITIES = [PRIORITY_INTERACTIVE, PRIORITY_FILES, PRIORITY_BATCH]
+
+# Weighted round robin: out of every 7 freed slots, interactive gets 4, files 2, batch 1
+SCHEDULE_WEIGHTS = {PRIORITY_INTERACTIVE: 4, PRIORITY_FILES: 2, PRIORITY_BATCH: 1}
+
+
+class AdmissionRejected(Exception):
+    """Raised when the Gemini admission queue is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """Per-request record of the priority class and time spent queued"""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.wait_seconds = 0.0
+        self.admissions = 0
+
+    @property
+    def wait_ms(self) -> int:
+        return int(self.wait_seconds * 1000)
+
+
+_current_ticket: contextvars.ContextVar[Optional[AdmissionTicket]] = contextvars.ContextVar("admission_ticket", default=None)
+
+
+class AdmissionScheduler:
+    """Caps concurrent Gemini calls and schedules waiting calls by priority class
+
+    At most ``GEMINI_MAX_CONCURRENCY`` calls run at once. Further calls wait in
+    per-class queues; freed slots are handed out by weighted round robin so
+    interactive text requests go first without starving multi-file or batch
+    work. When ``GEMINI_MAX_QUEUE`` calls are already waiting, new calls are
+    rejected immediately with a Retry-After estimate.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("GEMINI_MAX_QUEUE", 64))
+
+        self._active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self._schedule: List[str] = [priority for priority in PRIORITIES for _ in range(SCHEDULE_WEIGHTS[priority])]
+        self._schedule_position = 0
+
+        self._average_call_seconds = 10.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @contextmanager
+    def request_context(self, priority: str) -> Iterator[AdmissionTicket]:
+        """Tag the Gemini calls made within this block with a priority class"""
+        ticket = AdmissionTicket(priority)
+        token = _current_ticket.set(ticket)
+        try:
+            yield ticket
+        finally:
+            _current_ticket.reset(token)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one Gemini concurrency slot for the duration of the block"""
+        ticket = _current_ticket.get()
+        priority = ticket.priority if ticket else PRIORITY_INTERACTIVE
+        started = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._queued():
+            self._active += 1
+        else:
+            self.check()
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[priority].append(waiter)
+            try:
+                # The releasing call hands its slot over, so _active is unchanged here
+                with stage("queue"):
+                    await waiter
+            except asyncio.CancelledError:
+                if waiter in self._queues[priority]:
+                    self._queues[priority].remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+
+        admitted_at = time.monotonic()
+        self.admitted += 1
+        if ticket:
+            ticket.wait_seconds += admitted_at - started
+            ticket.admissions += 1
+
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - admitted_at
+            self._average_call_seconds = 0.9 * self._average_call_seconds + 0.1 * elapsed
+            self._release()
+
+    def check(self) -> None:
+        """Raise AdmissionRejected now if a new call would find the queue full"""
+        if self._active >= self.max_concurrency and self._queued() >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Server is busy, please retry shortly", self._retry_after())
+
+    def _release(self) -> None:
+        """Give a freed slot to the next waiter, or return it to the pool"""
+        for _ in range(len(self._schedule)):
+            priority = self._schedule[self._schedule_position]
+            self._schedule_position = (self._schedule_position + 1) % len(self._schedule)
+            queue = self._queues[priority]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._active -= 1
+
+    def _queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain"""
+        backlog = self._queued() + self._active
+        return max(1, math.ceil(backlog * self._average_call_seconds / self.max_concurrency))
+
+    def stats(self) -> Dict[str, object]:
+        """Return slot usage and queue lengths per priority class"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .admission import PRIORITY_BATCH
+from .errors import error_status
+from utils.metrics import record_error
+
+
+class BatchRunner:
+    """Generates MOMs for many meetings with bounded concurrency
+
+    Items run in the ``batch`` admission class, at most ``BATCH_CONCURRENCY``
+    at a time. Each item's outcome is yielded as soon as it finishes, in
+    completion order, so one slow or failing meeting does not hold back or
+    fail the rest.
+    """
+
+    def __init__(self, gemini_service: Any, concurrency: Optional[int] = None):
+        self.gemini_service = gemini_service
+        self.concurrency = max(1, concurrency or int(os.getenv("BATCH_CONCURRENCY", 4)))
+        self.max_items = int(os.getenv("BATCH_MAX_ITEMS", 500))
+
+    async def run(self, items: List[Any]) -> AsyncIterator[Dict]:
+        """Yield one record per item as it completes, then a summary record"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def run_item(index: int, item: Any) -> None:
+            async with semaphore:
+                record = await self._run_item(index, item)
+            finished.put_nowait(record)
+
+        tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+        succeeded = 0
+        try:
+            for _ in range(len(tasks)):
+                record = await finished.get()
+                if record["success"]:
+                    succeeded += 1
+                yield record
+        finally:
+            # Stop outstanding work when the client goes away
+            for task in tasks:
+                task.cancel()
+
+        yield {"summary": {"items": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}}
+
+    async def _run_item(self, index: int, item: Any) -> Dict:
+        """Generate one MOM and describe the outcome, mapping errors to the HTTP status the API would use"""
+        record: Dict[str, Any] = {"index": index, "id": item.id}
+
+        with self.gemini_service.admission.request_context(PRIORITY_BATCH) as ticket:
+            try:
+                if item.text and item.text.strip() and not item.images:
+                    result = await self.gemini_service.generate_mom_from_text(item.text)
+                elif item.images and not item.text:
+                    if len(item.images) > 10:
+                        raise ValueError("Maximum 10 files allowed")
+                    if not all(isinstance(data, str) and data.startswith("data:") for data in item.images):
+                        raise ValueError("Invalid file format")
+                    result = await self.gemini_service.generate_mom_from_files(item.images)
+                else:
+                    raise ValueError("Provide either text or images")
+
+                result["queue_wait_ms"] = ticket.wait_ms
+                record.update(success=True, data=result)
+            except Exception as e:
+                record_error(e)
+                failure = error_status(e)
+                record.update(success=False, status=failure.status, error=failure.detail)
+                if failure.retry_after is not None:
+                    record["retry_after"] = failure.retry_after
+
+        return record
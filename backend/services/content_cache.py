@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.metrics import record_cache
+
+# Disk tier bound (bytes); 0 disables pruning
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest used as a content-addressed cache key"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the in-memory size of a cached value in bytes"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    return 16
+
+
+class ContentCache:
+    """Content-addressed cache with an in-memory LRU tier and an optional disk tier
+
+    The memory tier evicts least recently used entries once the total size of
+    the cached values exceeds ``max_bytes``. When ``disk_dir`` is set, entries
+    are also written there as JSON files so they survive restarts. Values must
+    be JSON serializable. With ``ttl_seconds`` set, entries older than the TTL
+    are treated as misses in both tiers, and expired files are deleted when
+    read. Once the disk tier grows past ``disk_max_bytes``, a write prunes it:
+    expired files go first, then the oldest, until it is back under 90% of
+    the bound. Code running on the event loop uses ``get_async`` and
+    ``set_async``, which do the disk I/O in a thread.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        name: Optional[str] = None,
+        disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        # 0 leaves the disk tier unbounded
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds or None
+        # Label for hit/miss metrics; unnamed caches are not reported
+        self.name = name
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._disk_lock = threading.Lock()
+        # Bytes on disk, counted by a directory scan on the first write
+        self._disk_bytes: Optional[int] = None
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(
+        cls,
+        prefix: str,
+        default_max_bytes: int = 64 * 1024 * 1024,
+        default_ttl_seconds: Optional[float] = None,
+    ) -> "ContentCache":
+        """Build a cache from ``<prefix>_MAX_BYTES``, ``<prefix>_DIR``, ``<prefix>_DISK_MAX_BYTES`` and ``<prefix>_TTL_SECONDS``"""
+        max_bytes = int(os.getenv(f"{prefix}_MAX_BYTES", default_max_bytes))
+        disk_dir = os.getenv(f"{prefix}_DIR") or None
+        disk_max_bytes = int(os.getenv(f"{prefix}_DISK_MAX_BYTES", DEFAULT_DISK_MAX_BYTES))
+        ttl_seconds = os.getenv(f"{prefix}_TTL_SECONDS")
+        ttl = float(ttl_seconds) if ttl_seconds else default_ttl_seconds
+        return cls(
+            max_bytes=max_bytes,
+            disk_dir=disk_dir,
+            ttl_seconds=ttl,
+            name=prefix.lower(),
+            disk_max_bytes=disk_max_bytes,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for a key, or None on a miss"""
+        value = self._get_memory(key)
+        if value is None:
+            value = self._load_disk(key, *self._read_disk(key))
+        self._record(value is not None)
+        return value
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """Like ``get``, but reads the disk tier in a thread so the event loop is not blocked"""
+        value = self._get_memory(key)
+        if value is None:
+            if self.disk_dir:
+                loop = asyncio.get_running_loop()
+                value = self._load_disk(key, *await loop.run_in_executor(None, self._read_disk, key))
+            else:
+                value = self._load_disk(key, None, 0.0)
+        self._record(value is not None)
+        return value
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        """Return a value from the memory tier, counting a hit, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2]):
+                self._size -= entry[1]
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _load_disk(self, key: str, value: Optional[Any], stored_at: float) -> Optional[Any]:
+        """Count the outcome of a disk tier read and promote a hit to the memory tier"""
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.disk_hits += 1
+                self._store(key, value, stored_at)
+        return value
+
+    def _record(self, hit: bool) -> None:
+        if self.name:
+            record_cache(self.name, hit)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value in the memory tier and, if configured, on disk"""
+        with self._lock:
+            self._store(key, value)
+        self._write_disk(key, value)
+
+    async def set_async(self, key: str, value: Any) -> None:
+        """Like ``set``, but writes the disk tier in a thread so the event loop is not blocked"""
+        with self._lock:
+            self._store(key, value)
+        if self.disk_dir:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, value)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _store(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        """Insert into the memory tier and evict down to the byte budget (lock held)"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[1]
+
+        self._entries[key] = (value, size, stored_at or time.time())
+        self._size += size
+
+        while self._size > self.max_bytes and self._entries:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{content_hash(key.encode('utf-8'))}.json")
+
+    def _read_disk(self, key: str) -> Tuple[Optional[Any], float]:
+        """Return a value and its write time from the disk tier"""
+        if not self.disk_dir:
+            return None, 0.0
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                self._remove_disk_file(path)
+                return None, 0.0
+            with open(path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file), stored_at
+        except FileNotFoundError:
+            return None, 0.0
+        except Exception as e:
+            print(f"Cache read failed: {e}")
+            return None, 0.0
+
+    def _write_disk(self, key: str, value: Any) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(value, cache_file)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Cache write failed: {e}")
+            return
+        if self.disk_max_bytes > 0:
+            self._account_disk_write(size)
+
+    def _remove_disk_file(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes = max(0, self._disk_bytes - size)
+
+    def _account_disk_write(self, size: int) -> None:
+        """Add a write to the disk usage count and prune once it passes the bound"""
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                # The scan already includes the file just written
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                # Overwrites are counted twice; the next prune corrects the total
+                self._disk_bytes += size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune_disk()
+
+    def _scan_disk(self) -> List[Tuple[str, int, float]]:
+        """List (path, size, mtime) for the cache files in the disk tier"""
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _prune_disk(self) -> None:
+        """Delete expired files, then the oldest, until the disk tier is under 90% of its bound (disk lock held)"""
+        target = self.disk_max_bytes * 0.9
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, stored_at in entries:
+            if total <= target and not self._expired(stored_at):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
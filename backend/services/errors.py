@@ -0,0 +1,28 @@
+from typing import NamedTuple, Optional
+
+from .admission import AdmissionRejected
+from .token_budget import BudgetExceededError
+
+
+class ErrorStatus(NamedTuple):
+    """How a failed generation is reported: HTTP status, message and, for 503, a Retry-After"""
+    status: int
+    detail: str
+    retry_after: Optional[int] = None
+
+
+def error_status(error: Exception, context: Optional[str] = None) -> ErrorStatus:
+    """Map an error from the generation pipeline to the status the API reports it with
+
+    Oversized input is 413, a full admission queue 503 and other invalid
+    input (``ValueError``) 400. Anything else is a 500, its message prefixed
+    with ``context`` when given. The single-item routes, batch lines and jobs
+    all use this, so the same input fails the same way everywhere.
+    """
+    if isinstance(error, BudgetExceededError):
+        return ErrorStatus(413, str(error))
+    if isinstance(error, AdmissionRejected):
+        return ErrorStatus(503, str(error), error.retry_after)
+    if isinstance(error, ValueError):
+        return ErrorStatus(400, str(error))
+    return ErrorStatus(500, f"{context}: {error}" if context else str(error))
@@ -0,0 +1,391 @@
+import asyncio
+import base64
+import hashlib
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from .content_cache import ContentCache, content_hash
+from .file_processor import FileProcessor, PdfPageBudget
+from utils.profiling import current_profiler
+from utils.stage_timer import stage
+
+DOCX_MIME_TYPES = ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword")
+
+# Read size when copying an upload to disk for the workers
+UPLOAD_STAGE_CHUNK_BYTES = 1024 * 1024
+
+
+def _init_worker() -> None:
+    """Pre-import the heavy extraction libraries when a worker process starts"""
+    for module_name in ("PyPDF2", "pdfplumber", "docx"):
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+
+
+def _warm_up() -> int:
+    """No-op task used to force worker processes to start"""
+    return os.getpid()
+
+
+def _process_source(mime_type: str, source: Any) -> Optional[Dict[str, Any]]:
+    """Worker entry point for raw file bytes or a path to a file on disk"""
+    try:
+        return FileProcessor.process_file(mime_type, source)
+    except Exception as e:
+        print(f"Error processing file: {e}")
+        return None
+
+
+def _stage_pdf(source: Any) -> Tuple[str, bool]:
+    """Make PDF content available as a file on disk for the range workers to open
+
+    ``source`` is raw bytes or an existing file path. Returns the path and
+    whether it is a temporary file the caller must remove.
+    """
+    if isinstance(source, str):
+        return source, False
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as staged:
+        staged.write(source)
+    return staged.name, True
+
+
+def _extract_or_stage_pdf(
+    source: Any, budget: PdfPageBudget, parallel_min_pages: int
+) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[str, int, bool]]]:
+    """Worker entry point: extract a PDF in one pass, or stage it when enough pages are to be read to split it
+
+    Returns ``(result, None)`` when the document was extracted here, or
+    ``(None, (path, page_count, is_temporary))`` for the caller to extract
+    in page ranges.
+    """
+    page_count = FileProcessor.count_pdf_pages(source)
+    pages_to_read = min(page_count, budget.max_pages) if budget.max_pages else page_count
+    if pages_to_read < parallel_min_pages:
+        return FileProcessor.extract_pdf(source, budget, page_count), None
+    path, is_temporary = _stage_pdf(source)
+    return None, (path, page_count, is_temporary)
+
+
+def _stage_upload(file_obj: BinaryIO) -> str:
+    """Copy an uploaded file to a named file on disk, in chunks, for a worker process to open
+
+    Starlette spools uploads to an anonymous temporary file whose ``name``
+    is a file descriptor rather than a path, which no other process can open.
+    """
+    file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False) as staged:
+        shutil.copyfileobj(file_obj, staged, UPLOAD_STAGE_CHUNK_BYTES)
+    return staged.name
+
+
+def _decode_data_url(file_data: str) -> bytes:
+    return base64.b64decode(file_data.split(",", 1)[1])
+
+
+def _extraction_stage(mime_type: str) -> str:
+    """Stage name for extracting one file, so PDF and DOCX time can be told apart"""
+    if mime_type == "application/pdf":
+        return "extract_pdf"
+    if mime_type in DOCX_MIME_TYPES:
+        return "extract_docx"
+    return "extract_text"
+
+
+def _source_size(source: Any) -> int:
+    """Size of raw bytes or of a file on disk"""
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+def _source_digest(source: Any) -> str:
+    """Hash the raw bytes or the file on disk"""
+    if isinstance(source, str):
+        digest = hashlib.sha256()
+        with open(source, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    return content_hash(source)
+
+
+def _extract_pdf_range(path: str, start: int, end: int, char_limit: int) -> List[str]:
+    """Worker entry point for extracting one page range of a PDF on disk, stopping once past ``char_limit``"""
+    return FileProcessor.extract_pdf_pages(path, start, end, char_limit)
+
+
+def _rasterize_pdf_pages(path: str, page_indices: List[int], dpi: int) -> List[Dict[str, Any]]:
+    """Worker entry point for rendering scanned pages of a PDF on disk"""
+    return FileProcessor.rasterize_pdf_pages(path, page_indices, dpi)
+
+
+class ExtractionPool:
+    """Runs CPU-bound file extraction in a process pool, off the event loop
+
+    Configured through ``EXTRACTION_WORKERS`` (defaults to the CPU count;
+    ``0`` runs extraction in a thread instead of a separate process) and
+    ``EXTRACTION_START_METHOD`` (multiprocessing start method, default
+    ``spawn``). PDFs with at least ``PDF_PARALLEL_MIN_PAGES`` pages are split
+    into page ranges of at least ``PDF_MIN_PAGES_PER_RANGE`` pages that are
+    extracted on several workers and reassembled in order. Only the pages
+    within the PDF page budget (see ``PdfPageBudget``) are extracted.
+
+    Extracted document text is cached by a hash of the decoded file bytes
+    (see ``EXTRACTION_CACHE_MAX_BYTES`` and ``EXTRACTION_CACHE_DIR``), so
+    re-uploads of the same file skip extraction entirely.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        start_method: Optional[str] = None,
+        cache: Optional[ContentCache] = None,
+    ):
+        if max_workers is None:
+            max_workers = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+        self.max_workers = max(0, max_workers)
+        self.start_method = start_method or os.getenv("EXTRACTION_START_METHOD", "spawn")
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self.pdf_parallel_min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 40))
+        self.pdf_min_pages_per_range = max(1, int(os.getenv("PDF_MIN_PAGES_PER_RANGE", 10)))
+        self.cache = cache or ContentCache.from_env("EXTRACTION_CACHE")
+
+    def _get_executor(self) -> Optional[Executor]:
+        """Create the process pool on first use"""
+        if self.max_workers == 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Run a picklable function in the pool and await its result
+
+        A profiled request runs it on a thread instead, under the request's
+        profiler, which cannot follow work into another process.
+        """
+        loop = asyncio.get_running_loop()
+        profiler = current_profiler()
+        if profiler is not None:
+            return await loop.run_in_executor(None, profiler.run, func, *args)
+
+        executor = self._get_executor()
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def _submit(self, func: Callable, *args: Any) -> "Future[Any]":
+        """Submit a picklable function to the process pool, counted in the stats until it finishes or is cancelled"""
+        with self._lock:
+            self._in_flight += 1
+        future = self._get_executor().submit(func, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: "Future[Any]") -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self._completed += 1
+
+    async def process_files(self, files_data: List[str]) -> List[Dict[str, Any]]:
+        """Extract content from data URLs concurrently, preserving input order"""
+        tasks = []
+        for file_data in files_data:
+            if not file_data.startswith("data:"):
+                continue
+            mime_type = file_data[5:].split(",", 1)[0].split(";")[0]
+            if mime_type.startswith("image/"):
+                # Images are passed through untouched, no worker needed
+                tasks.append(self._passthrough(file_data))
+            else:
+                tasks.append(self._process_cached(mime_type, file_data))
+        results = await asyncio.gather(*tasks)
+        return FileProcessor.expand_page_images([result for result in results if result])
+
+    async def process_uploads(self, uploads: List[Tuple[str, BinaryIO]]) -> List[Dict[str, Any]]:
+        """Extract content from uploaded file handles concurrently, preserving input order
+
+        Each upload is staged to a file on disk and the workers get its path,
+        so file content is never read whole into this process or pickled.
+        """
+        loop = asyncio.get_running_loop()
+        paths: List[str] = []
+        try:
+            for _, file_obj in uploads:
+                paths.append(await loop.run_in_executor(None, _stage_upload, file_obj))
+            tasks = []
+            for (mime_type, _), path in zip(uploads, paths):
+                if mime_type.startswith("image/"):
+                    tasks.append(self.run(_process_source, mime_type, path))
+                else:
+                    tasks.append(self._process_cached(mime_type, path))
+            results = await asyncio.gather(*tasks)
+        finally:
+            for path in paths:
+                os.remove(path)
+        return FileProcessor.expand_page_images([result for result in results if result])
+
+    @staticmethod
+    async def _passthrough(file_data: str) -> Optional[Dict[str, Any]]:
+        return FileProcessor.process_data_url(file_data)
+
+    async def _process_cached(self, mime_type: str, source: Any) -> Optional[Dict[str, Any]]:
+        """Extract a document, serving the text from the content cache when possible
+
+        Data URLs are decoded once, here, and both the digest and the worker
+        take the bytes.
+        """
+        loop = asyncio.get_running_loop()
+        if isinstance(source, str) and source.startswith("data:"):
+            try:
+                with stage("decode", mime_type=mime_type, encoded_bytes=len(source)):
+                    source = await loop.run_in_executor(None, _decode_data_url, source)
+            except Exception as e:
+                print(f"Error processing file: {e}")
+                return None
+
+        key = None
+        if self.cache.enabled:
+            digest = await loop.run_in_executor(None, _source_digest, source)
+            key = f"{mime_type}:{digest}"
+            if mime_type == "application/pdf":
+                # Text extracted under a different page budget is not interchangeable
+                budget = PdfPageBudget()
+                key = f"{key}:{budget.max_pages}:{budget.char_limit}"
+            cached = await self.cache.get_async(key)
+            if cached is not None:
+                return cached
+
+        # Summed across the files of a request, so concurrent extractions can exceed the wall time
+        with stage(_extraction_stage(mime_type), mime_type=mime_type, size_bytes=_source_size(source)):
+            if mime_type == "application/pdf":
+                result = await self._process_pdf(source)
+            else:
+                result = await self.run(_process_source, mime_type, source)
+
+        if key is not None and result:
+            await self.cache.set_async(key, result)
+        return result
+
+    async def _process_pdf(self, source: Any) -> Optional[Dict[str, Any]]:
+        """Extract a PDF, splitting large documents into page ranges across workers
+
+        The page budget applies while extracting: documents with fewer than
+        ``PDF_PARALLEL_MIN_PAGES`` pages to read are extracted in one worker
+        pass that stops at the first limit. For larger ones each range worker
+        stops once its own text is past the character limit, and the ranges
+        after the one where the limit is reached are cancelled if they have
+        not started yet.
+        """
+        budget = PdfPageBudget()
+        if self.max_workers <= 1:
+            return await self.run(_process_source, "application/pdf", source)
+
+        staged_path = None
+        try:
+            processed, staged = await self.run(_extract_or_stage_pdf, source, budget, self.pdf_parallel_min_pages)
+            if staged is None:
+                return processed
+            path, page_count, is_temporary = staged
+            if is_temporary:
+                staged_path = path
+
+            pages_to_read = min(page_count, budget.max_pages) if budget.max_pages else page_count
+            range_texts = await self._extract_ranges(path, self._page_ranges(pages_to_read), budget.char_limit)
+            processed = FileProcessor.collect_pdf_pages(
+                (page_text for pages in range_texts for page_text in pages), page_count, budget
+            )
+            if processed and processed.get("scanned_pages"):
+                processed["page_images"] = await self.run(_rasterize_pdf_pages, path, processed["scanned_pages"], budget.raster_dpi)
+            return processed
+        except Exception as e:
+            print(f"Error processing file: {e}")
+            return None
+        finally:
+            if staged_path:
+                os.remove(staged_path)
+
+    async def _extract_ranges(self, path: str, ranges: List[Tuple[int, int]], char_limit: int) -> List[List[str]]:
+        """Extract page ranges on the workers and return their texts in order, up to the range that reaches ``char_limit``
+
+        Ranges past that point are cancelled if no worker has picked them up
+        yet. Those already running are waited for, so the staged file is not
+        removed under them; each stops at ``char_limit`` on its own.
+        """
+        if current_profiler() is not None:
+            # One range at a time on a profiled thread (see run)
+            futures = []
+        else:
+            futures = [self._submit(_extract_pdf_range, path, start, end, char_limit) for start, end in ranges]
+
+        range_texts: List[List[str]] = []
+        chars = 0
+        try:
+            for index, (start, end) in enumerate(ranges):
+                if futures:
+                    pages = await asyncio.wrap_future(futures[index])
+                else:
+                    pages = await self.run(_extract_pdf_range, path, start, end, char_limit)
+                range_texts.append(pages)
+                chars += sum(len(page_text) for page_text in pages)
+                if char_limit and chars > char_limit:
+                    break
+        finally:
+            running = [future for future in futures if not future.cancel()]
+            await asyncio.gather(*[asyncio.wrap_future(future) for future in running], return_exceptions=True)
+        return range_texts
+
+    def _page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """Split a page count into contiguous [start, end) ranges, one per worker at most"""
+        if page_count < self.pdf_parallel_min_pages:
+            return [(0, page_count)]
+        pages_per_range = max(self.pdf_min_pages_per_range, math.ceil(page_count / self.max_workers))
+        return [(start, min(start + pages_per_range, page_count)) for start in range(0, page_count, pages_per_range)]
+
+    def warm_up(self) -> None:
+        """Start all worker processes so the first request does not pay the spawn cost"""
+        executor = self._get_executor()
+        if executor is not None:
+            for _ in range(self.max_workers):
+                executor.submit(_warm_up)
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool size and queue depth"""
+        with self._lock:
+            in_flight = self._in_flight
+            completed = self._completed
+        return {
+            "workers": self.max_workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - max(self.max_workers, 1)),
+            "completed": completed,
+        }
+
+    def shutdown(self) -> None:
+        """Shut down the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -1,12 +1,20 @@
+import copy
+import os
 import re
+import threading
 from io import BytesIO
-from typing import Dict
+from typing import Dict, Optional
+
+from .markdown_ast import BLANK, BULLET, HEADING, NUMBERED, TABLE, Block, Document, Spans, parse_markdown, plain_text
+from utils.stage_timer import stage
 
 # Try to import optional dependencies
 try:
-    from docx import Document
+    from docx import Document as DocxDocument
     from docx.shared import Inches
     from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.oxml.ns import qn
+    from docx.table import _Cell
     DOCX_AVAILABLE = True
 except ImportError:
     DOCX_AVAILABLE = False
@@ -17,166 +25,147 @@ try:
 except ImportError:
     MARKDOWN_AVAILABLE = False
 
+EXTRA_BLANK_LINES_PATTERN = re.compile(r'\n\s*\n\s*\n')
+
+class DocxTemplate:
+    """Prepared base document that every DOCX export starts from
+
+    Loading a template means unzipping and parsing it, so it is done once:
+    the base document is kept in memory with its margins set and its body
+    emptied, and each export works on a deep copy. ``DOCX_TEMPLATE_PATH``
+    points at a corporate ``.docx`` whose styles, margins, headers and
+    footers are kept; its body text is dropped. Style ids are resolved once
+    per template, since python-docx looks them up by scanning every style;
+    styles the template lacks fall back to the default paragraph style.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("DOCX_TEMPLATE_PATH", "")
+        self._base = None
+        self._style_ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def new_document(self):
+        """Return a fresh copy of the base document"""
+        with self._lock:
+            if self._base is None:
+                self._base = self._load()
+                self._style_ids = {style.name: style.style_id for style in self._base.styles}
+            return copy.deepcopy(self._base)
+    
+    def style_id(self, name: str) -> Optional[str]:
+        """The id of a named style, or None when the template does not define it"""
+        return self._style_ids.get(name)
+    
+    def _load(self):
+        if self.path:
+            try:
+                doc = DocxDocument(self.path)
+            except Exception as e:
+                print(f"Could not load DOCX template {self.path}, using the default: {e}")
+            else:
+                # Keep the section properties (page setup, headers, footers), drop the content
+                body = doc.element.body
+                for child in list(body):
+                    if child.tag != qn('w:sectPr'):
+                        body.remove(child)
+                return doc
+        
+        doc = DocxDocument()
+        
+        # Set document margins
+        for section in doc.sections:
+            section.top_margin = Inches(1)
+            section.bottom_margin = Inches(1)
+            section.left_margin = Inches(1)
+            section.right_margin = Inches(1)
+        return doc
+
+
+# Shared by every DOCX export in the process
+docx_template = DocxTemplate()
+
+
 class FileConverter:
-    """Service for converting MOM content to different file formats"""
+    """Service for converting MOM content to different file formats
+
+    Content is parsed once into a Markdown AST (see ``services.markdown_ast``,
+    cached by content hash) and each format is a renderer over that AST.
+    """
     
     @staticmethod
     def markdown_to_txt(content: str) -> str:
         """Convert markdown content to plain text"""
-        # Remove markdown formatting
-        text = content
-        
-        # Remove markdown headers
-        text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
-        
-        # Remove markdown bold/italic
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)
-        text = re.sub(r'__([^_]+)__', r'\1', text)
-        text = re.sub(r'_([^_]+)_', r'\1', text)
-        
-        # Convert markdown lists to plain text
-        text = re.sub(r'^[\s]*[-*+]\s+', '• ', text, flags=re.MULTILINE)
-        text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
-        
-        # Remove markdown links but keep text
-        text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-        
-        # Convert markdown tables to plain text
-        lines = text.split('\n')
-        converted_lines = []
-        in_table = False
+        with stage("render_txt", content_chars=len(content)):
+            return FileConverter.render_txt(parse_markdown(content))
+    
+    @staticmethod
+    def markdown_to_docx(content: str) -> BytesIO:
+        """Convert markdown content to DOCX format"""
+        with stage("render_docx", content_chars=len(content)):
+            return FileConverter.render_docx(parse_markdown(content))
+    
+    @staticmethod
+    def render_txt(document: Document) -> str:
+        """Render a parsed document as plain text"""
+        lines = []
         
-        for line in lines:
-            # Check if line is a table row
-            if '|' in line and line.strip().startswith('|') and line.strip().endswith('|'):
-                if not in_table:
-                    in_table = True
-                # Convert table row to plain text
-                cells = [cell.strip() for cell in line.split('|')[1:-1]]
-                if not all(cell == '---' or cell == '' for cell in cells):  # Skip separator rows
-                    converted_lines.append(' | '.join(cells))
+        for block in document:
+            if block.kind == TABLE:
+                lines.extend(' | '.join(plain_text(cell) for cell in row) for row in block.rows)
+                lines.append('')  # Add blank line after table
+            elif block.kind == BULLET:
+                lines.append('• ' + plain_text(block.spans))
+            elif block.kind == BLANK:
+                lines.append('')
+            elif block.kind == NUMBERED and block.indent:
+                # Nested steps keep their indentation and number
+                lines.append(f'{block.indent}{block.number}. ' + plain_text(block.spans))
+            elif block.kind == HEADING:
+                lines.append(plain_text(block.spans))
             else:
-                if in_table:
-                    in_table = False
-                    converted_lines.append('')  # Add blank line after table
-                converted_lines.append(line)
-        
-        text = '\n'.join(converted_lines)
+                # Top-level numbered items lose their markers; text keeps its indentation
+                lines.append(block.indent + plain_text(block.spans))
         
         # Clean up extra whitespace
-        text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
-        text = text.strip()
-        
-        return text
+        text = EXTRA_BLANK_LINES_PATTERN.sub('\n\n', '\n'.join(lines))
+        return text.strip()
     
     @staticmethod
-    def markdown_to_docx(content: str) -> BytesIO:
-        """Convert markdown content to DOCX format"""
+    def render_docx(document: Document) -> BytesIO:
+        """Render a parsed document as DOCX"""
         if not DOCX_AVAILABLE:
             raise ImportError("python-docx is not installed. Please install it with: pip install python-docx")
         
-        doc = Document()
-        
-        # Set document margins
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1)
-            section.right_margin = Inches(1)
-        
-        lines = content.split('\n')
-        i = 0
+        doc = docx_template.new_document()
+        style_id = docx_template.style_id
         
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            if not line:
+        for block in document:
+            if block.kind == BLANK:
                 # Add blank paragraph for empty lines
                 doc.add_paragraph()
-                i += 1
-                continue
             
-            # Handle headers
-            if line.startswith('#'):
-                level = len(line) - len(line.lstrip('#'))
-                header_text = line.lstrip('# ').strip()
-                
+            elif block.kind == HEADING:
+                level = min(block.level, 3)
+                heading = FileConverter._add_paragraph(doc, style_id(f'Heading {level}'))
+                heading.add_run(plain_text(block.spans))
                 if level == 1:
                     # Main heading
-                    heading = doc.add_heading(header_text, level=1)
                     heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                else:
-                    # Sub headings
-                    doc.add_heading(header_text, level=min(level, 3))
-                
-            # Handle tables
-            elif line.startswith('|') and line.endswith('|'):
-                table_lines = []
-                j = i
-                
-                # Collect all table lines
-                while j < len(lines) and lines[j].strip().startswith('|') and lines[j].strip().endswith('|'):
-                    table_line = lines[j].strip()
-                    # Skip separator lines
-                    if not all(cell.strip() in ['---', ''] for cell in table_line.split('|')[1:-1]):
-                        table_lines.append(table_line)
-                    j += 1
-                
-                if table_lines:
-                    # Create table
-                    first_row = table_lines[0]
-                    cols = len([cell.strip() for cell in first_row.split('|')[1:-1]])
-                    rows = len(table_lines)
-                    
-                    table = doc.add_table(rows=rows, cols=cols)
-                    table.style = 'Table Grid'
-                    
-                    for row_idx, table_line in enumerate(table_lines):
-                        cells_data = [cell.strip() for cell in table_line.split('|')[1:-1]]
-                        for col_idx, cell_data in enumerate(cells_data):
-                            if col_idx < cols:
-                                cell = table.cell(row_idx, col_idx)
-                                cell.text = cell_data
-                                # Make header row bold
-                                if row_idx == 0:
-                                    for paragraph in cell.paragraphs:
-                                        for run in paragraph.runs:
-                                            run.bold = True
-                
-                i = j
-                continue
             
-            # Handle lists
-            elif line.startswith(('- ', '* ', '+ ')) or re.match(r'^\d+\.\s', line):
-                # Bullet or numbered list
-                if line.startswith(('- ', '* ', '+ ')):
-                    list_text = line[2:].strip()
-                    p = doc.add_paragraph(list_text, style='List Bullet')
-                else:
-                    list_text = re.sub(r'^\d+\.\s+', '', line)
-                    p = doc.add_paragraph(list_text, style='List Number')
+            elif block.kind == TABLE:
+                FileConverter._add_table(doc, block.rows, style_id('Table Grid'))
             
-            # Handle bold text formatting
-            else:
-                # Regular paragraph with formatting
-                p = doc.add_paragraph()
-                
-                # Process bold and other formatting
-                text_parts = re.split(r'(\*\*[^*]+\*\*)', line)
-                
-                for part in text_parts:
-                    if part.startswith('**') and part.endswith('**'):
-                        # Bold text
-                        bold_text = part[2:-2]
-                        run = p.add_run(bold_text)
-                        run.bold = True
-                    else:
-                        # Regular text
-                        p.add_run(part)
+            elif block.kind == BULLET:
+                list_style = FileConverter._list_style('List Bullet', block)
+                FileConverter._add_runs(FileConverter._add_paragraph(doc, list_style), block.spans)
             
-            i += 1
+            elif block.kind == NUMBERED:
+                list_style = FileConverter._list_style('List Number', block)
+                FileConverter._add_runs(FileConverter._add_paragraph(doc, list_style), block.spans)
+            
+            else:
+                FileConverter._add_runs(doc.add_paragraph(), block.spans)
         
         # Save to BytesIO
         doc_io = BytesIO()
@@ -184,3 +173,51 @@ class FileConverter:
         doc_io.seek(0)
         
         return doc_io
+    
+    @staticmethod
+    def _list_style(name: str, block: Block) -> Optional[str]:
+        """Style id for a list item; indented items use the second-level list style when the template has one"""
+        if block.indent:
+            nested = docx_template.style_id(f'{name} 2')
+            if nested:
+                return nested
+        return docx_template.style_id(name)
+    
+    @staticmethod
+    def _add_paragraph(doc, style_id: Optional[str]):
+        """Append a paragraph with a style given by id, skipping python-docx's name lookup"""
+        paragraph = doc.add_paragraph()
+        if style_id:
+            paragraph._p.style = style_id
+        return paragraph
+    
+    @staticmethod
+    def _add_table(doc, rows, style_id: Optional[str]) -> None:
+        """Append a table with a bold header row, creating each row's cells directly
+
+        ``Table.cell()`` rebuilds the table's whole cell grid on every lookup,
+        so filling a table through it is quadratic in its size.
+        """
+        table = doc.add_table(rows=0, cols=len(rows[0]))
+        tbl = table._tbl
+        if style_id:
+            tbl.tblStyle_val = style_id
+        widths = [grid_col.w for grid_col in tbl.tblGrid.gridCol_lst]
+        for row_idx, row in enumerate(rows):
+            tr = tbl.add_tr()
+            for col_idx, width in enumerate(widths):
+                tc = tr.add_tc()
+                tc.width = width
+                if col_idx < len(row):
+                    # Make header row bold
+                    FileConverter._add_runs(_Cell(tc, table).paragraphs[0], row[col_idx], bold=row_idx == 0)
+    
+    @staticmethod
+    def _add_runs(paragraph, spans: Spans, bold: bool = False) -> None:
+        """Append inline spans to a DOCX paragraph as formatted runs"""
+        for span in spans:
+            run = paragraph.add_run(span.text)
+            if span.bold or bold:
+                run.bold = True
+            if span.italic:
+                run.italic = True
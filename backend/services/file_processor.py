@@ -1,7 +1,13 @@
 import base64
 import io
+import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Union
+
+from .token_budget import CHARS_PER_TOKEN
+
+# Raw file content: decoded bytes, a readable binary file handle or a path on disk
+FileSource = Union[bytes, BinaryIO, str]
 
 # Try to import optional dependencies
 try:
@@ -22,111 +28,423 @@ try:
 except ImportError:
     DOCX_AVAILABLE = False
 
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Page text quality check used to decide when a page needs pdfplumber
+PDF_MAX_GARBLED_RATIO = float(os.getenv("PDF_MAX_GARBLED_RATIO", 0.02))
+PDF_MIN_WHITESPACE_RATIO = 0.05
+# Replacement and control characters, private-use glyphs and unmapped "(cid:12)" codes
+GARBLED_PATTERN = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufffd\ue000-\uf8ff]|\(cid:\d+\)")
+WHITESPACE_PATTERN = re.compile(r"\s")
+
+# Pages with fewer characters than this are treated as scans when they contain an image
+PDF_SCANNED_MAX_CHARS = 20
+PDF_MAX_RASTER_DPI = 300
+
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION_TAG = 0x0112
+
+class PdfPageBudget:
+    """Limits on how much of a PDF is read; a limit of 0 disables it
+
+    Configured through ``PDF_MAX_PAGES``, ``PDF_MAX_CHARS`` and
+    ``PDF_MAX_TOKENS``, all off by default so whole documents are read
+    unless a deployment opts in. Extraction stops at the first limit
+    reached; the remaining pages are reported as skipped. Up to ``PDF_MAX_SCANNED_PAGES``
+    pages without a text layer are rendered at ``PDF_RASTER_DPI`` and sent
+    as images.
+    """
+    
+    def __init__(self, max_pages: Optional[int] = None, max_chars: Optional[int] = None, max_tokens: Optional[int] = None):
+        self.max_pages = int(os.getenv("PDF_MAX_PAGES", 0)) if max_pages is None else max_pages
+        self.max_chars = int(os.getenv("PDF_MAX_CHARS", 0)) if max_chars is None else max_chars
+        self.max_tokens = int(os.getenv("PDF_MAX_TOKENS", 0)) if max_tokens is None else max_tokens
+        self.max_scanned_pages = int(os.getenv("PDF_MAX_SCANNED_PAGES", 10))
+        self.raster_dpi = min(int(os.getenv("PDF_RASTER_DPI", 150)), PDF_MAX_RASTER_DPI)
+    
+    @property
+    def char_limit(self) -> int:
+        """The character and token limits combined into one character count (0 for none)"""
+        limits = [limit for limit in (self.max_chars, self.max_tokens * CHARS_PER_TOKEN) if limit > 0]
+        return min(limits) if limits else 0
+
+
 class FileProcessor:
     """Service for processing different file types and extracting text content"""
     
     @staticmethod
-    def process_files(files_data: List[str]) -> List[Dict[str, Any]]:
-        """Process a list of files and return processed content for Gemini"""
-        processed_files = []
+    def process_data_url(file_data: str) -> Optional[Dict[str, Any]]:
+        """Process a single base64 data URL and return its content for Gemini"""
+        if not file_data.startswith('data:'):
+            return None
         
-        for file_data in files_data:
-            try:
-                # Parse data URL to get file type and content
-                if file_data.startswith('data:'):
-                    header, encoded_data = file_data.split(',', 1)
-                    mime_type = header.split(';')[0].replace('data:', '')
-                    file_content = base64.b64decode(encoded_data)
-                    
-                    if mime_type.startswith('image/'):
-                        # Handle images - pass through to Gemini as is
-                        processed_files.append({
-                            "mime_type": mime_type,
-                            "data": encoded_data
-                        })
-                    elif mime_type == 'application/pdf':
-                        # Extract text from PDF
-                        text_content = FileProcessor.extract_pdf_text(file_content)
-                        if text_content:
-                            processed_files.append({
-                                "type": "text",
-                                "content": text_content
-                            })
-                    elif mime_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'application/msword']:
-                        # Extract text from DOCX
-                        text_content = FileProcessor.extract_docx_text(file_content)
-                        if text_content:
-                            processed_files.append({
-                                "type": "text", 
-                                "content": text_content
-                            })
-                    elif mime_type == 'text/plain':
-                        # Handle plain text
-                        text_content = file_content.decode('utf-8', errors='ignore')
-                        processed_files.append({
-                            "type": "text",
-                            "content": text_content
+        # Parse data URL to get file type and content
+        header, encoded_data = file_data.split(',', 1)
+        mime_type = header.split(';')[0].replace('data:', '')
+        
+        if mime_type.startswith('image/'):
+            # Handle images - pass through to Gemini as is
+            return {
+                "mime_type": mime_type,
+                "data": encoded_data
+            }
+        
+        return FileProcessor.process_file(mime_type, base64.b64decode(encoded_data))
+    
+    @staticmethod
+    def process_file(mime_type: str, source: FileSource) -> Optional[Dict[str, Any]]:
+        """Process a single file's raw content according to its mime type"""
+        if mime_type.startswith('image/'):
+            # Images are sent to Gemini inline as base64
+            return {
+                "mime_type": mime_type,
+                "data": base64.b64encode(FileProcessor._read_bytes(source)).decode('ascii')
+            }
+        
+        if mime_type == 'application/pdf':
+            return FileProcessor.extract_pdf(source)
+        
+        if mime_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'application/msword']:
+            text_content = FileProcessor.extract_docx_text(source)
+        else:
+            # Plain text and unknown types are decoded as text
+            text_content = FileProcessor._read_bytes(source).decode('utf-8', errors='ignore')
+        
+        if not text_content:
+            return None
+        
+        return {
+            "type": "text",
+            "content": text_content
+        }
+    
+    @staticmethod
+    def _read_bytes(source: FileSource) -> bytes:
+        """Return the full content of a file source as bytes"""
+        if isinstance(source, (bytes, bytearray)):
+            return bytes(source)
+        if isinstance(source, str):
+            with open(source, 'rb') as file_obj:
+                return file_obj.read()
+        return source.read()
+    
+    @staticmethod
+    def _independent_stream(source: FileSource) -> Union[BinaryIO, str]:
+        """Like _as_stream, but never shares a file handle that another reader is using"""
+        if not isinstance(source, (bytes, bytearray, str)):
+            name = getattr(source, "name", None)
+            if isinstance(name, str) and os.path.isfile(name):
+                return name
+            source.seek(0)
+            return io.BytesIO(source.read())
+        return FileProcessor._as_stream(source)
+    
+    @staticmethod
+    def _as_stream(source: FileSource) -> Union[BinaryIO, str]:
+        """Return a seekable binary stream (or a path the PDF/DOCX readers open themselves)"""
+        if isinstance(source, (bytes, bytearray)):
+            return io.BytesIO(source)
+        if isinstance(source, str):
+            return source
+        source.seek(0)
+        return source
+    
+    @staticmethod
+    def extract_pdf_text(pdf_content: FileSource, budget: Optional[PdfPageBudget] = None) -> str:
+        """Extract text from PDF content, up to the page budget"""
+        processed = FileProcessor.extract_pdf(pdf_content, budget)
+        return processed["content"] if processed else ""
+    
+    @staticmethod
+    def extract_pdf(pdf_content: FileSource, budget: Optional[PdfPageBudget] = None, page_count: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Extract a PDF page by page until the budget is used up, without reading the remaining pages"""
+        budget = budget or PdfPageBudget()
+        if page_count is None:
+            page_count = FileProcessor.count_pdf_pages(pdf_content)
+        end = min(page_count, budget.max_pages) if budget.max_pages else None
+        processed = FileProcessor.collect_pdf_pages(FileProcessor.iter_pdf_pages(pdf_content, 0, end), page_count, budget)
+        if processed and processed.get("scanned_pages"):
+            processed["page_images"] = FileProcessor.rasterize_pdf_pages(pdf_content, processed["scanned_pages"], budget.raster_dpi)
+        return processed
+    
+    @staticmethod
+    def collect_pdf_pages(pages: Iterable[str], page_count: int, budget: PdfPageBudget) -> Optional[Dict[str, Any]]:
+        """Join page texts in order until the budget is reached, recording the pages left out
+        
+        Pages read without (almost) any text are listed in ``scanned_pages``
+        (0-based) as candidates for rasterization.
+        """
+        char_limit = budget.char_limit
+        texts: List[str] = []
+        scanned_pages: List[int] = []
+        chars = 0
+        
+        page_iterator = iter(pages)
+        try:
+            for page_text in page_iterator:
+                if budget.max_pages and len(texts) >= budget.max_pages:
+                    break
+                if char_limit and chars + len(page_text) > char_limit:
+                    if not texts:
+                        # Keep the start of an oversized first page rather than nothing
+                        texts.append(page_text[:char_limit])
+                    break
+                if len(page_text.strip()) < PDF_SCANNED_MAX_CHARS and len(scanned_pages) < budget.max_scanned_pages:
+                    scanned_pages.append(len(texts))
+                texts.append(page_text)
+                chars += len(page_text)
+        finally:
+            # Stop a page generator now so it releases the document
+            close = getattr(page_iterator, "close", None)
+            if close is not None:
+                close()
+        
+        text_content = FileProcessor.join_pdf_pages(texts)
+        if not text_content and not scanned_pages:
+            return None
+        
+        processed = {
+            "type": "text",
+            "content": text_content
+        }
+        if scanned_pages:
+            processed["scanned_pages"] = scanned_pages
+        page_count = max(page_count, len(texts))
+        if len(texts) < page_count:
+            processed["pages"] = {
+                "total": page_count,
+                "read": len(texts),
+                "skipped": f"{len(texts) + 1}-{page_count}" if len(texts) + 1 < page_count else str(page_count)
+            }
+        return processed
+    
+    @staticmethod
+    def rasterize_pdf_pages(pdf_content: FileSource, page_indices: List[int], dpi: int) -> List[Dict[str, Any]]:
+        """Render the given pages (0-based) as JPEG images; pages with no image on them are blank and skipped"""
+        if not PDFPLUMBER_AVAILABLE or not PIL_AVAILABLE or not page_indices:
+            return []
+        
+        page_images = []
+        try:
+            with pdfplumber.open(FileProcessor._as_stream(pdf_content)) as pdf:
+                for index in page_indices:
+                    page = pdf.pages[index]
+                    if page.images:
+                        rendered = page.to_image(resolution=dpi).original
+                        if rendered.mode not in ("RGB", "L"):
+                            rendered = rendered.convert("RGB")
+                        output = io.BytesIO()
+                        rendered.save(output, format="JPEG", quality=85)
+                        page_images.append({
+                            "mime_type": "image/jpeg",
+                            "data": base64.b64encode(output.getvalue()).decode('ascii'),
+                            "page": index + 1
                         })
-                    else:
-                        # Try to decode as text for unknown types
-                        try:
-                            text_content = file_content.decode('utf-8', errors='ignore')
-                            processed_files.append({
-                                "type": "text",
-                                "content": text_content
-                            })
-                        except:
-                            continue
-                            
-            except Exception as e:
-                # Skip files that can't be processed
-                print(f"Error processing file: {e}")
+                    page.flush_cache()
+        except Exception as e:
+            print(f"PDF page rasterization failed: {e}")
+        
+        return page_images
+    
+    @staticmethod
+    def expand_page_images(processed_files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turn the rendered scanned pages of each PDF into image entries following its text"""
+        expanded = []
+        for processed in processed_files:
+            page_images = processed.get("page_images")
+            if not page_images:
+                if processed.get("content") or "mime_type" in processed:
+                    expanded.append({key: value for key, value in processed.items() if key not in ("page_images", "scanned_pages")})
                 continue
+            
+            page_numbers = ", ".join(str(image["page"]) for image in page_images)
+            if len(page_images) == 1:
+                note = f"[Page {page_numbers} of this document has no text layer; it is attached as an image.]"
+            else:
+                note = f"[Pages {page_numbers} of this document have no text layer; they are attached as images.]"
+            text = {key: value for key, value in processed.items() if key not in ("page_images", "scanned_pages")}
+            text["content"] = f"{processed['content']}\n\n{note}".strip()
+            expanded.append(text)
+            expanded.extend({"mime_type": image["mime_type"], "data": image["data"]} for image in page_images)
         
-        return processed_files
+        return expanded
     
     @staticmethod
-    def extract_pdf_text(pdf_content: bytes) -> str:
-        """Extract text from PDF content"""
+    def extract_pdf_pages(pdf_content: FileSource, start: int = 0, end: Optional[int] = None, char_limit: int = 0) -> List[str]:
+        """Extract the text of pages [start, end) from PDF content, one entry per page
+        
+        With ``char_limit`` set, stops after the page that takes the text past
+        it; the pages after that could never fit in the budget.
+        """
+        pages: List[str] = []
+        chars = 0
+        page_iterator = FileProcessor.iter_pdf_pages(pdf_content, start, end)
+        try:
+            for page_text in page_iterator:
+                pages.append(page_text)
+                chars += len(page_text)
+                if char_limit and chars > char_limit:
+                    break
+        finally:
+            page_iterator.close()
+        return pages
+    
+    @staticmethod
+    def iter_pdf_pages(pdf_content: FileSource, start: int = 0, end: Optional[int] = None, backend: Optional[str] = None) -> Iterator[str]:
+        """Yield the text of pages [start, end) one at a time, releasing each page's layout before the next
+        
+        ``backend`` (default ``PDF_BACKEND``, ``auto``) picks the extractor:
+        ``auto`` reads each page with PyPDF2 and re-reads only the pages whose
+        text fails the quality check with pdfplumber; ``pdfplumber`` and
+        ``pypdf2`` use one library for every page, falling back to the other
+        if it cannot open the document.
+        """
         if not PDF_AVAILABLE and not PDFPLUMBER_AVAILABLE:
             raise ImportError("PDF processing libraries not available. Please install PyPDF2 or pdfplumber.")
         
-        text_content = ""
-        
-        # Try pdfplumber first (better text extraction)
+        backend = backend or os.getenv("PDF_BACKEND", "auto")
+        if backend == "pdfplumber" or not PDF_AVAILABLE:
+            yield from FileProcessor._iter_pdfplumber_pages(pdf_content, start, end)
+        elif backend == "pypdf2" or not PDFPLUMBER_AVAILABLE:
+            yield from FileProcessor._iter_pypdf2_pages(pdf_content, start, end)
+        else:
+            yield from FileProcessor._iter_adaptive_pages(pdf_content, start, end)
+    
+    @staticmethod
+    def _iter_pdfplumber_pages(pdf_content: FileSource, start: int, end: Optional[int]) -> Iterator[str]:
+        """pdfplumber for every page, continuing with PyPDF2 if it fails"""
         if PDFPLUMBER_AVAILABLE:
             try:
-                with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_content += page_text + "\n\n"
-                return text_content.strip()
+                with pdfplumber.open(FileProcessor._as_stream(pdf_content)) as pdf:
+                    for page in pdf.pages[start:end]:
+                        page_text = page.extract_text() or ""
+                        page.flush_cache()
+                        start += 1
+                        yield page_text
+                return
             except Exception as e:
                 print(f"pdfplumber failed: {e}")
         
-        # Fallback to PyPDF2
+        # Fallback to PyPDF2, continuing after the last page already yielded
         if PDF_AVAILABLE:
             try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n\n"
-                return text_content.strip()
+                pdf_reader = PyPDF2.PdfReader(FileProcessor._as_stream(pdf_content))
+                for page in pdf_reader.pages[start:end]:
+                    yield page.extract_text() or ""
             except Exception as e:
                 print(f"PyPDF2 failed: {e}")
+    
+    @staticmethod
+    def _iter_pypdf2_pages(pdf_content: FileSource, start: int, end: Optional[int]) -> Iterator[str]:
+        """PyPDF2 for every page, continuing with pdfplumber if it fails"""
+        if PDF_AVAILABLE:
+            try:
+                pdf_reader = PyPDF2.PdfReader(FileProcessor._as_stream(pdf_content))
+                for page in pdf_reader.pages[start:end]:
+                    page_text = page.extract_text() or ""
+                    start += 1
+                    yield page_text
+                return
+            except Exception as e:
+                print(f"PyPDF2 failed: {e}")
+        
+        if PDFPLUMBER_AVAILABLE:
+            yield from FileProcessor._iter_pdfplumber_pages(pdf_content, start, end)
+    
+    @staticmethod
+    def _iter_adaptive_pages(pdf_content: FileSource, start: int, end: Optional[int]) -> Iterator[str]:
+        """PyPDF2 for every page, with pdfplumber only for the pages PyPDF2 reads badly"""
+        try:
+            pdf_reader = PyPDF2.PdfReader(FileProcessor._as_stream(pdf_content))
+            pages = pdf_reader.pages[start:end]
+        except Exception as e:
+            print(f"PyPDF2 failed: {e}")
+            yield from FileProcessor._iter_pdfplumber_pages(pdf_content, start, end)
+            return
         
-        return ""
+        # Opened on the first page that needs it; simple exports never pay for it
+        layout_pdf = None
+        try:
+            for index, page in enumerate(pages, start):
+                try:
+                    page_text = page.extract_text() or ""
+                except Exception as e:
+                    print(f"PyPDF2 failed on page {index + 1}: {e}")
+                    page_text = ""
+                
+                if not FileProcessor.pdf_text_acceptable(page_text):
+                    try:
+                        if layout_pdf is None:
+                            layout_pdf = pdfplumber.open(FileProcessor._independent_stream(pdf_content))
+                        layout_page = layout_pdf.pages[index]
+                        layout_text = layout_page.extract_text() or ""
+                        layout_page.flush_cache()
+                        if layout_text.strip():
+                            page_text = layout_text
+                    except Exception as e:
+                        print(f"pdfplumber failed on page {index + 1}: {e}")
+                
+                yield page_text
+        finally:
+            if layout_pdf is not None:
+                layout_pdf.close()
     
     @staticmethod
-    def extract_docx_text(docx_content: bytes) -> str:
+    def pdf_text_acceptable(page_text: str) -> bool:
+        """Whether fast-extracted page text is usable as is, or the page needs layout-aware extraction
+        
+        Rejects empty pages, text with more than ``PDF_MAX_GARBLED_RATIO``
+        unmapped or control characters, and long text with almost no spaces
+        (glyphs positioned one by one, which PyPDF2 runs together).
+        """
+        stripped = page_text.strip()
+        if not stripped:
+            return False
+        
+        garbled = len(GARBLED_PATTERN.findall(stripped))
+        if garbled / len(stripped) > PDF_MAX_GARBLED_RATIO:
+            return False
+        
+        if len(stripped) >= 200 and len(WHITESPACE_PATTERN.findall(stripped)) / len(stripped) < PDF_MIN_WHITESPACE_RATIO:
+            return False
+        
+        return True
+    
+    @staticmethod
+    def count_pdf_pages(pdf_content: FileSource) -> int:
+        """Return the number of pages in PDF content"""
+        if PDF_AVAILABLE:
+            try:
+                return len(PyPDF2.PdfReader(FileProcessor._as_stream(pdf_content)).pages)
+            except Exception as e:
+                print(f"PyPDF2 failed: {e}")
+        
+        if PDFPLUMBER_AVAILABLE:
+            try:
+                with pdfplumber.open(FileProcessor._as_stream(pdf_content)) as pdf:
+                    return len(pdf.pages)
+            except Exception as e:
+                print(f"pdfplumber failed: {e}")
+        
+        return 0
+    
+    @staticmethod
+    def join_pdf_pages(pages: List[str]) -> str:
+        """Join per-page text in order, skipping empty pages"""
+        return "\n\n".join(page_text for page_text in pages if page_text).strip()
+    
+    @staticmethod
+    def extract_docx_text(docx_content: FileSource) -> str:
         """Extract text from DOCX content"""
         if not DOCX_AVAILABLE:
             raise ImportError("python-docx is not installed. Please install it with: pip install python-docx")
         
         try:
-            doc = Document(io.BytesIO(docx_content))
+            doc = Document(FileProcessor._as_stream(docx_content))
             text_content = []
             
             # Extract text from paragraphs
@@ -149,6 +467,49 @@ class FileProcessor:
             print(f"DOCX extraction failed: {e}")
             return ""
     
+    @staticmethod
+    def preprocess_image(image_data: Dict[str, Any], max_edge: int, image_format: str = "JPEG", quality: int = 85) -> Dict[str, Any]:
+        """Auto-orient a base64 image from its EXIF data, cap its longest edge and re-encode it
+        
+        The original is returned when re-encoding would neither rotate, shrink
+        nor reduce the size of the image.
+        """
+        if not PIL_AVAILABLE:
+            return image_data
+        
+        try:
+            raw = base64.b64decode(image_data["data"])
+            with Image.open(io.BytesIO(raw)) as image:
+                # JPEG can decode straight to a reduced size, which is much faster for phone photos
+                image.draft("RGB", (max_edge, max_edge))
+                orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+                image = ImageOps.exif_transpose(image)
+                resized = max(image.size) > max_edge
+                image.thumbnail((max_edge, max_edge))
+                
+                if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+                    # Flatten transparency onto white, as screenshots are usually shown
+                    image = image.convert("RGBA")
+                    background = Image.new("RGB", image.size, "white")
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+                elif image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                
+                output = io.BytesIO()
+                image.save(output, format=image_format, quality=quality)
+            
+            if not resized and orientation == 1 and output.tell() >= len(raw):
+                return image_data
+            
+            return {
+                "mime_type": f"image/{image_format.lower()}",
+                "data": base64.b64encode(output.getvalue()).decode('ascii')
+            }
+        except Exception as e:
+            print(f"Image preprocessing failed: {e}")
+            return image_data
+    
     @staticmethod
     def create_mixed_content_for_gemini(processed_files: List[Dict[str, Any]]) -> List[Any]:
         """Create content array for Gemini API with mixed text and images"""
@@ -159,6 +520,13 @@ class FileProcessor:
         for file_data in processed_files:
             if file_data.get("type") == "text":
                 text_parts.append(file_data["content"])
+                pages = file_data.get("pages")
+                if pages:
+                    # Let the model flag the unread pages instead of silently dropping them
+                    text_parts[-1] += (
+                        f"\n\n[Pages {pages['skipped']} of {pages['total']} were not read because the document "
+                        f"exceeds the extraction limit. Add an Open Question noting these pages were not reviewed.]"
+                    )
         
         # Add combined text if any
         if text_parts:
@@ -1,18 +1,60 @@
+import asyncio
 import os
 import re
-from typing import Dict, List
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
 from google.generativeai import GenerativeModel, configure
 import google.generativeai as genai
 
+from .admission import AdmissionRejected, AdmissionScheduler
+from .extraction_pool import ExtractionPool
+from .image_preprocessor import ImagePreprocessor
+from .mom_store import MomStore
+from .prompt_cache import PromptCache
+from .structured_mom import StructuredOutput
+from .result_cache import ResultCache, digest_parts, digest_uploads, normalize_text
+from .token_budget import ACTION_CHUNK, ACTION_DOWNSCALE, TokenBudget
+from .transcript_chunker import TranscriptChunker
+from utils.metrics import record_files, record_tokens
+from utils.stage_timer import stage
+
+# Errors raised unchanged so callers can map them to a client status (see services.errors);
+# BudgetExceededError is a ValueError
+PASSTHROUGH_ERRORS = (ValueError, AdmissionRejected)
+
 class GeminiService:
-    def __init__(self):
+    def __init__(self, extraction_pool: Optional[ExtractionPool] = None, result_cache: Optional[ResultCache] = None,
+                 admission: Optional[AdmissionScheduler] = None, mom_store: Optional[MomStore] = None):
         """Initialize Gemini service with API key"""
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         configure(api_key=api_key)
-        self.model = GenerativeModel("gemini-2.5-flash")
+        self.model_name = "gemini-2.5-flash"
+        self.model = GenerativeModel(self.model_name)
+        
+        # Process pool for CPU-bound file extraction
+        self.extraction_pool = extraction_pool or ExtractionPool()
+        
+        # Image downscaling and re-encoding before vision calls
+        self.image_preprocessor = ImagePreprocessor(self.extraction_pool)
+        
+        # Cache of generated MOMs, shared by identical concurrent requests
+        self.result_cache = result_cache or ResultCache()
+        
+        # Concurrency cap and priority queue in front of every Gemini call
+        self.admission = admission or AdmissionScheduler()
+        
+        # Generated MOMs kept by content hash for GET downloads
+        self.mom_store = mom_store or MomStore()
+        
+        # Map-reduce settings for long transcripts
+        self.chunk_threshold_chars = int(os.getenv("MOM_CHUNK_THRESHOLD_CHARS", 60000))
+        self.chunk_max_chars = int(os.getenv("MOM_CHUNK_MAX_CHARS", 20000))
+        self.chunk_concurrency = max(1, int(os.getenv("MOM_CHUNK_CONCURRENCY", 4)))
+        
+        # Pre-flight size estimate and routing (reject, chunk or downscale)
+        self.token_budget = TokenBudget(self.chunk_threshold_chars)
         
         # System prompt for MOM generation
         self.system_prompt = """You are "MOM Builder" for Biz4Group. Your single job: take meeting notes (either text or images) and return professional, concise Minutes of Meeting (MOM). Extract, structure, and clarify as needed—while avoiding hallucinations.
@@ -109,26 +151,136 @@ Handwritten note cues → structured output*
 -@Name, initials, or team tags (e.g., @Anita, AK, QA) → potential Owner.
 -by <date> / ETA <date> / EOW / EOD → Due Date.
 -risk, blocker, dependency keywords → Risks / Dependencies."""
+        
+        # Optional JSON output rendered to the template locally (MOM_OUTPUT_FORMAT=json)
+        self.structured = StructuredOutput()
+        self.system_prompt = self.structured.system_prompt(self.system_prompt)
+        
+        # The system prompt is registered once and reused instead of resent with every request
+        self.prompt_cache = PromptCache(self.model_name, self.system_prompt)
+        
+        # Prompt for extracting partial minutes from one part of a long transcript
+        self.chunk_prompt = """You are extracting notes from ONE PART of a longer meeting transcript. Another step will merge the notes from all parts into the final Minutes of Meeting, so do not write the final minutes.
+
+From this part only, list concisely under these headings (write "None" if a heading has nothing):
+- Meeting details: title/topic, date, time, mode, location (only if stated)
+- Attendees: names and roles mentioned
+- Agenda / topics discussed
+- Key discussion points
+- Decisions: decision — owner/approver, effective date
+- Action items: action — owner — due date (use TBD when missing)
+- Risks / dependencies
+- Next steps / next meeting
+- Open questions / unclear items
+
+Keep names, dates, numbers and domain terms exactly as written. Never invent facts."""
 
     async def generate_mom_from_text(self, text: str) -> Dict:
         """Generate MOM from text input using Gemini"""
         try:
-            prompt = f"{self.system_prompt}\n\nPlease process the following meeting notes:\n\n{text}"
-            
-            response = await self.model.generate_content_async(prompt)
-            
-            return {
-                "content": response.text,
-                "format": "markdown"
-            }
+            cache_key = self._cache_key(digest_parts(["text", normalize_text(text)]))
+            return await self._with_mom_id(await self.result_cache.get_or_compute(cache_key, lambda: self._generate_from_text(text)))
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate MOM from text: {str(e)}")
 
+    async def _generate_from_text(self, text: str) -> Dict:
+        """Send meeting notes to Gemini and return the MOM"""
+        content, details = await self._prepare_text(text)
+        response = await self._generate(content)
+        
+        return self._build_result(response.text, details)
+
+    async def _prepare_text(self, text: str) -> Tuple[str, Dict]:
+        """Budget a text request and build its prompt, chunking transcripts that are too long
+        
+        Returns the content and the details (such as the budget) reported with the result.
+        """
+        budget = self.token_budget.plan_text(text, self.system_prompt)
+        self.token_budget.check(budget)
+        
+        if budget["action"] == ACTION_CHUNK:
+            return await self._build_chunked_content(text), {"budget": budget}
+        
+        with stage("prompt"):
+            content = self._build_text_prompt(text)
+        with stage("token_count"):
+            budget = await self._count_exact(content, budget)
+        self.token_budget.check(budget)
+        return content, {"budget": budget}
+
+    async def _count_exact(self, content: Any, budget: Dict) -> Dict:
+        """Count tokens on the model that will serve the request
+        
+        In the cached_content and system_instruction modes the system prompt
+        is carried by the model, not the contents, and the count includes it
+        only when made on that model.
+        """
+        if not self.token_budget.exact_counting:
+            return budget
+        model = await self.prompt_cache.get_model()
+        return await self.token_budget.count_exact(model, self.prompt_cache.prepare(content), budget)
+    
+    async def _build_chunked_content(self, text: str) -> str:
+        """Reduce a long transcript to partial notes per chunk and build the merge prompt"""
+        chunks = TranscriptChunker.split(text, self.chunk_max_chars)
+        with stage("map", chunks=len(chunks)):
+            partial_notes = await self._extract_partial_notes(chunks)
+        merged_parts = "\n\n".join(
+            f"--- Part {index} of {len(partial_notes)} ---\n{notes}" for index, notes in enumerate(partial_notes, start=1)
+        )
+        return (
+            f"The meeting transcript was too long to process at once. "
+            f"Below are notes extracted from each consecutive part, in order. Merge them into one MOM, "
+            f"removing duplicates across parts:\n\n{merged_parts}"
+        )
+
+    async def _extract_partial_notes(self, chunks: List[str]) -> List[str]:
+        """Map step: extract partial minutes from each chunk with bounded concurrency"""
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        
+        async def extract(chunk: str) -> str:
+            async with semaphore, self.admission.slot():
+                response = await self.model.generate_content_async(
+                    f"{self.chunk_prompt}\n\nTranscript part:\n\n{chunk}"
+                )
+                record_tokens(self._usage_metadata(response))
+                return response.text
+        
+        return await asyncio.gather(*[extract(chunk) for chunk in chunks])
+
+    def _build_result(self, text: str, details: Dict) -> Dict:
+        """Result for the model's output, rendering structured output to Markdown first"""
+        if self.structured.enabled:
+            text, structured_details = self.structured.render(text)
+            details = {**details, **structured_details}
+        return {
+            "content": text,
+            "format": "markdown",
+            **details
+        }
+
+    async def _with_mom_id(self, result: Dict) -> Dict:
+        """Store a generated MOM for downloads and add its id to the result"""
+        if not result.get("content"):
+            return result
+        return dict(result, mom_id=await self.mom_store.put(result["content"]))
+
+    def _build_text_prompt(self, text: str) -> str:
+        """Prompt for generating a MOM from meeting notes"""
+        return f"Please process the following meeting notes:\n\n{text}"
+
+    def _cache_key(self, input_digest: str) -> str:
+        """Result cache key for this model and system prompt"""
+        return self.result_cache.make_key(self.model_name, self.system_prompt, input_digest)
+
     async def generate_mom_from_images(self, images: List[str]) -> Dict:
         """Generate MOM from images using Gemini Vision"""
         try:
             if not images or len(images) == 0:
                 raise ValueError("No images provided")
+            record_files(len(images))
             
             # Convert base64 images to the format expected by Gemini
             image_parts = []
@@ -153,13 +305,11 @@ Handwritten note cues → structured output*
                     raise Exception(f"Failed to process image {i}: {str(e)}")
             
             # Generate content with both text and images
-            content_parts = [self.system_prompt] + image_parts
-            response = await self.model.generate_content_async(content_parts)
+            response = await self._generate(image_parts)
             
-            return {
-                "content": response.text,
-                "format": "markdown"
-            }
+            return await self._with_mom_id(self._build_result(response.text, {}))
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate MOM from images: {str(e)}")
     
@@ -168,27 +318,197 @@ Handwritten note cues → structured output*
         try:
             if not files or len(files) == 0:
                 raise ValueError("No files provided")
+            record_files(len(files))
             
-            from .file_processor import FileProcessor
+            loop = asyncio.get_running_loop()
+            input_digest = await loop.run_in_executor(None, digest_parts, ["files"] + list(files))
             
-            # Process all files and extract content
-            processed_files = FileProcessor.process_files(files)
+            async def generate() -> Dict:
+                # Extract content from all files concurrently in the process pool
+                with stage("extraction"):
+                    processed_files = await self.extraction_pool.process_files(files)
+                return await self._generate_from_processed_files(processed_files)
             
-            if not processed_files:
-                raise ValueError("No valid content could be extracted from the uploaded files")
-            
-            # Create mixed content for Gemini
-            content_parts = FileProcessor.create_mixed_content_for_gemini(processed_files)
+            return await self._with_mom_id(await self.result_cache.get_or_compute(self._cache_key(input_digest), generate))
+        except PASSTHROUGH_ERRORS:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to generate MOM from files: {str(e)}")
+    
+    async def generate_mom_from_uploads(self, uploads: List[Tuple[str, BinaryIO]]) -> Dict:
+        """Generate MOM from uploaded file handles given as (mime_type, file) pairs"""
+        try:
+            if not uploads or len(uploads) == 0:
+                raise ValueError("No files provided")
+            record_files(len(uploads))
             
-            # Add system prompt at the beginning
-            final_content = [self.system_prompt] + content_parts
+            loop = asyncio.get_running_loop()
+            input_digest = await loop.run_in_executor(None, digest_uploads, uploads)
             
-            # Generate content with Gemini
-            response = await self.model.generate_content_async(final_content)
+            async def generate() -> Dict:
+                # Extract content from the spooled upload files in the process pool
+                with stage("extraction"):
+                    processed_files = await self.extraction_pool.process_uploads(uploads)
+                return await self._generate_from_processed_files(processed_files)
             
-            return {
-                "content": response.text,
-                "format": "markdown"
-            }
+            return await self._with_mom_id(await self.result_cache.get_or_compute(self._cache_key(input_digest), generate))
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate MOM from files: {str(e)}")
+    
+    def _build_file_content(self, processed_files: List[Dict]) -> List[Any]:
+        """Content parts for generating a MOM from extracted file content"""
+        from .file_processor import FileProcessor
+        
+        # Create mixed content for Gemini
+        return FileProcessor.create_mixed_content_for_gemini(processed_files)
+    
+    async def _prepare_files(self, processed_files: List[Dict]) -> Tuple[List[Any], Dict]:
+        """Budget a file request and build its content, preprocessing images on the way
+        
+        Images are decoded once: to the preprocessor's usual size, or to the
+        smaller downscale edge when they would cost too many tokens. Returns
+        the content and the details (budget, image savings) reported with the
+        result.
+        """
+        if not processed_files:
+            raise ValueError("No valid content could be extracted from the uploaded files")
+        
+        budget = self.token_budget.plan_files(processed_files, self.system_prompt)
+        max_edge = self.token_budget.downscale_max_edge if budget["action"] == ACTION_DOWNSCALE else None
+        processed_files, image_report = await self.image_preprocessor.process(processed_files, max_edge)
+        
+        if image_report or max_edge:
+            preprocessed = self.token_budget.plan_files(processed_files, self.system_prompt)
+            if preprocessed["image_tokens"] < budget["image_tokens"]:
+                preprocessed["downscaled_from_tokens"] = budget["image_tokens"]
+            if preprocessed["action"] == ACTION_DOWNSCALE:
+                # Already as small as we make them
+                preprocessed["action"] = "accept"
+            budget = preprocessed
+        self.token_budget.check(budget)
+        
+        with stage("prompt"):
+            content = self._build_file_content(processed_files)
+        with stage("token_count"):
+            budget = await self._count_exact(content, budget)
+        self.token_budget.check(budget)
+        
+        details = {"budget": budget}
+        if image_report:
+            details["image_preprocessing"] = image_report
+        skipped_pages = [item["pages"] for item in processed_files if item.get("pages")]
+        if skipped_pages:
+            details["skipped_pages"] = skipped_pages
+        return content, details
+    
+    async def _generate_from_processed_files(self, processed_files: List[Dict]) -> Dict:
+        """Send extracted file content to Gemini and return the MOM"""
+        content, details = await self._prepare_files(processed_files)
+        
+        # Generate content with Gemini
+        response = await self._generate(content)
+        
+        return self._build_result(response.text, details)
+    
+    async def stream_mom_from_text(self, text: str) -> AsyncIterator[Dict]:
+        """Stream a MOM generated from text as chunk events followed by a done event"""
+        cache_key = self._cache_key(digest_parts(["text", normalize_text(text)]))
+        
+        async def build_content() -> Tuple[str, Dict]:
+            return await self._prepare_text(text)
+        
+        async for event in self._stream_generation(cache_key, build_content):
+            yield event
+    
+    async def stream_mom_from_uploads(self, uploads: List[Tuple[str, BinaryIO]]) -> AsyncIterator[Dict]:
+        """Stream a MOM generated from uploaded files as chunk events followed by a done event"""
+        if not uploads or len(uploads) == 0:
+            raise ValueError("No files provided")
+        record_files(len(uploads))
+        
+        loop = asyncio.get_running_loop()
+        input_digest = await loop.run_in_executor(None, digest_uploads, uploads)
+        
+        async def build_content() -> Tuple[List[Any], Dict]:
+            with stage("extraction"):
+                processed_files = await self.extraction_pool.process_uploads(uploads)
+            return await self._prepare_files(processed_files)
+        
+        async for event in self._stream_generation(self._cache_key(input_digest), build_content):
+            yield event
+    
+    async def _stream_generation(self, cache_key: str, build_content: Callable[[], Awaitable[Tuple[Any, Dict]]]) -> AsyncIterator[Dict]:
+        """Stream Gemini output for a prompt, serving cached results in a single chunk
+        
+        ``build_content`` returns the content and the details to report with the result.
+        """
+        cached = await self.result_cache.cache.get_async(cache_key) if self.result_cache.cache.enabled else None
+        if cached is not None:
+            yield {"event": "chunk", "data": {"text": cached["content"]}}
+            yield {"event": "done", "data": dict(await self._with_mom_id(cached), cached=True, usage={})}
+            return
+        
+        content, details = await build_content()
+        
+        # The slot is held until the last chunk arrives, not just until the call returns
+        chunks = []
+        async with self.admission.slot():
+            with stage("generation", model=self.model_name, stream=True):
+                response = await self._call_model(content, stream=True)
+                async for chunk in response:
+                    chunk_text = self._chunk_text(chunk)
+                    if chunk_text:
+                        chunks.append(chunk_text)
+                        if not self.structured.enabled:
+                            yield {"event": "chunk", "data": {"text": chunk_text}}
+        
+        result = self._build_result("".join(chunks), details)
+        if self.structured.enabled:
+            # Partial JSON cannot be displayed; the rendered MOM is sent in one chunk
+            yield {"event": "chunk", "data": {"text": result["content"]}}
+        if self.result_cache.cache.enabled and result["content"]:
+            await self.result_cache.cache.set_async(cache_key, result)
+        
+        self.prompt_cache.record_usage(response)
+        usage = self._usage_metadata(response)
+        record_tokens(usage)
+        yield {"event": "done", "data": dict(await self._with_mom_id(result), cached=False, usage=usage)}
+    
+    async def _generate(self, contents: Any) -> Any:
+        """Call Gemini once a concurrency slot is free and record prompt cache usage"""
+        async with self.admission.slot():
+            with stage("generation", model=self.model_name, stream=False):
+                response = await self._call_model(contents)
+        self.prompt_cache.record_usage(response)
+        record_tokens(self._usage_metadata(response))
+        return response
+    
+    async def _call_model(self, contents: Any, stream: bool = False) -> Any:
+        """Call Gemini with the system prompt supplied by the prompt cache"""
+        model = await self.prompt_cache.get_model()
+        return await model.generate_content_async(
+            self.prompt_cache.prepare(contents), stream=stream, generation_config=self.structured.generation_config
+        )
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of a streamed response chunk; chunks without text parts are skipped"""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+    
+    @staticmethod
+    def _usage_metadata(response) -> Dict[str, int]:
+        """Token usage reported by Gemini, when the SDK exposes it"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return {}
+        return {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+            "output_tokens": getattr(usage, "candidates_token_count", 0),
+            "total_tokens": getattr(usage, "total_token_count", 0),
+            "cached_prompt_tokens": getattr(usage, "cached_content_token_count", 0),
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .content_cache import ContentCache, content_hash
+from .extraction_pool import ExtractionPool
+from .file_processor import PIL_AVAILABLE, FileProcessor
+from utils.stage_timer import stage
+
+try:
+    from PIL import features
+    WEBP_AVAILABLE = features.check("webp")
+except ImportError:
+    WEBP_AVAILABLE = False
+
+
+def _preprocess_image(image_data: Dict[str, Any], max_edge: int, image_format: str, quality: int) -> Dict[str, Any]:
+    """Worker entry point for preprocessing one base64 image"""
+    return FileProcessor.preprocess_image(image_data, max_edge, image_format, quality)
+
+
+def _image_digest(data: str) -> str:
+    """Hash the decoded bytes of a base64 image"""
+    return content_hash(base64.b64decode(data))
+
+
+def _encoded_size(data: str) -> int:
+    """Decoded size in bytes of a base64 string, without decoding it"""
+    return len(data) * 3 // 4 - data[-2:].count("=")
+
+
+class ImagePreprocessor:
+    """Shrinks and re-encodes images before they are sent to Gemini
+
+    Each image is decoded once in the extraction pool, rotated according to
+    its EXIF orientation, capped at ``IMAGE_MAX_EDGE`` pixels on its longest
+    edge and re-encoded as ``IMAGE_FORMAT`` (``webp`` or ``jpeg``) at
+    ``IMAGE_QUALITY``. Results are cached by a hash of the input image and the
+    settings (``IMAGE_CACHE_MAX_BYTES``, ``IMAGE_CACHE_DIR``). Set
+    ``IMAGE_PREPROCESS=false`` to send images unchanged unless the token
+    budget asks for a downscale.
+    """
+
+    def __init__(self, extraction_pool: ExtractionPool, cache: Optional[ContentCache] = None):
+        self.extraction_pool = extraction_pool
+        self.enabled = PIL_AVAILABLE and os.getenv("IMAGE_PREPROCESS", "true").lower() == "true"
+        self.max_edge = int(os.getenv("IMAGE_MAX_EDGE", 1536))
+        self.quality = int(os.getenv("IMAGE_QUALITY", 80))
+
+        image_format = os.getenv("IMAGE_FORMAT", "webp").upper()
+        if image_format == "JPG" or (image_format == "WEBP" and not WEBP_AVAILABLE):
+            image_format = "JPEG"
+        self.image_format = image_format
+
+        self.cache = cache or ContentCache.from_env("IMAGE_CACHE")
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def process(self, processed_files: List[Dict[str, Any]], max_edge: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Preprocess every image in a processed file list, keeping order
+
+        ``max_edge`` lowers the edge cap for this call, as the token budget's
+        downscale route does. Returns the new list and a report of the bytes
+        saved and the latency the stage added.
+        """
+        images = [item for item in processed_files if "mime_type" in item]
+        if not images or not PIL_AVAILABLE or (not self.enabled and max_edge is None):
+            return processed_files, {}
+
+        started = time.perf_counter()
+        max_edge = min(max_edge, self.max_edge) if max_edge else self.max_edge
+        with stage("image_preprocessing"):
+            results = await asyncio.gather(*[
+                self._process_one(item, max_edge) if "mime_type" in item else self._unchanged(item)
+                for item in processed_files
+            ])
+
+        processed = [item for item, _ in results]
+        cache_hits = sum(1 for _, hit in results if hit)
+        bytes_in = sum(_encoded_size(item["data"]) for item in images)
+        bytes_out = sum(_encoded_size(item["data"]) for item in processed if "mime_type" in item)
+
+        with self._lock:
+            self.images += len(images)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+        return processed, {
+            "images": len(images),
+            "cache_hits": cache_hits,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "bytes_saved": bytes_in - bytes_out,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def _process_one(self, item: Dict[str, Any], max_edge: int) -> Tuple[Dict[str, Any], bool]:
+        """Preprocess one image, serving it from the cache when the same input was seen before"""
+        key = None
+        if self.cache.enabled:
+            loop = asyncio.get_running_loop()
+            digest = await loop.run_in_executor(None, _image_digest, item["data"])
+            key = f"{digest}:{max_edge}:{self.image_format}:{self.quality}"
+            cached = await self.cache.get_async(key)
+            if cached is not None:
+                return cached, True
+
+        result = await self.extraction_pool.run(_preprocess_image, item, max_edge, self.image_format, self.quality)
+        if key is not None:
+            await self.cache.set_async(key, result)
+        return result, False
+
+    @staticmethod
+    async def _unchanged(item: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        return item, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return totals across requests plus cache counters"""
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "format": self.image_format,
+                "max_edge": self.max_edge,
+                "images": self.images,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+        stats["cache"] = self.cache.stats()
+        return stats
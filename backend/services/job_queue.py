@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .admission import PRIORITY_FILES, PRIORITY_INTERACTIVE, AdmissionRejected
+from .errors import error_status
+from .job_store import STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, JobStore, create_job_store
+from utils.metrics import record_error, track_request
+from utils.stage_timer import stage
+from utils.timezone_helper import TimezoneHelper
+
+JOB_KIND_TEXT = "text"
+JOB_KIND_FILES = "files"
+
+
+class JobQueue:
+    """Runs MOM generation in background workers and tracks progress in a job store
+
+    ``submit`` records a queued job and returns immediately; ``JOB_WORKERS``
+    workers run the regular ``GeminiService`` pipelines and write the status,
+    per-stage timings and result back to the store, where clients poll it by
+    job id. Finished jobs are kept for ``JOB_TTL_SECONDS``. Inputs are only
+    held in memory, so jobs still pending when a process stops are marked
+    failed when the next one starts on the same store.
+    """
+
+    def __init__(self, gemini_service: Any, store: Optional[JobStore] = None, workers: Optional[int] = None):
+        self.gemini_service = gemini_service
+        self.store = store or create_job_store()
+        self.workers = max(1, workers or int(os.getenv("JOB_WORKERS", 4)))
+        self.max_pending = int(os.getenv("JOB_MAX_PENDING", 1000))
+        self.ttl_seconds = int(os.getenv("JOB_TTL_SECONDS", 86400))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._last_prune = 0.0
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running event loop"""
+        interrupted = await self.store.fail_unfinished_async("Job was interrupted by a server restart")
+        if interrupted:
+            print(f"Marked {interrupted} interrupted jobs as failed")
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks; queued jobs are left for fail_unfinished on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: Any) -> Dict[str, Any]:
+        """Record a new job and queue it for the workers"""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.full():
+            raise AdmissionRejected("Too many pending jobs, please retry shortly", 30)
+
+        await self._prune()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": STATUS_QUEUED,
+            "created_at": TimezoneHelper.get_current_ist_timestamp(),
+            "started_at": None,
+            "finished_at": None,
+            "stages": {},
+            "result": None,
+            "error": None,
+            "error_status": None,
+        }
+        await self.store.create_async(job)
+        try:
+            self._queue.put_nowait((job["id"], kind, payload, time.perf_counter()))
+        except asyncio.QueueFull:
+            # Filled up by other submissions while the job was being stored
+            rejected = AdmissionRejected("Too many pending jobs, please retry shortly", 30)
+            await self.store.update_async(job["id"], status=STATUS_FAILED, error=str(rejected), error_status=503)
+            raise rejected
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get_async(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, kind, payload, submitted = await self._queue.get()
+            try:
+                await self._run(job_id, kind, payload, time.perf_counter() - submitted)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A store write failed (e.g. sqlite locked or disk full); keep this worker alive
+                print(f"Job {job_id} failed outside the pipeline: {e}")
+                await self._mark_failed(job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _mark_failed(self, job_id: str, error: Exception) -> None:
+        """Record a job as failed after an unexpected error, if the store accepts the write"""
+        try:
+            await self.store.update_async(
+                job_id,
+                status=STATUS_FAILED,
+                finished_at=TimezoneHelper.get_current_ist_timestamp(),
+                error=f"Job failed: {error}",
+                error_status=500,
+            )
+        except Exception as e:
+            print(f"Could not mark job {job_id} as failed: {e}")
+
+    async def _run(self, job_id: str, kind: str, payload: Any, pending_seconds: float) -> None:
+        """Run one job through the matching GeminiService pipeline and store the outcome"""
+        await self.store.update_async(job_id, status=STATUS_RUNNING, started_at=TimezoneHelper.get_current_ist_timestamp())
+
+        priority = PRIORITY_INTERACTIVE if kind == JOB_KIND_TEXT else PRIORITY_FILES
+        with track_request("/api/jobs") as timer, self.gemini_service.admission.request_context(priority) as ticket:
+            timer.add("pending", pending_seconds)
+            try:
+                with stage("total"):
+                    if kind == JOB_KIND_TEXT:
+                        result = await self.gemini_service.generate_mom_from_text(payload)
+                    else:
+                        result = await self.gemini_service.generate_mom_from_files(payload)
+                result["queue_wait_ms"] = ticket.wait_ms
+                fields = {"status": STATUS_SUCCEEDED, "result": result}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                record_error(e)
+                failure = error_status(e)
+                fields = {"status": STATUS_FAILED, "error": failure.detail, "error_status": failure.status}
+
+        await self.store.update_async(
+            job_id,
+            finished_at=TimezoneHelper.get_current_ist_timestamp(),
+            stages=timer.as_dict(),
+            **fields,
+        )
+
+    async def _prune(self) -> None:
+        """Drop expired jobs, at most once a minute"""
+        now = time.time()
+        if now - self._last_prune >= 60:
+            self._last_prune = now
+            await self.store.prune_async(self.ttl_seconds)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+        }
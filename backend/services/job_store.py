@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Job lifecycle
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+
+class JobStore:
+    """Storage for job state; jobs are plain dicts keyed by their ``id``
+
+    Event-loop code uses the ``*_async`` variants. For stores that block on
+    I/O (``blocking = True``) they run the call in the default executor.
+    """
+
+    blocking = False
+
+    def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Delete finished jobs older than ``max_age_seconds`` and return how many were removed"""
+        raise NotImplementedError
+
+    def fail_unfinished(self, error: str) -> int:
+        """Mark jobs left queued or running by a process that is no longer running as failed"""
+        return 0
+
+    async def create_async(self, job: Dict[str, Any]) -> None:
+        await self._call(self.create, job)
+
+    async def update_async(self, job_id: str, **fields: Any) -> None:
+        await self._call(self.update, job_id, **fields)
+
+    async def get_async(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.get, job_id)
+
+    async def prune_async(self, max_age_seconds: float) -> int:
+        return await self._call(self.prune, max_age_seconds)
+
+    async def fail_unfinished_async(self, error: str) -> int:
+        return await self._call(self.fail_unfinished, error)
+
+    async def _call(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        if not self.blocking:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+class MemoryJobStore(JobStore):
+    """Job state held in process memory; lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._created: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            self._created[job["id"]] = time.time()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def prune(self, max_age_seconds: float) -> int:
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, created in self._created.items()
+                if created < cutoff and self._jobs[job_id]["status"] in FINISHED_STATUSES
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+                del self._created[job_id]
+        return len(expired)
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this id is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, under another user
+        return True
+    return True
+
+
+class SQLiteJobStore(JobStore):
+    """Job state in a local SQLite file, so finished jobs survive restarts
+
+    Several server processes on one host (uvicorn or gunicorn workers) can
+    share the file. Each job records the id of the process that queued it,
+    so a process starting up only fails the unfinished jobs of processes
+    that are gone, never those another live worker is still running.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, owner: Optional[int] = None):
+        self.path = path
+        self.owner = owner if owner is not None else os.getpid()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL NOT NULL, data TEXT NOT NULL, owner INTEGER)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "owner" not in columns:
+            # Files created before jobs recorded their process
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self._conn.commit()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created, data, owner) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["status"], time.time(), json.dumps(job), self.owner),
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            job = json.loads(row[0])
+            job.update(fields)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, data = ? WHERE id = ?",
+                (job["status"], json.dumps(job), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def prune(self, max_age_seconds: float) -> int:
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE created < ? AND status IN ({placeholders})",
+                (time.time() - max_age_seconds, *FINISHED_STATUSES),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def fail_unfinished(self, error: str) -> int:
+        """Fail unfinished jobs whose process has exited; an earlier process with this one's id has too"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data, owner FROM jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+            interrupted = [
+                (job_id, data) for job_id, data, owner in rows
+                if owner is None or owner == self.owner or not _process_alive(owner)
+            ]
+            for job_id, data in interrupted:
+                job = json.loads(data)
+                job.update(status=STATUS_FAILED, error=error)
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, data = ? WHERE id = ?", (STATUS_FAILED, json.dumps(job), job_id)
+                )
+            self._conn.commit()
+        return len(interrupted)
+
+
+def create_job_store() -> JobStore:
+    """Job store selected by ``JOB_STORE`` (``memory`` or ``sqlite`` at ``JOB_STORE_PATH``)"""
+    kind = os.getenv("JOB_STORE", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "jobs.db"))
+    if kind == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE: {kind}")
@@ -0,0 +1,209 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .content_cache import content_hash
+from utils.metrics import record_cache
+
+# Block kinds
+HEADING = "heading"
+PARAGRAPH = "paragraph"
+BULLET = "bullet"
+NUMBERED = "numbered"
+TABLE = "table"
+BLANK = "blank"
+
+# Like the original exporter, any line starting with "#" is a heading, with or without a space
+HEADING_PATTERN = re.compile(r"^(#+)\s*(.*)$")
+BULLET_PATTERN = re.compile(r"^[-*+]\s+(.*)$")
+NUMBERED_PATTERN = re.compile(r"^(\d+)\.\s+(.*)$")
+TABLE_SEPARATOR_CELL_PATTERN = re.compile(r"^:?-+:?$")
+
+# Inline markup, in order of precedence: bold, italic, links (kept as their text).
+# The content of each is parsed again, so links and emphasis can nest.
+INLINE_PATTERN = re.compile(
+    r"\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<bold_underscore>.+?)__"
+    r"|\*(?P<italic>[^*\s](?:[^*]*[^*\s])?)\*"
+    r"|(?<!\w)_(?P<italic_underscore>[^_\s](?:[^_]*[^_\s])?)_(?!\w)"
+    r"|\[(?P<link>[^\]]+)\]\([^)]+\)"
+)
+
+
+class Span(NamedTuple):
+    """A run of inline text with its emphasis"""
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+
+Spans = Tuple[Span, ...]
+
+
+class Block(NamedTuple):
+    """One block-level element of a Markdown document
+
+    ``spans`` holds the inline content of headings, paragraphs and list
+    items; ``rows`` holds table rows (header first), each a tuple of cells.
+    ``indent`` is the line's leading whitespace, which marks nested list
+    items and continuation lines.
+    """
+    kind: str
+    spans: Spans = ()
+    level: int = 0
+    number: int = 0
+    rows: Tuple[Tuple[Spans, ...], ...] = ()
+    indent: str = ""
+
+
+Document = Tuple[Block, ...]
+
+
+def plain_text(spans: Spans) -> str:
+    """Inline content without any emphasis"""
+    return "".join(span.text for span in spans)
+
+
+def parse_inline(text: str, bold: bool = False, italic: bool = False) -> Spans:
+    """Split a line into spans of plain, bold and italic text; links keep only their text
+
+    Markup inside bold, italic and link text is parsed too, with the
+    enclosing emphasis carried into the inner spans.
+    """
+    spans: List[Span] = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            spans.append(Span(text[position:match.start()], bold, italic))
+        kind = match.lastgroup
+        if kind in ("bold", "bold_underscore"):
+            spans.extend(parse_inline(match.group(kind), True, italic))
+        elif kind in ("italic", "italic_underscore"):
+            spans.extend(parse_inline(match.group(kind), bold, True))
+        else:
+            spans.extend(parse_inline(match.group(kind), bold, italic))
+        position = match.end()
+    if position < len(text):
+        spans.append(Span(text[position:], bold, italic))
+    return tuple(spans)
+
+
+def _is_table_row(line: str) -> bool:
+    return len(line) > 1 and line.startswith("|") and line.endswith("|")
+
+
+def _table_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line[1:-1].split("|")]
+
+
+def _table_block(lines: List[str]) -> Optional[Block]:
+    """Build a table from its rows, dropping the header separator"""
+    rows = []
+    for line in lines:
+        cells = _table_cells(line)
+        if all(not cell or TABLE_SEPARATOR_CELL_PATTERN.match(cell) for cell in cells):
+            continue
+        rows.append(tuple(parse_inline(cell) for cell in cells))
+    return Block(TABLE, rows=tuple(rows)) if rows else None
+
+
+def parse_markdown_uncached(content: str) -> Document:
+    """Parse the Markdown subset MOMs use into blocks, one pass over the lines"""
+    blocks: List[Block] = []
+    table_lines: List[str] = []
+
+    for raw_line in content.split("\n"):
+        line = raw_line.strip()
+        indent = raw_line[:len(raw_line) - len(raw_line.lstrip())]
+
+        if _is_table_row(line):
+            table_lines.append(line)
+            continue
+        if table_lines:
+            table = _table_block(table_lines)
+            if table:
+                blocks.append(table)
+            table_lines = []
+
+        if not line:
+            blocks.append(Block(BLANK))
+            continue
+
+        match = HEADING_PATTERN.match(line)
+        if match:
+            blocks.append(Block(HEADING, parse_inline(match.group(2).strip()), level=len(match.group(1))))
+            continue
+
+        match = BULLET_PATTERN.match(line)
+        if match:
+            blocks.append(Block(BULLET, parse_inline(match.group(1).strip()), indent=indent))
+            continue
+
+        match = NUMBERED_PATTERN.match(line)
+        if match:
+            blocks.append(
+                Block(NUMBERED, parse_inline(match.group(2).strip()), number=int(match.group(1)), indent=indent)
+            )
+            continue
+
+        blocks.append(Block(PARAGRAPH, parse_inline(line), indent=indent))
+
+    if table_lines:
+        table = _table_block(table_lines)
+        if table:
+            blocks.append(table)
+
+    return tuple(blocks)
+
+
+class MarkdownParser:
+    """Parses MOM Markdown once and caches the result by content hash
+
+    Exporting the same MOM in several formats reuses one parse. Up to
+    ``MARKDOWN_PARSE_CACHE_SIZE`` documents are kept, least recently used
+    first out. Parsed documents are immutable tuples and safe to share.
+    """
+
+    def __init__(self, cache_size: Optional[int] = None):
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("MARKDOWN_PARSE_CACHE_SIZE", 256))
+        self._cache: "OrderedDict[str, Document]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, content: str) -> Document:
+        key = content_hash(content.encode("utf-8"))
+        with self._lock:
+            document = self._cache.get(key)
+            if document is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache("markdown_parse", document is not None)
+        if document is not None:
+            return document
+
+        document = parse_markdown_uncached(content)
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = document
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return document
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+# Shared by every renderer in the process
+markdown_parser = MarkdownParser()
+
+
+def parse_markdown(content: str) -> Document:
+    """Parse Markdown through the shared cache"""
+    return markdown_parser.parse(content)
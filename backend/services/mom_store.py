@@ -0,0 +1,73 @@
+import os
+from typing import Dict, Optional, Tuple
+
+from .content_cache import ContentCache, content_hash
+from .file_converter import FileConverter
+
+# Download formats and their media types
+MOM_MEDIA_TYPES = {
+    "md": "text/markdown",
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def mom_id_for(content: str) -> str:
+    """Content-hash id of a MOM's Markdown"""
+    return content_hash(content.encode("utf-8"))[:32]
+
+
+class MomStore:
+    """Keeps generated MOMs server-side so downloads need no request body
+
+    Each MOM's Markdown is stored under a hash of its content for
+    ``MOM_STORE_TTL_SECONDS`` (``MOM_STORE_MAX_BYTES``, ``MOM_STORE_DIR`` for
+    a disk tier that survives restarts). Rendered downloads are kept in a
+    memory cache (``MOM_ARTIFACT_CACHE_MAX_BYTES``) together with a strong
+    ETag, a hash of the exact bytes served.
+    """
+
+    def __init__(self, store: Optional[ContentCache] = None, artifacts: Optional[ContentCache] = None):
+        self.store = store or ContentCache.from_env("MOM_STORE", default_ttl_seconds=86400)
+        self.artifacts = artifacts or ContentCache(
+            max_bytes=int(os.getenv("MOM_ARTIFACT_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+            ttl_seconds=self.store.ttl_seconds,
+            name="mom_artifacts",
+        )
+
+    async def put(self, content: str) -> str:
+        """Store a MOM and return its id; storing the same MOM again refreshes its TTL"""
+        mom_id = mom_id_for(content)
+        await self.store.set_async(mom_id, content)
+        return mom_id
+
+    def get(self, mom_id: str) -> Optional[str]:
+        return self.store.get(mom_id)
+
+    def artifact(self, mom_id: str, format: str) -> Optional[Tuple[bytes, str]]:
+        """Return a MOM rendered as ``format`` and its ETag, or None if the id is unknown or expired"""
+        # The MOM must still be stored; a cached render alone does not keep an expired id alive
+        content = self.get(mom_id)
+        if content is None:
+            return None
+
+        key = f"{mom_id}:{format}"
+        cached = self.artifacts.get(key)
+        if cached is not None:
+            return cached["body"], cached["etag"]
+
+        if format == "md":
+            body = content.encode("utf-8")
+        elif format == "txt":
+            body = FileConverter.markdown_to_txt(content).encode("utf-8")
+        elif format == "docx":
+            body = FileConverter.markdown_to_docx(content).getvalue()
+        else:
+            raise ValueError(f"Unsupported format: {format}")
+
+        etag = f'"{content_hash(body)[:32]}"'
+        self.artifacts.set(key, {"body": body, "etag": etag})
+        return body, etag
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"store": self.store.stats(), "artifacts": self.artifacts.stats()}
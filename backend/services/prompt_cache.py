@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from google.generativeai import GenerativeModel
+
+# Explicit context caching needs google-generativeai >= 0.7
+try:
+    from google.generativeai import caching
+    CONTEXT_CACHING_AVAILABLE = True
+except ImportError:
+    CONTEXT_CACHING_AVAILABLE = False
+
+Contents = Union[str, List[Any]]
+
+# Prompt cache modes, from most to least saving
+MODE_CACHED_CONTENT = "cached_content"
+MODE_SYSTEM_INSTRUCTION = "system_instruction"
+MODE_INLINE = "inline"
+
+
+class PromptCache:
+    """Registers the static system prompt once and reuses it across Gemini calls
+
+    Modes (``PROMPT_CACHE_MODE``, default ``auto``):
+
+    - ``cached_content``: the prompt is uploaded once as a Gemini cached
+      context and requests only carry the meeting content. The cache is
+      recreated when it is within ``PROMPT_CACHE_REFRESH_SECONDS`` of its
+      ``PROMPT_CACHE_TTL_SECONDS`` expiry.
+    - ``system_instruction``: the prompt is set once on the model as its
+      system instruction instead of being added to every request's content.
+    - ``inline``: local stand-in that prepends the prompt to each request
+      exactly as before; used when the SDK supports neither of the above and
+      by tests that must not reach the API.
+
+    ``auto`` tries the modes in that order, falling back when a mode is not
+    available (for example when the prompt is below the model's minimum
+    cacheable size).
+    """
+
+    def __init__(self, model_name: str, system_prompt: str, mode: Optional[str] = None):
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.requested_mode = mode or os.getenv("PROMPT_CACHE_MODE", "auto")
+        self.ttl_seconds = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", 3600))
+        self.refresh_seconds = int(os.getenv("PROMPT_CACHE_REFRESH_SECONDS", 300))
+
+        self.mode: Optional[str] = None
+        self._model: Optional[GenerativeModel] = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats_lock = threading.Lock()
+
+        self.refreshes = 0
+        self.requests = 0
+        self.prompt_tokens_saved = 0
+        self._prompt_tokens: Optional[int] = None
+
+    async def get_model(self) -> GenerativeModel:
+        """Return a model that already carries the system prompt, refreshing it when due"""
+        if self._model is not None and not self._needs_refresh():
+            return self._model
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._model is None or self._needs_refresh():
+                loop = asyncio.get_running_loop()
+                self._model = await loop.run_in_executor(None, self._build_model)
+            return self._model
+
+    def prepare(self, contents: Contents) -> Contents:
+        """Add the system prompt to request contents when the model does not carry it"""
+        if self.mode != MODE_INLINE:
+            return contents
+        if isinstance(contents, str):
+            return f"{self.system_prompt}\n\n{contents}"
+        return [self.system_prompt] + list(contents)
+
+    def record_usage(self, response: Any) -> None:
+        """Count the prompt tokens served from the cache for one response"""
+        usage = getattr(response, "usage_metadata", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", 0) if usage is not None else 0
+
+        with self._stats_lock:
+            self.requests += 1
+            if self.mode == MODE_CACHED_CONTENT:
+                self.prompt_tokens_saved += cached_tokens or self._prompt_tokens or 0
+
+    def _needs_refresh(self) -> bool:
+        now = time.time()
+        if self.mode == MODE_CACHED_CONTENT:
+            return now >= self._expires_at - self.refresh_seconds
+        # After falling back in auto mode, try context caching again once per TTL
+        return self.requested_mode == "auto" and now >= self._retry_at
+
+    def _build_model(self) -> GenerativeModel:
+        """Create the model for the first available mode (runs in a thread; the SDK calls are blocking)"""
+        modes = [self.requested_mode]
+        if self.requested_mode == "auto":
+            modes = [MODE_CACHED_CONTENT, MODE_SYSTEM_INSTRUCTION, MODE_INLINE]
+
+        for mode in modes:
+            try:
+                model = self._create(mode)
+            except Exception as e:
+                print(f"Prompt cache mode {mode} unavailable: {e}")
+                continue
+            if mode != self.mode:
+                print(f"Prompt cache using {mode} mode")
+            self.mode = mode
+            self._retry_at = time.time() + self.ttl_seconds
+            return model
+
+        # Nothing else worked; keep the old per-request behaviour
+        self.mode = MODE_INLINE
+        self._retry_at = time.time() + self.ttl_seconds
+        return GenerativeModel(self.model_name)
+
+    def _create(self, mode: str) -> GenerativeModel:
+        if mode == MODE_CACHED_CONTENT:
+            if not CONTEXT_CACHING_AVAILABLE:
+                raise RuntimeError("google-generativeai does not support context caching")
+            # A replaced context is left to expire on its own so in-flight requests can finish
+            cached_content = caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                display_name="mom-builder-system-prompt",
+                system_instruction=self.system_prompt,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+            self._expires_at = time.time() + self.ttl_seconds
+            self.refreshes += 1
+            usage = getattr(cached_content, "usage_metadata", None)
+            self._prompt_tokens = getattr(usage, "total_token_count", None) or self._prompt_tokens
+            return GenerativeModel.from_cached_content(cached_content)
+
+        if mode == MODE_SYSTEM_INSTRUCTION:
+            return GenerativeModel(self.model_name, system_instruction=self.system_prompt)
+
+        if mode == MODE_INLINE:
+            return GenerativeModel(self.model_name)
+
+        raise ValueError(f"Unknown prompt cache mode: {mode}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the active mode and how many prompt tokens the cache saved"""
+        with self._stats_lock:
+            return {
+                "mode": self.mode or "uninitialized",
+                "requests": self.requests,
+                "refreshes": self.refreshes,
+                "prompt_tokens_saved": self.prompt_tokens_saved,
+                "expires_in_seconds": max(0, int(self._expires_at - time.time())) if self.mode == MODE_CACHED_CONTENT else None,
+            }
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .content_cache import ContentCache, content_hash
+
+
+def normalize_text(text: str) -> str:
+    """Normalize meeting notes so trivially different submissions share a cache key"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def digest_parts(parts: Iterable[Any]) -> str:
+    """Hash an ordered sequence of strings or bytes into a single digest"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def digest_uploads(uploads: List[Tuple[str, BinaryIO]]) -> str:
+    """Hash uploaded files (mime type and content) by streaming each file handle"""
+    digest = hashlib.sha256()
+    for mime_type, file_obj in uploads:
+        digest.update(mime_type.encode("utf-8") + b"\0")
+        file_obj.seek(0)
+        for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+            digest.update(chunk)
+        file_obj.seek(0)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Caches generated MOMs and coalesces identical in-flight requests
+
+    Keys combine the model name, a hash of the system prompt and a hash of the
+    normalized input. Results are kept in a ``ContentCache`` with a TTL
+    (``RESULT_CACHE_TTL_SECONDS``, default one hour) and a size bound
+    (``RESULT_CACHE_MAX_BYTES``, default 16 MB). While a result is being
+    generated, identical requests wait on the same call instead of starting
+    their own (singleflight).
+    """
+
+    def __init__(self, cache: Optional[ContentCache] = None):
+        self.cache = cache or ContentCache.from_env(
+            "RESULT_CACHE",
+            default_max_bytes=16 * 1024 * 1024,
+            default_ttl_seconds=3600,
+        )
+        self._in_flight: Dict[str, "asyncio.Future[Dict]"] = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(model_name: str, system_prompt: str, input_digest: str) -> str:
+        """Build a cache key from the model, the prompt and the input"""
+        return f"{model_name}:{content_hash(system_prompt.encode('utf-8'))}:{input_digest}"
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Return the cached result for a key, joining or starting its computation on a miss"""
+        cached = await self.cache.get_async(key) if self.cache.enabled else None
+        if cached is not None:
+            return dict(cached)
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return dict(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading request was cancelled; take over the computation
+                return await self.get_or_compute(key, compute)
+
+        future: "asyncio.Future[Dict]" = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.cache.enabled:
+                await self.cache.set_async(key, result)
+            return dict(result)
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters plus the number of coalesced requests"""
+        stats = self.cache.stats()
+        stats["coalesced"] = self.coalesced
+        stats["in_flight"] = len(self._in_flight)
+        return stats
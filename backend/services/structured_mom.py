@@ -0,0 +1,195 @@
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from models.mom import Decision, MeetingMinutes, MomDocument
+
+OUTPUT_MARKDOWN = "markdown"
+OUTPUT_JSON = "json"
+
+# The system prompt's Markdown template, replaced by field guidance in JSON mode
+OUTPUT_FORMAT_PATTERN = re.compile(
+    r"\*Output Format \(Markdown, exactly these sections\)\*.*?(?=\*Extraction & Interpretation Rules\*)",
+    re.DOTALL,
+)
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+JSON_OUTPUT_FORMAT = """*Output Format (JSON)*
+
+Return one JSON object matching the response schema; it is rendered into the MOM template afterwards, so do not write Markdown or headings.
+-meetings: one entry per distinct meeting in the input.
+-title, date (DD-MMM-YYYY), time (HH:MM–HH:MM IST), mode (In-person/Online), location (link or room, null if unknown).
+-attendees: name and role (role null if unknown); absent: names of apologies/absentees.
+-agenda, discussion_points (concise, fact-based, grouped by agenda item), next_steps: short sentences.
+-decisions: decision, owner (owner/approver), effective_date.
+-action_items: action, owner, due_date (TBD when missing), status (Open or Done).
+-risks: risk, mitigation (mitigation or dependency).
+-next_meeting: date, time IST, tentative agenda and participants, or null.
+-open_questions: fragment (the unclear text, quoted as written), needed (what is needed to resolve it).
+-message: only when the input is unusable, with the note to show instead; leave meetings empty.
+
+"""
+
+
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """A pydantic model's JSON schema reduced to the OpenAPI subset Gemini's response_schema accepts
+
+    References are inlined, ``Optional`` becomes ``nullable``, and titles and
+    defaults are dropped.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            node = definitions[node["$ref"].rsplit("/", 1)[-1]]
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            converted = convert(options[0])
+            converted["nullable"] = True
+            return converted
+
+        converted: Dict[str, Any] = {"type": node["type"]}
+        if "properties" in node:
+            converted["properties"] = {name: convert(value) for name, value in node["properties"].items()}
+            if node.get("required"):
+                converted["required"] = node["required"]
+        if "items" in node:
+            converted["items"] = convert(node["items"])
+        if "enum" in node:
+            converted["enum"] = node["enum"]
+        return converted
+
+    return convert(schema)
+
+
+def _or_tbd(value: Optional[str]) -> str:
+    return value.strip() if value and value.strip() else "TBD"
+
+
+def _cell(value: Optional[str]) -> str:
+    """Table cell text that cannot break the row"""
+    return _or_tbd(value).replace("|", "/").replace("\n", " ")
+
+
+def _decision(decision: Decision) -> str:
+    text = f"{decision.decision} — {_or_tbd(decision.owner)}"
+    return f"{text}, {decision.effective_date}" if decision.effective_date else text
+
+
+def _bullets(items: List[str]) -> List[str]:
+    return [f"- {item}" for item in items] or ["- TBD"]
+
+
+def render_meeting(meeting: MeetingMinutes) -> str:
+    """Render one meeting in the MOM Markdown template the model used to write itself"""
+    attendees = ", ".join(
+        f"{attendee.name} ({attendee.role})" if attendee.role else attendee.name for attendee in meeting.attendees
+    )
+    lines = [
+        f"# Minutes of Meeting — {_or_tbd(meeting.title)}",
+        "",
+        f"**Date:** {_or_tbd(meeting.date)}  **Time:** {_or_tbd(meeting.time)}  **Mode:** {_or_tbd(meeting.mode)}  ",
+        f"**Location/Link:** {_or_tbd(meeting.location)}  ",
+        f"**Attendees:** {_or_tbd(attendees)}  ",
+        f"**Apologies/Absent:** {', '.join(meeting.absent) or 'None'}",
+        "",
+        "## Agenda",
+    ]
+    lines += [f"{number}. {item}" for number, item in enumerate(meeting.agenda, start=1)] or ["1. TBD"]
+
+    lines += ["", "## Key Discussion Points"]
+    lines += _bullets(meeting.discussion_points)
+
+    lines += ["", "## Decisions"]
+    lines += _bullets([_decision(decision) for decision in meeting.decisions])
+
+    lines += ["", "## Action Items"]
+    if meeting.action_items:
+        lines += ["| # | Action | Owner | Due Date | Status |", "|---|--------|-------|----------|--------|"]
+        lines += [
+            f"| {number} | {_cell(item.action)} | {_cell(item.owner)} | {_cell(item.due_date)} | {_cell(item.status)} |"
+            for number, item in enumerate(meeting.action_items, start=1)
+        ]
+    else:
+        lines.append("- TBD")
+
+    lines += ["", "## Risks / Dependencies"]
+    lines += _bullets([f"{risk.risk} — {_or_tbd(risk.mitigation)}" for risk in meeting.risks])
+
+    lines += ["", "## Next Steps"]
+    lines += _bullets(meeting.next_steps)
+
+    lines += ["", "## Next Meeting (if noted or inferred)", f"- {_or_tbd(meeting.next_meeting)}"]
+
+    lines += ["", "## Open Questions / Illegible Items"]
+    lines += [
+        f"- \"{question.fragment}\" — {_or_tbd(question.needed)}" for question in meeting.open_questions
+    ] or ["- None"]
+
+    return "\n".join(lines)
+
+
+def render_mom_markdown(document: MomDocument) -> str:
+    """Render a structured MOM, one template per meeting, or the model's note for unusable input"""
+    if not document.meetings:
+        return document.message or "Couldn't read the notes—please re-upload clearer photos (flat, good light)."
+    return "\n\n".join(render_meeting(meeting) for meeting in document.meetings)
+
+
+def parse_mom_json(text: str) -> MomDocument:
+    """Validate the model's JSON output; raises ValueError when it does not match the schema"""
+    try:
+        return MomDocument.model_validate_json(CODE_FENCE_PATTERN.sub("", text.strip()))
+    except ValidationError as e:
+        raise ValueError(f"Structured MOM did not match the schema: {e.error_count()} errors") from e
+
+
+class StructuredOutput:
+    """Generates MOMs as JSON matching ``models.mom.MomDocument`` and renders the Markdown locally
+
+    Enabled with ``MOM_OUTPUT_FORMAT=json``. Gemini is asked for
+    ``application/json`` constrained by the pydantic schema, so it spends no
+    output tokens on table pipes, bold labels or template headings; the
+    template is filled in here, deterministically. When the output does not
+    parse, the raw text is returned as the MOM and the failure is counted.
+    """
+
+    def __init__(self, output_format: Optional[str] = None):
+        self.output_format = (output_format or os.getenv("MOM_OUTPUT_FORMAT", OUTPUT_MARKDOWN)).lower()
+        self.enabled = self.output_format == OUTPUT_JSON
+        self.generation_config = {
+            "response_mime_type": "application/json",
+            "response_schema": response_schema(MomDocument),
+        } if self.enabled else None
+
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.fallbacks = 0
+
+    def system_prompt(self, markdown_prompt: str) -> str:
+        """The system prompt with its Markdown template swapped for JSON field guidance"""
+        if not self.enabled:
+            return markdown_prompt
+        return OUTPUT_FORMAT_PATTERN.sub(lambda _: JSON_OUTPUT_FORMAT, markdown_prompt)
+
+    def render(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        """Markdown for the model's output and the details to report with the result"""
+        try:
+            document = parse_mom_json(text)
+        except ValueError as e:
+            print(f"Structured MOM fallback: {e}")
+            with self._lock:
+                self.fallbacks += 1
+            return text, {"structured_error": str(e)}
+
+        with self._lock:
+            self.rendered += 1
+        return render_mom_markdown(document), {"structured": document.model_dump()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"output_format": self.output_format, "rendered": self.rendered, "fallbacks": self.fallbacks}
@@ -0,0 +1,185 @@
+import base64
+import io
+import math
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+# Try to import optional dependencies
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Gemini bills small images as one 258-token tile; larger ones as 768x768 tiles
+IMAGE_TILE_TOKENS = 258
+IMAGE_SMALL_EDGE = 384
+IMAGE_TILE_EDGE = 768
+
+# Rough characters per token for English meeting notes
+CHARS_PER_TOKEN = 4
+
+ACTION_ACCEPT = "accept"
+ACTION_CHUNK = "chunk"
+ACTION_DOWNSCALE = "downscale"
+ACTION_REJECT = "reject"
+
+
+class BudgetExceededError(ValueError):
+    """Raised when a request is too large to send to Gemini"""
+
+    def __init__(self, message: str, budget: Dict[str, Any]):
+        super().__init__(message)
+        self.budget = budget
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from PNG, GIF, JPEG or WEBP headers without decoding the image"""
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            chunk = data[12:16]
+            if chunk == b"VP8X":
+                width = int.from_bytes(data[24:27], "little") + 1
+                height = int.from_bytes(data[27:30], "little") + 1
+                return width, height
+            if chunk == b"VP8L":
+                bits = int.from_bytes(data[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", data[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+        if data[:2] == b"\xff\xd8":
+            offset = 2
+            while offset + 9 < len(data):
+                if data[offset] != 0xFF:
+                    offset += 1
+                    continue
+                marker = data[offset + 1]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    offset += 2
+                    continue
+                length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+                # SOF markers carry the frame size
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+                    return width, height
+                offset += 2 + length
+    except (struct.error, IndexError):
+        pass
+
+    if PIL_AVAILABLE:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                return image.size
+        except Exception:
+            pass
+
+    return None
+
+
+class TokenBudget:
+    """Pre-flight size estimate and routing for Gemini requests
+
+    Estimates input tokens locally (characters / 4 for text, Gemini's tile
+    rule for images), optionally confirms with the API's exact count
+    (``TOKEN_COUNT_EXACT=true``), and picks an action:
+
+    - ``reject`` when the estimate exceeds ``MAX_INPUT_TOKENS``
+    - ``chunk`` when text exceeds the map-reduce threshold
+    - ``downscale`` when images exceed ``IMAGE_TOKEN_BUDGET``
+    - ``accept`` otherwise
+    """
+
+    def __init__(self, chunk_threshold_chars: int):
+        self.max_input_tokens = int(os.getenv("MAX_INPUT_TOKENS", 900000))
+        self.image_token_budget = int(os.getenv("IMAGE_TOKEN_BUDGET", 8 * IMAGE_TILE_TOKENS * 4))
+        self.downscale_max_edge = int(os.getenv("IMAGE_DOWNSCALE_MAX_EDGE", IMAGE_TILE_EDGE))
+        self.exact_counting = os.getenv("TOKEN_COUNT_EXACT", "false").lower() == "true"
+        self.chunk_threshold_chars = chunk_threshold_chars
+
+    @staticmethod
+    def estimate_text_tokens(text: str) -> int:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    @staticmethod
+    def estimate_image_tokens(width: int, height: int) -> int:
+        """Tokens for one image under Gemini's tiling rule"""
+        if width <= IMAGE_SMALL_EDGE and height <= IMAGE_SMALL_EDGE:
+            return IMAGE_TILE_TOKENS
+        return math.ceil(width / IMAGE_TILE_EDGE) * math.ceil(height / IMAGE_TILE_EDGE) * IMAGE_TILE_TOKENS
+
+    def plan_text(self, text: str, prompt_text: str = "") -> Dict[str, Any]:
+        """Estimate and route a text-only request"""
+        text_tokens = self.estimate_text_tokens(text)
+        budget = self._budget(text_tokens + self.estimate_text_tokens(prompt_text), text_tokens, 0, 0)
+
+        if budget["action"] == ACTION_ACCEPT and len(text) > self.chunk_threshold_chars:
+            budget["action"] = ACTION_CHUNK
+        return budget
+
+    def plan_files(self, processed_files: List[Dict[str, Any]], prompt_text: str = "") -> Dict[str, Any]:
+        """Estimate and route a request built from extracted files and images"""
+        text_tokens = sum(self.estimate_text_tokens(item["content"]) for item in processed_files if item.get("type") == "text")
+        images = [item for item in processed_files if "mime_type" in item]
+        image_tokens = sum(self._image_tokens(item) for item in images)
+
+        budget = self._budget(
+            text_tokens + image_tokens + self.estimate_text_tokens(prompt_text),
+            text_tokens,
+            image_tokens,
+            len(images),
+        )
+
+        if image_tokens > self.image_token_budget and budget["action"] in (ACTION_ACCEPT, ACTION_REJECT):
+            # Shrinking images may bring an oversized request back under the limit
+            budget["action"] = ACTION_DOWNSCALE
+        return budget
+
+    def _image_tokens(self, item: Dict[str, Any]) -> int:
+        data = item["data"]
+        # Headers sit near the start; decoding a prefix is enough and avoids copying large images
+        raw = base64.b64decode(data[:262144]) if isinstance(data, str) else data
+        dimensions = image_dimensions(raw)
+        if dimensions is None:
+            # Unknown size: assume a typical phone photo
+            return self.estimate_image_tokens(4032, 3024)
+        return self.estimate_image_tokens(*dimensions)
+
+    def _budget(self, estimated_tokens: int, text_tokens: int, image_tokens: int, images: int) -> Dict[str, Any]:
+        return {
+            "estimated_tokens": estimated_tokens,
+            "text_tokens": text_tokens,
+            "image_tokens": image_tokens,
+            "images": images,
+            "max_input_tokens": self.max_input_tokens,
+            "exact": False,
+            "action": ACTION_REJECT if estimated_tokens > self.max_input_tokens else ACTION_ACCEPT,
+        }
+
+    async def count_exact(self, model: Any, contents: Any, budget: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the local estimate with Gemini's token count when exact counting is enabled"""
+        if not self.exact_counting:
+            return budget
+        try:
+            response = await model.count_tokens_async(contents)
+            budget["estimated_tokens"] = response.total_tokens
+            budget["exact"] = True
+            if budget["estimated_tokens"] > self.max_input_tokens:
+                budget["action"] = ACTION_REJECT
+        except Exception as e:
+            print(f"Exact token count failed: {e}")
+        return budget
+
+    def check(self, budget: Dict[str, Any]) -> None:
+        """Raise BudgetExceededError for requests routed to reject"""
+        if budget["action"] == ACTION_REJECT:
+            raise BudgetExceededError(
+                f"Input is too large: about {budget['estimated_tokens']} tokens, "
+                f"limit is {budget['max_input_tokens']}",
+                budget,
+            )
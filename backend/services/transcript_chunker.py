@@ -0,0 +1,91 @@
+import re
+from typing import List
+
+# A speaker name: up to four capitalized words ("Asha", "Dr. Ben Okafor", "Speaker 2"), optionally "(role)"
+SPEAKER_NAME = r"[A-Z][\w.'’-]*(?: [A-Z0-9][\w.'’-]*){0,3}(?: \([^)\n]{1,30}\))?"
+
+# A new speaker turn: "Name: ..." or a timestamped "[10:32] Name", "10:32:05 Name - ...".
+# Without a timestamp only a colon marks a turn, so lines like "Q3 Budget - approved" stay text.
+SPEAKER_TURN_PATTERN = re.compile(
+    rf"^\s*(?:{SPEAKER_NAME}:\s+\S"
+    rf"|\[?\d{{1,2}}:\d{{2}}(?::\d{{2}})?\]?\s+{SPEAKER_NAME}(?:\s*[:\-–]\s+\S|\s*:?\s*$))"
+)
+
+# Paragraph boundaries: one or more blank lines
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+
+# Sentence boundaries used when a single turn or paragraph is too long
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+class TranscriptChunker:
+    """Splits long meeting transcripts into chunks on natural boundaries"""
+
+    @staticmethod
+    def split(text: str, max_chars: int) -> List[str]:
+        """Split text into chunks of at most ``max_chars``, preferring speaker turns, then paragraphs"""
+        if len(text) <= max_chars:
+            return [text]
+
+        units = TranscriptChunker._speaker_turns(text)
+        if len(units) <= 1:
+            units = [paragraph for paragraph in PARAGRAPH_PATTERN.split(text) if paragraph.strip()]
+
+        chunks: List[str] = []
+        current: List[str] = []
+        current_size = 0
+
+        for unit in units:
+            for piece in TranscriptChunker._fit(unit, max_chars):
+                if current and current_size + len(piece) + 1 > max_chars:
+                    chunks.append("\n".join(current))
+                    current, current_size = [], 0
+                current.append(piece)
+                current_size += len(piece) + 1
+
+        if current:
+            chunks.append("\n".join(current))
+
+        return chunks
+
+    @staticmethod
+    def _speaker_turns(text: str) -> List[str]:
+        """Group lines into speaker turns; continuation lines stay with their speaker"""
+        turns: List[str] = []
+        current: List[str] = []
+
+        for line in text.split("\n"):
+            if SPEAKER_TURN_PATTERN.match(line) and current:
+                turns.append("\n".join(current))
+                current = []
+            current.append(line)
+
+        if current:
+            turns.append("\n".join(current))
+
+        return [turn for turn in turns if turn.strip()]
+
+    @staticmethod
+    def _fit(unit: str, max_chars: int) -> List[str]:
+        """Break a unit that exceeds ``max_chars`` on sentence, then hard character boundaries"""
+        if len(unit) <= max_chars:
+            return [unit]
+
+        pieces: List[str] = []
+        current = ""
+        for sentence in SENTENCE_PATTERN.split(unit):
+            while len(sentence) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+
+        if current:
+            pieces.append(current)
+
+        return pieces
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import the backend modules the way main.py does (services.*, utils.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never reach the Gemini API or start worker processes from tests
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("PROMPT_CACHE_MODE", "inline")
+os.environ.setdefault("EXTRACTION_WORKERS", "0")
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from services.admission import (
+    PRIORITY_BATCH,
+    PRIORITY_FILES,
+    PRIORITY_INTERACTIVE,
+    AdmissionRejected,
+    AdmissionScheduler,
+)
+
+
+async def hold_slot(scheduler, held, release):
+    async with scheduler.slot():
+        held.set()
+        await release.wait()
+
+
+async def take_slot(scheduler, priority, order):
+    with scheduler.request_context(priority):
+        async with scheduler.slot():
+            order.append(priority)
+
+
+async def use_slot(scheduler):
+    async with scheduler.slot():
+        pass
+
+
+async def settle():
+    """Let every started task run up to its first wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_freed_slots_follow_the_weighted_round_robin():
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=100)
+        held, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, held, release))
+        await held.wait()
+
+        order = []
+        # Queued lowest priority first, so the order below comes from the schedule alone
+        tasks = [
+            asyncio.create_task(take_slot(scheduler, priority, order))
+            for priority in [PRIORITY_BATCH] * 3 + [PRIORITY_FILES] * 3 + [PRIORITY_INTERACTIVE] * 6
+        ]
+        await settle()
+        assert scheduler.stats()["queued"] == {PRIORITY_INTERACTIVE: 6, PRIORITY_FILES: 3, PRIORITY_BATCH: 3}
+
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        return scheduler, order
+
+    scheduler, order = asyncio.run(run())
+
+    interactive, files, batch = PRIORITY_INTERACTIVE, PRIORITY_FILES, PRIORITY_BATCH
+    assert order == [
+        interactive, interactive, interactive, interactive, files, files, batch,
+        interactive, interactive, files, batch, batch,
+    ]
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.admitted == 13
+
+
+def test_queue_wait_is_recorded_on_the_ticket():
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=10)
+        held, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, held, release))
+        await held.wait()
+
+        with scheduler.request_context(PRIORITY_FILES) as ticket:
+            # The task copies this context, ticket included
+            waiter = asyncio.create_task(use_slot(scheduler))
+            await settle()
+            await asyncio.sleep(0.02)
+            release.set()
+            await holder
+            await waiter
+        return ticket
+
+    ticket = asyncio.run(run())
+    assert ticket.admissions == 1
+    assert ticket.wait_ms >= 20
+
+
+def test_full_queue_is_rejected_with_a_retry_estimate():
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=1)
+        held, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, held, release))
+        await held.wait()
+        queued = asyncio.create_task(take_slot(scheduler, PRIORITY_BATCH, []))
+        await settle()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await use_slot(scheduler)
+
+        release.set()
+        await asyncio.gather(holder, queued)
+        return scheduler, rejected.value
+
+    scheduler, error = asyncio.run(run())
+    # Two calls ahead at the default 10 s estimate on one slot
+    assert error.retry_after == 20
+    assert scheduler.rejected == 1
+    assert scheduler.stats()["active"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=10)
+        held, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, held, release))
+        await held.wait()
+        waiter = asyncio.create_task(take_slot(scheduler, PRIORITY_FILES, []))
+        await settle()
+
+        waiter.cancel()
+        await settle()
+        queued = scheduler.stats()["queued"][PRIORITY_FILES]
+        release.set()
+        await holder
+        return scheduler, queued
+
+    scheduler, queued = asyncio.run(run())
+    assert queued == 0
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.admission import AdmissionScheduler
+from services.content_cache import ContentCache
+from services.mom_store import MomStore
+
+
+@pytest.fixture
+def client():
+    # Startup events are not run: no worker processes or job queue are needed here
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def busy_admission(monkeypatch):
+    """A scheduler whose only slot is taken and whose queue is full"""
+    scheduler = AdmissionScheduler(max_concurrency=1, max_queue=0)
+    scheduler._active = 1
+    monkeypatch.setattr(main.gemini_service, "admission", scheduler)
+    return scheduler
+
+
+@pytest.fixture
+def stored_mom():
+    return asyncio.run(main.gemini_service.mom_store.put("# Weekly Sync\n\n- Ship the release\n"))
+
+
+def test_full_admission_queue_returns_503_with_retry_after(client, busy_admission):
+    response = client.post("/api/process-text", json={"text": "Notes that need a Gemini slot"})
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    assert busy_admission.rejected == 1
+
+
+def test_streaming_request_is_rejected_before_the_stream_starts(client, busy_admission):
+    response = client.post("/api/process-text/stream", json={"text": "Notes that need a Gemini slot"})
+
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+
+def test_mom_download_serves_a_byte_range(client, stored_mom):
+    full = client.get(f"/api/mom/{stored_mom}.md")
+    partial = client.get(f"/api/mom/{stored_mom}.md", headers={"Range": "bytes=2-7"})
+
+    assert full.status_code == 200
+    assert partial.status_code == 206
+    assert partial.content == full.content[2:8]
+    assert partial.headers["content-range"] == f"bytes 2-7/{len(full.content)}"
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_body(client, stored_mom):
+    full = client.get(f"/api/mom/{stored_mom}.md")
+    current = client.get(f"/api/mom/{stored_mom}.md", headers={"Range": "bytes=0-4", "If-Range": full.headers["etag"]})
+    stale = client.get(f"/api/mom/{stored_mom}.md", headers={"Range": "bytes=0-4", "If-Range": '"stale"'})
+
+    assert current.status_code == 206
+    assert stale.status_code == 200
+    assert stale.content == full.content
+
+
+def test_unsatisfiable_range_returns_416(client, stored_mom):
+    response = client.get(f"/api/mom/{stored_mom}.md", headers={"Range": "bytes=5000-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"].startswith("bytes */")
+
+
+def test_matching_etag_returns_304(client, stored_mom):
+    etag = client.get(f"/api/mom/{stored_mom}.txt").headers["etag"]
+    response = client.get(f"/api/mom/{stored_mom}.txt", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_expired_mom_returns_404_even_with_a_cached_artifact(client, monkeypatch):
+    # The rendered artifact is cached without a TTL, so only the MOM itself expires
+    store = MomStore(store=ContentCache(ttl_seconds=0.05), artifacts=ContentCache())
+    monkeypatch.setattr(main.gemini_service, "mom_store", store)
+    mom_id = asyncio.run(store.put("# Weekly Sync\n"))
+
+    assert client.get(f"/api/mom/{mom_id}.md").status_code == 200
+    time.sleep(0.1)
+
+    assert client.get(f"/api/mom/{mom_id}.md").status_code == 404
@@ -0,0 +1,117 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils.compression import (
+    BodyDecoder,
+    RequestDecompressionMiddleware,
+    ResponseCompressionMiddleware,
+    negotiate_encoding,
+)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(RequestDecompressionMiddleware, max_bytes=MAX_BODY_BYTES)
+    app.add_middleware(ResponseCompressionMiddleware, minimum_size=100)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return PlainTextResponse(await request.body())
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"data: one\n\n", b"data: two\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_gzip_request_body_is_decompressed(client):
+    body = b"meeting notes " * 100
+    response = client.post("/echo", content=gzip.compress(body), headers={"Content-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.content == body
+
+
+def test_decompressed_body_past_the_cap_is_rejected(client):
+    bomb = gzip.compress(b"\0" * (MAX_BODY_BYTES * 16))
+    response = client.post("/echo", content=bomb, headers={"Content-Encoding": "gzip"})
+
+    assert response.status_code == 413
+
+
+def test_corrupt_gzip_body_is_rejected(client):
+    response = client.post("/echo", content=b"not gzip at all", headers={"Content-Encoding": "gzip"})
+
+    assert response.status_code == 400
+
+
+def test_truncated_gzip_body_is_rejected(client):
+    response = client.post("/echo", content=gzip.compress(b"x" * 1000)[:-12], headers={"Content-Encoding": "gzip"})
+
+    assert response.status_code == 400
+
+
+def test_unsupported_content_encoding_is_rejected(client):
+    response = client.post("/echo", content=b"data", headers={"Content-Encoding": "br"})
+
+    assert response.status_code == 415
+    assert "gzip" in response.headers["accept-encoding"]
+
+
+def test_decoder_stops_at_the_cap_within_one_chunk():
+    decoder = BodyDecoder("gzip", max_bytes=1000)
+
+    with pytest.raises(HTTPException) as error:
+        decoder.decode(gzip.compress(b"a" * 10 * 1024 * 1024), final=True)
+
+    assert error.value.status_code == 413
+    # Output is produced in bounded steps, so decoding stopped long before 10 MB
+    assert decoder.total <= 64 * 1024 + 1000
+
+
+def test_decoder_accepts_concatenated_gzip_members():
+    decoder = BodyDecoder("gzip", max_bytes=1000)
+
+    assert decoder.decode(gzip.compress(b"first ") + gzip.compress(b"second"), final=True) == b"first second"
+
+
+def test_large_response_is_compressed(client):
+    body = b"minutes " * 100
+    response = client.post("/echo", content=body, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.content == body
+
+
+def test_small_response_is_left_alone(client):
+    response = client.post("/echo", content=b"short", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_response_is_left_alone(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.content == b"data: one\n\ndata: two\n\n"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("br, gzip;q=0.5", "gzip"),
+    ("*", "gzip"),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
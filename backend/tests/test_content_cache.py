@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+
+from services.content_cache import ContentCache
+
+
+def test_memory_tier_evicts_least_recently_used_entries():
+    cache = ContentCache(max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")
+
+    assert cache.get("a") == "aaaa"
+    assert cache.get("b") is None
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_value_larger_than_the_budget_is_not_kept():
+    cache = ContentCache(max_bytes=4)
+    cache.set("big", "too large")
+
+    assert cache.get("big") is None
+
+
+def test_expired_entries_are_misses():
+    cache = ContentCache(ttl_seconds=0.01)
+    cache.set("a", "value")
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    ContentCache(disk_dir=str(tmp_path)).set("key", {"content": "text"})
+    reopened = ContentCache(disk_dir=str(tmp_path))
+
+    assert reopened.get("key") == {"content": "text"}
+    assert reopened.stats()["disk_hits"] == 1
+    # Promoted to the memory tier
+    assert reopened.get("key") == {"content": "text"}
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_expired_disk_entries_are_deleted_on_read(tmp_path):
+    ContentCache(disk_dir=str(tmp_path)).set("key", "value")
+    (path,) = tmp_path.iterdir()
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    assert ContentCache(disk_dir=str(tmp_path), ttl_seconds=60).get("key") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_tier_is_pruned_to_its_bound(tmp_path):
+    cache = ContentCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    for index in range(20):
+        cache.set(f"key-{index}", "x" * 100)
+        # Distinct write times so the oldest files are pruned first
+        for offset, path in enumerate(sorted(tmp_path.iterdir(), key=os.path.getmtime)):
+            os.utime(path, (1000 + offset, 1000 + offset))
+
+    total = sum(path.stat().st_size for path in tmp_path.iterdir())
+    assert total <= 1000
+    assert cache.get("key-19") == "x" * 100
+    assert cache.get("key-0") is None
+
+
+def test_prune_drops_expired_files_first(tmp_path):
+    cache = ContentCache(max_bytes=0, disk_dir=str(tmp_path), ttl_seconds=60, disk_max_bytes=250)
+    cache.set("old", "x" * 100)
+    (old_path,) = tmp_path.iterdir()
+    os.utime(old_path, (time.time() - 120, time.time() - 120))
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+
+    assert not old_path.exists()
+    assert cache.get("a") == cache.get("b") == "x" * 100
+
+
+def test_async_access_uses_both_tiers(tmp_path):
+    async def run():
+        cache = ContentCache(disk_dir=str(tmp_path))
+        missing = await cache.get_async("key")
+        await cache.set_async("key", {"content": "text"})
+        reopened = ContentCache(disk_dir=str(tmp_path))
+        return missing, await cache.get_async("key"), await reopened.get_async("key"), reopened
+
+    missing, from_memory, from_disk, reopened = asyncio.run(run())
+
+    assert missing is None
+    assert from_memory == from_disk == {"content": "text"}
+    assert reopened.stats()["disk_hits"] == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("TEST_CACHE_MAX_BYTES", "123")
+    monkeypatch.setenv("TEST_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("TEST_CACHE_TTL_SECONDS", "60")
+    monkeypatch.setenv("TEST_CACHE_DISK_MAX_BYTES", "4096")
+    cache = ContentCache.from_env("TEST_CACHE")
+
+    assert cache.max_bytes == 123
+    assert cache.disk_dir == str(tmp_path)
+    assert cache.ttl_seconds == 60
+    assert cache.disk_max_bytes == 4096
+    assert cache.name == "test_cache"
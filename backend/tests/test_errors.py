@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.admission import AdmissionRejected, AdmissionScheduler
+from services.batch_runner import BatchRunner
+from services.errors import error_status
+from services.token_budget import BudgetExceededError
+
+
+@pytest.mark.parametrize("error, expected", [
+    (BudgetExceededError("Input is too large", {}), (413, "Input is too large", None)),
+    (AdmissionRejected("Server is busy", 12), (503, "Server is busy", 12)),
+    (ValueError("No valid content"), (400, "No valid content", None)),
+    (RuntimeError("Gemini unavailable"), (500, "Failed to process text: Gemini unavailable", None)),
+])
+def test_error_status(error, expected):
+    assert tuple(error_status(error, "Failed to process text")) == expected
+
+
+class FailingService:
+    """Stands in for GeminiService, failing every text item with the given error"""
+
+    def __init__(self, error):
+        self.error = error
+        self.admission = AdmissionScheduler(max_concurrency=1)
+
+    async def generate_mom_from_text(self, text):
+        raise self.error
+
+
+def run_batch(error):
+    items = [SimpleNamespace(id="a", text="notes", images=None)]
+
+    async def collect():
+        return [record async for record in BatchRunner(FailingService(error)).run(items)]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("error, status", [
+    (ValueError("No valid content could be extracted from the uploaded files"), 400),
+    (BudgetExceededError("Input is too large", {}), 413),
+    (RuntimeError("Gemini unavailable"), 500),
+])
+def test_batch_line_carries_the_single_item_status(error, status):
+    record, summary = run_batch(error)
+
+    assert record == {"index": 0, "id": "a", "success": False, "status": status, "error": str(error)}
+    assert summary == {"summary": {"items": 1, "succeeded": 0, "failed": 1}}
+
+
+def test_batch_line_for_a_full_queue_has_retry_after():
+    record, _ = run_batch(AdmissionRejected("Server is busy", 7))
+
+    assert record["status"] == 503
+    assert record["retry_after"] == 7
+
+
+def test_invalid_input_is_400_on_the_single_item_route(monkeypatch):
+    async def no_content(text):
+        raise ValueError("No valid content")
+
+    monkeypatch.setattr(main.gemini_service, "generate_mom_from_text", no_content)
+    response = TestClient(main.app).post("/api/process-text", json={"text": "notes"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No valid content"
@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_pdf_extraction import make_sample_pdf
+from services import extraction_pool
+from services.content_cache import ContentCache
+from services.extraction_pool import ExtractionPool
+from services.file_processor import FileProcessor
+
+# Each generated page holds about 2,400 characters
+PAGE_CHARS = 2400
+
+
+@pytest.fixture
+def pages_read(monkeypatch):
+    """Count the pages the extractors actually parse"""
+    counter = {"pages": 0}
+    iter_pdf_pages = FileProcessor.iter_pdf_pages
+
+    def counting_iter(*args, **kwargs):
+        for page_text in iter_pdf_pages(*args, **kwargs):
+            counter["pages"] += 1
+            yield page_text
+
+    monkeypatch.setattr(FileProcessor, "iter_pdf_pages", staticmethod(counting_iter))
+    return counter
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    for setting in ("PDF_MAX_PAGES", "PDF_MAX_CHARS", "PDF_MAX_TOKENS"):
+        monkeypatch.delenv(setting, raising=False)
+    pool = ExtractionPool(max_workers=4, cache=ContentCache(max_bytes=0))
+    pool.pdf_parallel_min_pages = 40
+    pool.pdf_min_pages_per_range = 10
+    # Threads instead of processes, so the page counter sees the range workers
+    pool._executor = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool._executor.shutdown(wait=True)
+
+
+def extract(pool, pdf_bytes):
+    data_url = "data:application/pdf;base64," + base64.b64encode(pdf_bytes).decode("ascii")
+    return asyncio.run(pool.process_files([data_url]))
+
+
+def test_whole_document_is_read_by_default(pool, pages_read):
+    result = extract(pool, make_sample_pdf(60))
+
+    assert len(result) == 1
+    assert "pages" not in result[0]
+    assert "Page 60 line 0" in result[0]["content"]
+    assert pages_read["pages"] == 60
+
+
+def test_small_pdf_is_extracted_in_one_pass_without_staging(pool, pages_read, monkeypatch):
+    def no_staging(source):
+        raise AssertionError("small PDFs are not staged to disk")
+
+    monkeypatch.setattr(extraction_pool, "_stage_pdf", no_staging)
+    result = extract(pool, make_sample_pdf(12))
+
+    assert "Page 12 line 0" in result[0]["content"]
+    assert pages_read["pages"] == 12
+
+
+def test_character_budget_stops_small_pdfs_while_reading(pool, pages_read, monkeypatch):
+    monkeypatch.setenv("PDF_MAX_CHARS", str(PAGE_CHARS * 3))
+    result = extract(pool, make_sample_pdf(30))
+
+    assert result[0]["pages"]["total"] == 30
+    assert result[0]["pages"]["read"] < 4
+    assert pages_read["pages"] <= 4
+
+
+def test_character_budget_stops_range_workers_while_reading(pool, pages_read, monkeypatch):
+    monkeypatch.setenv("PDF_MAX_CHARS", str(PAGE_CHARS * 5))
+    result = extract(pool, make_sample_pdf(120))
+
+    pages = result[0]["pages"]
+    assert pages["total"] == 120
+    assert pages["read"] < 6
+    assert pages["skipped"] == f"{pages['read'] + 1}-120"
+    # Four ranges of 30 pages, each stopping a page past the limit
+    assert pages_read["pages"] <= 4 * 6
+
+
+def test_page_budget_limits_the_ranges(pool, pages_read, monkeypatch):
+    monkeypatch.setenv("PDF_MAX_PAGES", "50")
+    result = extract(pool, make_sample_pdf(120))
+
+    assert result[0]["pages"] == {"total": 120, "read": 50, "skipped": "51-120"}
+    assert "Page 50 line 0" in result[0]["content"]
+    assert pages_read["pages"] == 50
+
+
+def test_extract_pdf_pages_stops_past_the_character_limit():
+    pdf_bytes = make_sample_pdf(20)
+
+    pages = FileProcessor.extract_pdf_pages(pdf_bytes, 5, 20, char_limit=PAGE_CHARS * 2)
+
+    assert len(pages) == 3
+    assert pages[0].startswith("Page 6 line 0")
+
+
+def test_rolled_over_upload_reaches_the_worker_as_a_path(pool, monkeypatch):
+    # Starlette spools uploads past 1 MB to an anonymous file whose name is a descriptor
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(b"meeting notes\n" * 100_000)
+    assert spooled._rolled and not isinstance(spooled.name, str)
+
+    sources = []
+
+    def recording_process_source(mime_type, source):
+        sources.append(source)
+        assert os.path.isfile(source)
+        return FileProcessor.process_file(mime_type, source)
+
+    image = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    image.write(b"\x89PNG")
+    monkeypatch.setattr(extraction_pool, "_process_source", recording_process_source)
+    result = asyncio.run(pool.process_uploads([("text/plain", spooled), ("image/png", image)]))
+
+    assert len(sources) == 2
+    assert all(isinstance(source, str) for source in sources)
+    assert result[0]["content"].startswith("meeting notes\n")
+    assert result[1] == {"mime_type": "image/png", "data": base64.b64encode(b"\x89PNG").decode("ascii")}
+    # Staged copies are removed once extraction is done
+    assert not any(os.path.exists(source) for source in sources)
@@ -0,0 +1,137 @@
+import re
+
+import pytest
+
+from services import file_converter
+from services.file_converter import DocxTemplate, FileConverter
+
+
+def baseline_markdown_to_txt(content: str) -> str:
+    """The TXT export as it was before the Markdown AST, kept as the reference output"""
+    text = content
+    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'__([^_]+)__', r'\1', text)
+    text = re.sub(r'_([^_]+)_', r'\1', text)
+    text = re.sub(r'^[\s]*[-*+]\s+', '• ', text, flags=re.MULTILINE)
+    text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+
+    converted_lines = []
+    in_table = False
+    for line in text.split('\n'):
+        if '|' in line and line.strip().startswith('|') and line.strip().endswith('|'):
+            in_table = True
+            cells = [cell.strip() for cell in line.split('|')[1:-1]]
+            if not all(cell == '---' or cell == '' for cell in cells):
+                converted_lines.append(' | '.join(cells))
+        else:
+            if in_table:
+                in_table = False
+                converted_lines.append('')
+            converted_lines.append(line)
+
+    text = re.sub(r'\n\s*\n\s*\n', '\n\n', '\n'.join(converted_lines))
+    return text.strip()
+
+
+MOM = """# Minutes of Meeting
+
+## Meeting Details
+**Date:** 2024-03-12
+**Attendees:** Asha, Ben and [Chen](mailto:chen@example.com)
+
+## Agenda
+1. Release plan for **v2**
+2. Migration to **[FastAPI](https://fastapi.tiangolo.com)**
+   1. Port the upload routes
+   2. Port the *export* routes
+3. Open questions
+
+## Discussion
+The team reviewed the *beta feedback* and agreed to ship on Friday.
+  Asha will confirm the date with __support__ first,
+  then announce it on [the blog](https://example.com/blog).
+
+## Action Items
+| Owner | Task | Due |
+|---|---|---|
+| Asha | Confirm **release date** | 2024-03-14 |
+| Ben | Update [docs](https://example.com/docs) | 2024-03-15 |
+
+- Write the migration guide
+  - Cover the *upload* routes
+  - Cover **[the export routes](https://example.com/export)**
+- Review the _changelog_
+
+## Next Steps
+Meet again on **Monday**.
+"""
+
+
+def non_blank_lines(text: str):
+    return [line for line in text.split('\n') if line.strip()]
+
+
+@pytest.mark.parametrize("content", [
+    MOM,
+    "Plain notes without any markup",
+    "## Summary\nShipped **[FastAPI](https://fastapi.tiangolo.com)** support",
+    "Steps:\n1. One\n   continued here\n2. Two\n    - detail",
+])
+def test_txt_matches_the_baseline_export(content):
+    # The baseline swallowed the blank line before a bullet list; every other line matches exactly
+    assert non_blank_lines(FileConverter.markdown_to_txt(content)) == non_blank_lines(baseline_markdown_to_txt(content))
+
+
+def test_txt_keeps_blank_lines_between_sections():
+    assert FileConverter.markdown_to_txt("## Action Items\n\n- Ship it") == "Action Items\n\n• Ship it"
+
+
+def test_heading_without_a_space():
+    assert FileConverter.markdown_to_txt("#Summary\nText") == "Summary\nText"
+
+
+def test_docx_nested_list_items_use_the_second_level_style():
+    docx = pytest.importorskip("docx")
+    document = docx.Document(FileConverter.markdown_to_docx("- Parent\n  - Child\n1. Step\n   1. Sub-step"))
+
+    assert [paragraph.style.name for paragraph in document.paragraphs] == [
+        "List Bullet", "List Bullet 2", "List Number", "List Number 2",
+    ]
+
+
+def test_docx_template_keeps_its_styles_and_drops_its_body_text(monkeypatch, tmp_path):
+    docx = pytest.importorskip("docx")
+    from docx.shared import Inches, Pt
+
+    template = docx.Document()
+    template.styles["Normal"].font.name = "Georgia"
+    template.styles["Heading 1"].font.size = Pt(30)
+    template.sections[0].left_margin = Inches(2)
+    template.sections[0].header.paragraphs[0].text = "ACME Corp - Internal"
+    template.add_paragraph("Template boilerplate that must not appear")
+    path = tmp_path / "corporate.docx"
+    template.save(path)
+    monkeypatch.setattr(file_converter, "docx_template", DocxTemplate(str(path)))
+
+    document = docx.Document(FileConverter.markdown_to_docx("# Weekly Sync\n\n- Ship the release"))
+
+    assert [paragraph.text for paragraph in document.paragraphs] == ["Weekly Sync", "", "Ship the release"]
+    assert document.styles["Normal"].font.name == "Georgia"
+    assert document.paragraphs[0].style.font.size == Pt(30)
+    assert document.sections[0].left_margin == Inches(2)
+    assert document.sections[0].header.paragraphs[0].text == "ACME Corp - Internal"
+
+
+def test_missing_docx_template_falls_back_to_the_default(monkeypatch, tmp_path):
+    docx = pytest.importorskip("docx")
+    from docx.shared import Inches
+
+    monkeypatch.setattr(file_converter, "docx_template", DocxTemplate(str(tmp_path / "missing.docx")))
+
+    document = docx.Document(FileConverter.markdown_to_docx("Notes"))
+
+    assert [paragraph.text for paragraph in document.paragraphs] == ["Notes"]
+    assert document.sections[0].left_margin == Inches(1)
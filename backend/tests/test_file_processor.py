@@ -0,0 +1,108 @@
+import base64
+import io
+
+import pytest
+
+from benchmarks.bench_pdf_extraction import make_sample_pdf
+from services.file_processor import PDF_AVAILABLE, PDFPLUMBER_AVAILABLE, PIL_AVAILABLE, FileProcessor, PdfPageBudget
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+needs_both_backends = pytest.mark.skipif(
+    not (PDF_AVAILABLE and PDFPLUMBER_AVAILABLE), reason="PyPDF2 and pdfplumber are both needed"
+)
+
+
+@pytest.mark.parametrize("text, acceptable", [
+    ("Alice: we ship on Friday.", True),
+    ("", False),
+    ("   \n ", False),
+    ("Budget (cid:3)(cid:4)(cid:5) approved", False),
+    ("Budget ��� approved", False),
+    ("Glyphsplacedonebyone" * 20, False),
+    ("Short words without spaces", True),
+])
+def test_pdf_text_acceptable(text, acceptable):
+    assert FileProcessor.pdf_text_acceptable(text) is acceptable
+
+
+@needs_both_backends
+def test_adaptive_backend_rereads_only_bad_pages_with_pdfplumber(monkeypatch):
+    import PyPDF2
+    import pdfplumber
+
+    original_pypdf2 = PyPDF2.PageObject.extract_text
+    original_pdfplumber = pdfplumber.page.Page.extract_text
+    layout_pages = []
+
+    def fast_text(page, *args, **kwargs):
+        text = original_pypdf2(page, *args, **kwargs)
+        if "Page 2 " in text:
+            return ""
+        if "Page 3 " in text:
+            return "(cid:1)(cid:2)(cid:3) garbled"
+        return text
+
+    def layout_text(page, *args, **kwargs):
+        layout_pages.append(page.page_number)
+        return original_pdfplumber(page, *args, **kwargs)
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", fast_text)
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", layout_text)
+
+    pages = list(FileProcessor.iter_pdf_pages(make_sample_pdf(4, lines_per_page=3), backend="auto"))
+
+    assert [page.split("\n")[0].split(" line")[0] for page in pages] == ["Page 1", "Page 2", "Page 3", "Page 4"]
+    assert layout_pages == [2, 3]
+
+
+@needs_both_backends
+def test_adaptive_backend_keeps_fast_text_when_pdfplumber_finds_nothing(monkeypatch):
+    import PyPDF2
+    import pdfplumber
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", lambda page, *args, **kwargs: "x�")
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", lambda page, *args, **kwargs: "")
+
+    assert list(FileProcessor.iter_pdf_pages(make_sample_pdf(2, lines_per_page=1), backend="auto")) == ["x�", "x�"]
+
+
+def make_scanned_pdf(pages):
+    """An image-only PDF, like a scanner produces"""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for number in range(pages):
+        image = Image.new("RGB", (200, 260), "white")
+        ImageDraw.Draw(image).text((20, 20), f"Scanned page {number + 1}", fill="black")
+        images.append(image)
+    output = io.BytesIO()
+    images[0].save(output, format="PDF", save_all=True, append_images=images[1:], resolution=72)
+    return output.getvalue()
+
+
+@pytest.mark.skipif(not (PDFPLUMBER_AVAILABLE and PIL_AVAILABLE), reason="pdfplumber and Pillow are needed")
+def test_scanned_pages_are_rasterized_up_to_the_cap(monkeypatch):
+    monkeypatch.setenv("PDF_MAX_SCANNED_PAGES", "2")
+    monkeypatch.setenv("PDF_RASTER_DPI", "72")
+
+    processed = FileProcessor.extract_pdf(make_scanned_pdf(3), PdfPageBudget())
+
+    assert processed["scanned_pages"] == [0, 1]
+    assert [image["page"] for image in processed["page_images"]] == [1, 2]
+    with Image.open(io.BytesIO(base64.b64decode(processed["page_images"][0]["data"]))) as rendered:
+        assert rendered.format == "JPEG"
+        assert rendered.size == (200, 260)
+
+    text, *images = FileProcessor.expand_page_images([processed])
+    assert text["content"] == "[Pages 1, 2 of this document have no text layer; they are attached as images.]"
+    assert [image["mime_type"] for image in images] == ["image/jpeg", "image/jpeg"]
+
+
+@pytest.mark.skipif(not PDFPLUMBER_AVAILABLE, reason="pdfplumber is needed")
+def test_text_pages_are_not_rasterized():
+    processed = FileProcessor.extract_pdf(make_sample_pdf(2, lines_per_page=2), PdfPageBudget())
+
+    assert "scanned_pages" not in processed
+    assert "page_images" not in processed
@@ -0,0 +1,41 @@
+import pytest
+
+from utils.http_cache import RangeNotSatisfiable, etag_matches, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-200", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    (" bytes=5-5 ", (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=9-0", "bytes=0-1,5-6", "items=0-9", "bytes=-", "bytes=a-b"])
+def test_malformed_or_multiple_ranges_send_the_whole_body(header):
+    assert parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=-0"])
+def test_range_outside_the_body_is_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable) as error:
+        parse_range(header, 100)
+    assert str(error.value) == "bytes */100"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ('"other"', False),
+    ("*", True),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
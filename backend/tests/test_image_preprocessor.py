@@ -0,0 +1,76 @@
+import asyncio
+import base64
+import io
+
+import pytest
+
+from services.content_cache import ContentCache
+from services.extraction_pool import ExtractionPool
+from services.file_processor import PIL_AVAILABLE, FileProcessor
+from services.image_preprocessor import ImagePreprocessor
+
+pytestmark = pytest.mark.skipif(not PIL_AVAILABLE, reason="Pillow is not installed")
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+
+def encode(image, image_format="PNG", **save_args):
+    output = io.BytesIO()
+    image.save(output, format=image_format, **save_args)
+    return {"mime_type": f"image/{image_format.lower()}", "data": base64.b64encode(output.getvalue()).decode("ascii")}
+
+
+def decode(item):
+    return Image.open(io.BytesIO(base64.b64decode(item["data"])))
+
+
+def test_exif_orientation_is_applied():
+    image = Image.new("RGB", (200, 100), "red")
+    exif = image.getexif()
+    # Orientation 6: the camera was turned, display rotated 90 degrees clockwise
+    exif[0x0112] = 6
+    item = encode(image, "JPEG", exif=exif.tobytes())
+
+    result = FileProcessor.preprocess_image(item, max_edge=1536, image_format="JPEG")
+
+    with decode(result) as rotated:
+        assert rotated.size == (100, 200)
+        assert rotated.getexif().get(0x0112, 1) == 1
+
+
+def test_longest_edge_is_capped_and_the_image_re_encoded():
+    item = encode(Image.effect_noise((900, 300), 64).convert("RGB"))
+
+    result = FileProcessor.preprocess_image(item, max_edge=600, image_format="JPEG", quality=80)
+
+    assert result["mime_type"] == "image/jpeg"
+    with decode(result) as resized:
+        assert resized.format == "JPEG"
+        assert resized.size == (600, 200)
+    assert len(result["data"]) < len(item["data"])
+
+
+def test_small_image_that_would_grow_is_sent_unchanged():
+    item = encode(Image.new("L", (32, 32), 0))
+
+    assert FileProcessor.preprocess_image(item, max_edge=1536, image_format="JPEG") is item
+
+
+def test_preprocessor_reports_savings_and_caches_results(monkeypatch):
+    monkeypatch.setenv("IMAGE_FORMAT", "jpeg")
+    monkeypatch.setenv("IMAGE_MAX_EDGE", "256")
+    preprocessor = ImagePreprocessor(ExtractionPool(max_workers=0), cache=ContentCache())
+    photo = encode(Image.effect_noise((800, 600), 64).convert("RGB"))
+    files = [{"type": "text", "content": "agenda"}, photo]
+
+    processed, report = asyncio.run(preprocessor.process(files))
+    again, second_report = asyncio.run(preprocessor.process(files))
+
+    assert processed[0] == files[0]
+    with decode(processed[1]) as image:
+        assert image.size == (256, 192)
+    assert report["images"] == 1
+    assert report["bytes_saved"] > 0
+    assert again[1] == processed[1]
+    assert second_report["cache_hits"] == 1
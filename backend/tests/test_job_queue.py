@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+from services.admission import AdmissionScheduler
+from services.job_queue import JOB_KIND_TEXT, JobQueue
+from services.job_store import STATUS_FAILED, STATUS_SUCCEEDED, SQLiteJobStore
+
+
+class FakeService:
+    """Stands in for GeminiService, answering text jobs with a fixed MOM"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.admission = AdmissionScheduler(max_concurrency=2)
+
+    async def generate_mom_from_text(self, text):
+        if self.error:
+            raise self.error
+        return {"content": f"# MOM\n{text}"}
+
+
+class ThreadRecordingStore(SQLiteJobStore):
+    """Records the thread every write runs on"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.write_threads = []
+
+    def create(self, job):
+        self.write_threads.append(threading.get_ident())
+        super().create(job)
+
+    def update(self, job_id, **fields):
+        self.write_threads.append(threading.get_ident())
+        super().update(job_id, **fields)
+
+
+async def wait_until_finished(queue, job_id):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] in (STATUS_SUCCEEDED, STATUS_FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def run_job(queue, text="notes"):
+    async def run():
+        await queue.start()
+        try:
+            job = await queue.submit(JOB_KIND_TEXT, text)
+            return await wait_until_finished(queue, job["id"]), threading.get_ident()
+        finally:
+            await queue.stop()
+
+    return asyncio.run(run())
+
+
+def test_sqlite_writes_run_off_the_event_loop(tmp_path):
+    store = ThreadRecordingStore(str(tmp_path / "jobs.db"))
+    job, loop_thread = run_job(JobQueue(FakeService(), store=store, workers=1))
+
+    assert job["status"] == STATUS_SUCCEEDED
+    assert job["result"]["content"] == "# MOM\nnotes"
+    # create, running, finished
+    assert len(store.write_threads) == 3
+    assert loop_thread not in store.write_threads
+
+
+class FlakyStore(SQLiteJobStore):
+    """Fails the first write that marks a job running, like a locked database"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failures = 1
+
+    def update(self, job_id, **fields):
+        if fields.get("status") == "running" and self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        super().update(job_id, **fields)
+
+
+def test_store_error_fails_the_job_and_keeps_the_worker(tmp_path):
+    queue = JobQueue(FakeService(), store=FlakyStore(str(tmp_path / "jobs.db")), workers=1)
+
+    async def run():
+        await queue.start()
+        try:
+            first = await queue.submit(JOB_KIND_TEXT, "first")
+            second = await queue.submit(JOB_KIND_TEXT, "second")
+            return await wait_until_finished(queue, first["id"]), await wait_until_finished(queue, second["id"])
+        finally:
+            await queue.stop()
+
+    first, second = asyncio.run(run())
+
+    assert first["status"] == STATUS_FAILED
+    assert first["error"] == "Job failed: database is locked"
+    assert first["error_status"] == 500
+    # The only worker survived and ran the next job
+    assert second["status"] == STATUS_SUCCEEDED
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.job_store import (
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    MemoryJobStore,
+    SQLiteJobStore,
+    create_job_store,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def make_job(job_id, status=STATUS_QUEUED):
+    return {"id": job_id, "kind": "text", "status": status, "result": None, "error": None}
+
+
+def test_create_update_and_get(store):
+    store.create(make_job("a"))
+    store.update("a", status=STATUS_SUCCEEDED, result={"content": "# MOM"})
+
+    job = store.get("a")
+    assert job["status"] == STATUS_SUCCEEDED
+    assert job["result"] == {"content": "# MOM"}
+    assert store.get("missing") is None
+
+
+def test_update_of_an_unknown_job_is_ignored(store):
+    store.update("missing", status=STATUS_FAILED)
+
+    assert store.get("missing") is None
+
+
+def test_get_returns_a_copy(store):
+    store.create(make_job("a"))
+    store.get("a")["status"] = STATUS_FAILED
+
+    assert store.get("a")["status"] == STATUS_QUEUED
+
+
+def test_prune_removes_only_old_finished_jobs(store):
+    for job_id, status in [("done", STATUS_SUCCEEDED), ("failed", STATUS_FAILED), ("running", STATUS_RUNNING)]:
+        store.create(make_job(job_id, status))
+    time.sleep(0.01)
+    store.create(make_job("recent", STATUS_SUCCEEDED))
+
+    assert store.prune(0.005) == 2
+    assert store.get("done") is None
+    assert store.get("failed") is None
+    assert store.get("running") is not None
+    assert store.get("recent") is not None
+
+
+def test_sqlite_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    store.create(make_job("done", STATUS_SUCCEEDED))
+    store.create(make_job("queued", STATUS_QUEUED))
+    store.create(make_job("running", STATUS_RUNNING))
+
+    reopened = SQLiteJobStore(path)
+    assert reopened.fail_unfinished("Server restarted") == 2
+
+    assert reopened.get("done")["status"] == STATUS_SUCCEEDED
+    for job_id in ("queued", "running"):
+        job = reopened.get(job_id)
+        assert job["status"] == STATUS_FAILED
+        assert job["error"] == "Server restarted"
+
+
+def test_create_job_store_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOB_STORE", "sqlite")
+    monkeypatch.setenv("JOB_STORE_PATH", str(tmp_path / "jobs.db"))
+    assert isinstance(create_job_store(), SQLiteJobStore)
+
+    monkeypatch.setenv("JOB_STORE", "memory")
+    assert isinstance(create_job_store(), MemoryJobStore)
+
+    monkeypatch.setenv("JOB_STORE", "redis")
+    with pytest.raises(ValueError):
+        create_job_store()
+
+
+def test_sqlite_restart_leaves_jobs_of_live_workers_alone(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    SQLiteJobStore(path, owner=exited.pid).create(make_job("orphaned", STATUS_RUNNING))
+    # Another worker process that is still serving its jobs
+    SQLiteJobStore(path, owner=os.getppid()).create(make_job("live", STATUS_QUEUED))
+
+    assert SQLiteJobStore(path).fail_unfinished("Server restarted") == 1
+
+    assert SQLiteJobStore(path).get("orphaned")["status"] == STATUS_FAILED
+    assert SQLiteJobStore(path).get("live")["status"] == STATUS_QUEUED
+
+
+def test_sqlite_store_adds_the_owner_column_to_older_files(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL NOT NULL, data TEXT NOT NULL)"
+    )
+    old_job = make_job("old", STATUS_RUNNING)
+    conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?)", ("old", STATUS_RUNNING, time.time(), json.dumps(old_job)))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteJobStore(path)
+
+    assert store.fail_unfinished("Server restarted") == 1
+    store.create(make_job("new"))
+    assert store.get("new")["status"] == STATUS_QUEUED
@@ -0,0 +1,120 @@
+from services.markdown_ast import (
+    BLANK,
+    BULLET,
+    HEADING,
+    NUMBERED,
+    PARAGRAPH,
+    TABLE,
+    MarkdownParser,
+    Span,
+    parse_inline,
+    parse_markdown_uncached,
+    plain_text,
+)
+
+
+def test_parse_inline_emphasis_and_links():
+    assert parse_inline("Use **bold**, *italic*, __strong__ and _soft_ text") == (
+        Span("Use "),
+        Span("bold", bold=True),
+        Span(", "),
+        Span("italic", italic=True),
+        Span(", "),
+        Span("strong", bold=True),
+        Span(" and "),
+        Span("soft", italic=True),
+        Span(" text"),
+    )
+    assert parse_inline("See [the docs](https://example.com) first") == (
+        Span("See "),
+        Span("the docs"),
+        Span(" first"),
+    )
+
+
+def test_underscores_inside_words_are_not_emphasis():
+    assert plain_text(parse_inline("snake_case_name stays")) == "snake_case_name stays"
+
+
+def test_parse_blocks():
+    document = parse_markdown_uncached(
+        "# Minutes of Meeting\n"
+        "\n"
+        "## Action Items\n"
+        "- Ship **v2**\n"
+        "* Review docs\n"
+        "1. First\n"
+        "2. Second\n"
+        "Closing remarks\n"
+    )
+
+    assert [block.kind for block in document] == [
+        HEADING, BLANK, HEADING, BULLET, BULLET, NUMBERED, NUMBERED, PARAGRAPH, BLANK,
+    ]
+    assert document[0].level == 1
+    assert plain_text(document[0].spans) == "Minutes of Meeting"
+    assert document[2].level == 2
+    assert document[3].spans == (Span("Ship "), Span("v2", bold=True))
+    assert [block.number for block in document[5:7]] == [1, 2]
+
+
+def test_parse_table_drops_the_separator_row():
+    document = parse_markdown_uncached(
+        "| Owner | Task |\n"
+        "|:------|-----:|\n"
+        "| Asha | **Deploy** |\n"
+        "After the table"
+    )
+
+    table = document[0]
+    assert table.kind == TABLE
+    assert [[plain_text(cell) for cell in row] for row in table.rows] == [["Owner", "Task"], ["Asha", "Deploy"]]
+    assert table.rows[1][1] == (Span("Deploy", bold=True),)
+    assert document[1].kind == PARAGRAPH
+
+
+def test_table_at_the_end_of_the_document():
+    document = parse_markdown_uncached("| A | B |\n|---|---|\n| 1 | 2 |")
+
+    assert [block.kind for block in document] == [TABLE]
+
+
+def test_parser_caches_by_content():
+    parser = MarkdownParser(cache_size=1)
+
+    first = parser.parse("# One")
+    assert parser.parse("# One") is first
+    parser.parse("# Two")
+    assert parser.parse("# One") is not first
+    assert parser.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+
+def test_markup_nests_inside_emphasis_and_links():
+    assert parse_inline("Moved to **[FastAPI](https://fastapi.tiangolo.com)** today") == (
+        Span("Moved to "),
+        Span("FastAPI", bold=True),
+        Span(" today"),
+    )
+    assert parse_inline("**Owner: *Asha* first**") == (
+        Span("Owner: ", bold=True),
+        Span("Asha", bold=True, italic=True),
+        Span(" first", bold=True),
+    )
+    assert parse_inline("[**the docs**](https://example.com)") == (Span("the docs", bold=True),)
+
+
+def test_indentation_is_kept_for_nested_items_and_continuation_lines():
+    document = parse_markdown_uncached("- Parent\n  - Child\n    continued\n1. Step\n   1. Sub-step")
+
+    assert [(block.kind, block.indent) for block in document] == [
+        (BULLET, ""), (BULLET, "  "), (PARAGRAPH, "    "), (NUMBERED, ""), (NUMBERED, "   "),
+    ]
+    assert plain_text(document[2].spans) == "continued"
+
+
+def test_heading_without_a_space_after_the_hashes():
+    document = parse_markdown_uncached("##Action Items")
+
+    assert document[0].kind == HEADING
+    assert document[0].level == 2
+    assert plain_text(document[0].spans) == "Action Items"
@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils import metrics
+
+pytestmark = pytest.mark.skipif(not metrics.METRICS_AVAILABLE, reason="prometheus-client is not installed")
+
+
+class Reply:
+    text = "# Minutes of Meeting\n\n- Ship the release\n"
+    usage_metadata = None
+
+
+def test_metrics_are_labelled_with_the_route_template(monkeypatch):
+    async def call_model(contents, stream=False):
+        return Reply()
+
+    monkeypatch.setattr(main.gemini_service, "_call_model", call_model)
+    client = TestClient(main.app)
+    mom_id = client.post("/api/process-text", json={"text": "Asha: metrics test notes"}).json()["data"]["mom_id"]
+    client.get(f"/api/mom/{mom_id}.txt")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'mom_requests_total{endpoint="/api/process-text",status="200"}' in body
+    assert 'endpoint="/api/mom/{mom_id}.{format}"' in body
+    # Concrete ids never become label values
+    assert mom_id not in body
+    for stage in ("prompt", "generation", "render_txt"):
+        assert f'stage="{stage}"' in body
+    assert 'mom_stage_duration_seconds_bucket{endpoint="/api/process-text"' in body
+    assert "mom_request_duration_seconds_count" in body
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from utils import profiling
+from utils.profiling import ProfilingMiddleware, RequestProfiler, current_profiler, run_sync
+
+
+def busy_work():
+    """Blocks its thread for a while, like PDF extraction or DOCX rendering"""
+    time.sleep(0.2)
+    return "done"
+
+
+@pytest.mark.parametrize("pyinstrument", [False, pytest.param(True, marks=pytest.mark.skipif(
+    not profiling.PYINSTRUMENT_AVAILABLE, reason="pyinstrument is not installed"))])
+def test_profiled_blocking_work_runs_off_the_event_loop(pyinstrument, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PYINSTRUMENT_AVAILABLE", pyinstrument)
+    profiler = RequestProfiler(interval=0.001)
+
+    async def other_request(ticks):
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        ticks = []
+        ticker = asyncio.ensure_future(other_request(ticks))
+        await asyncio.sleep(0)
+        token = profiling._profiler.set(profiler)
+        profiler.start()
+        try:
+            assert current_profiler() is profiler
+            result = await run_sync(busy_work)
+        finally:
+            snapshot = profiler.stop()
+            profiling._profiler.reset(token)
+            ticker.cancel()
+        return result, ticks, snapshot
+
+    result, ticks, snapshot = asyncio.run(run())
+    prefix = str(tmp_path / "profile")
+    profiler.write(prefix, *snapshot)
+
+    assert result == "done"
+    # The event loop kept serving the other request while the work ran
+    assert len(ticks) > 5
+    report = (tmp_path / ("profile-thread-1.html" if pyinstrument else "profile.txt")).read_text()
+    assert "busy_work" in report
+
+
+def test_run_sync_without_profiling():
+    assert current_profiler() is None
+    assert asyncio.run(run_sync(busy_work)) == "done"
+
+
+def test_memory_report_counts_requests_served_while_profiling(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_REQUESTS", "true")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    sent = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def download(request):
+            await release.wait()
+            return PlainTextResponse("mom")
+
+        async def health(request):
+            return PlainTextResponse("ok")
+
+        app = Starlette(routes=[Route("/api/mom/{mom_id}.{format}", download), Route("/api/health", health)])
+        middleware = ProfilingMiddleware(app)
+
+        async def request(path):
+            scope = {
+                "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+                "root_path": "", "query_string": b"", "headers": [], "server": ("test", 80), "app": app,
+            }
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                sent.append((path, message))
+
+            await middleware(scope, receive, send)
+
+        profiled = asyncio.ensure_future(request("/api/mom/abc.md"))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(request("/api/health"), request("/api/health"))
+        release.set()
+        await profiled
+
+    asyncio.run(run())
+
+    (report,) = tmp_path.glob("*-memory.txt")
+    header = report.read_text()
+    assert "Other requests in flight while profiling: 2" in header
+    assert "process-wide" in header
+    starts = [message for path, message in sent if message["type"] == "http.response.start"]
+    assert [message["status"] for message in starts] == [200, 200, 200]
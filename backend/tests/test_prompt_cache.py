@@ -0,0 +1,143 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import prompt_cache
+from services.prompt_cache import MODE_CACHED_CONTENT, MODE_INLINE, MODE_SYSTEM_INSTRUCTION, PromptCache
+
+SYSTEM_PROMPT = "You write minutes of meetings."
+
+
+class StubModel:
+    """Stands in for GenerativeModel; records how it was built"""
+
+    def __init__(self, model_name, system_instruction=None, cached_content=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls(cached_content.model, cached_content=cached_content)
+
+
+class StubCachedContent:
+    created = []
+    fail = False
+
+    @classmethod
+    def create(cls, model, display_name, system_instruction, ttl):
+        if cls.fail:
+            raise RuntimeError("Cached content is too small")
+        cached = SimpleNamespace(
+            model=model,
+            system_instruction=system_instruction,
+            ttl=ttl,
+            usage_metadata=SimpleNamespace(total_token_count=1200),
+        )
+        cls.created.append(cached)
+        return cached
+
+
+@pytest.fixture(autouse=True)
+def stub_sdk(monkeypatch):
+    StubCachedContent.created = []
+    StubCachedContent.fail = False
+    monkeypatch.setattr(prompt_cache, "GenerativeModel", StubModel)
+    monkeypatch.setattr(prompt_cache, "caching", SimpleNamespace(CachedContent=StubCachedContent), raising=False)
+    monkeypatch.setattr(prompt_cache, "CONTEXT_CACHING_AVAILABLE", True)
+
+
+def response_with(cached_tokens):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(cached_content_token_count=cached_tokens))
+
+
+def test_cached_content_registers_the_prompt_once():
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode=MODE_CACHED_CONTENT)
+
+    async def run():
+        return await cache.get_model(), await cache.get_model()
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    assert cache.mode == MODE_CACHED_CONTENT
+    assert len(StubCachedContent.created) == 1
+    assert StubCachedContent.created[0].model == "models/gemini-test"
+    assert StubCachedContent.created[0].system_instruction == SYSTEM_PROMPT
+    assert first.cached_content is StubCachedContent.created[0]
+    # Requests carry only the meeting content
+    assert cache.prepare("notes") == "notes"
+    assert cache.prepare(["notes", {"mime_type": "image/png"}]) == ["notes", {"mime_type": "image/png"}]
+
+
+def test_cached_content_counts_saved_prompt_tokens():
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode=MODE_CACHED_CONTENT)
+    asyncio.run(cache.get_model())
+
+    cache.record_usage(response_with(900))
+    # Without usage metadata the registered prompt size is counted
+    cache.record_usage(response_with(0))
+
+    stats = cache.stats()
+    assert stats["mode"] == MODE_CACHED_CONTENT
+    assert stats["requests"] == 2
+    assert stats["prompt_tokens_saved"] == 900 + 1200
+    assert stats["refreshes"] == 1
+
+
+def test_cached_content_is_recreated_before_it_expires():
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode=MODE_CACHED_CONTENT)
+    first = asyncio.run(cache.get_model())
+
+    cache._expires_at = time.time() + cache.refresh_seconds - 1
+    second = asyncio.run(cache.get_model())
+
+    assert second is not first
+    assert len(StubCachedContent.created) == 2
+    assert cache.stats()["refreshes"] == 2
+
+
+def test_system_instruction_sets_the_prompt_on_the_model():
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode=MODE_SYSTEM_INSTRUCTION)
+    model = asyncio.run(cache.get_model())
+
+    assert cache.mode == MODE_SYSTEM_INSTRUCTION
+    assert model.model_name == "gemini-test"
+    assert model.system_instruction == SYSTEM_PROMPT
+    assert StubCachedContent.created == []
+    assert cache.prepare("notes") == "notes"
+
+    cache.record_usage(response_with(0))
+    assert cache.stats()["prompt_tokens_saved"] == 0
+
+
+def test_inline_prepends_the_prompt_to_every_request():
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode=MODE_INLINE)
+    model = asyncio.run(cache.get_model())
+
+    assert cache.mode == MODE_INLINE
+    assert model.system_instruction is None
+    assert cache.prepare("notes") == f"{SYSTEM_PROMPT}\n\nnotes"
+    image = {"mime_type": "image/png", "data": "AAAA"}
+    assert cache.prepare(["notes", image]) == [SYSTEM_PROMPT, "notes", image]
+
+
+def test_auto_falls_back_when_context_caching_is_refused():
+    StubCachedContent.fail = True
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode="auto")
+    model = asyncio.run(cache.get_model())
+
+    assert cache.mode == MODE_SYSTEM_INSTRUCTION
+    assert model.system_instruction == SYSTEM_PROMPT
+
+
+def test_auto_skips_context_caching_when_the_sdk_lacks_it(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "CONTEXT_CACHING_AVAILABLE", False)
+    cache = PromptCache("gemini-test", SYSTEM_PROMPT, mode="auto")
+    asyncio.run(cache.get_model())
+
+    assert cache.mode == MODE_SYSTEM_INSTRUCTION
+    assert StubCachedContent.created == []
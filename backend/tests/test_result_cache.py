@@ -0,0 +1,104 @@
+import asyncio
+import io
+
+import pytest
+
+from services.content_cache import ContentCache
+from services.result_cache import ResultCache, digest_uploads, normalize_text
+
+
+def make_cache():
+    return ResultCache(ContentCache(max_bytes=1024 * 1024, ttl_seconds=60))
+
+
+def test_identical_concurrent_requests_share_one_call():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"content": "# MOM"}
+
+    async def run():
+        cache = make_cache()
+        results = await asyncio.gather(*[cache.get_or_compute("key", compute) for _ in range(5)])
+        return cache, results
+
+    cache, results = asyncio.run(run())
+
+    assert calls == 1
+    assert results == [{"content": "# MOM"}] * 5
+    assert cache.coalesced == 4
+    # Every caller gets its own copy to annotate
+    assert len({id(result) for result in results}) == 5
+
+
+def test_cached_result_is_served_without_computing():
+    async def run():
+        cache = make_cache()
+        await cache.get_or_compute("key", lambda: asyncio.sleep(0, {"content": "first"}))
+        return await cache.get_or_compute("key", lambda: asyncio.sleep(0, {"content": "second"}))
+
+    assert asyncio.run(run()) == {"content": "first"}
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("No valid content")
+
+    async def run():
+        cache = make_cache()
+        results = await asyncio.gather(*[cache.get_or_compute("key", failing) for _ in range(3)], return_exceptions=True)
+        retried = await cache.get_or_compute("key", lambda: asyncio.sleep(0, {"content": "# MOM"}))
+        return results, retried
+
+    results, retried = asyncio.run(run())
+
+    assert calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == {"content": "# MOM"}
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"content": f"call {calls}"}
+
+    async def run():
+        cache = make_cache()
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == {"content": "call 2"}
+    assert calls == 2
+
+
+def test_normalize_text_ignores_line_endings_and_trailing_spaces():
+    assert normalize_text("  Notes  \r\nAction item   \r\n\n") == normalize_text("  Notes\nAction item")
+
+
+def test_digest_uploads_covers_mime_type_and_content():
+    def uploads(mime_type, data):
+        return [(mime_type, io.BytesIO(data))]
+
+    digest = digest_uploads(uploads("text/plain", b"notes"))
+
+    assert digest == digest_uploads(uploads("text/plain", b"notes"))
+    assert digest != digest_uploads(uploads("text/markdown", b"notes"))
+    assert digest != digest_uploads(uploads("text/plain", b"notes!"))
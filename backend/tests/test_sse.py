@@ -0,0 +1,101 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+class StreamedResponse:
+    """Async-iterable stand-in for a streamed Gemini response"""
+
+    def __init__(self, texts, fail_after=None):
+        self.texts = texts
+        self.fail_after = fail_after
+        self.usage_metadata = None
+
+    async def __aiter__(self):
+        for index, text in enumerate(self.texts):
+            if index == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield SimpleNamespace(text=text)
+
+
+def parse_sse(body):
+    """(event, data) pairs from an SSE body, checking each message's framing"""
+    assert body.endswith("\n\n")
+    events = []
+    for message in body[:-2].split("\n\n"):
+        event_line, data_line = message.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def streamed_model(monkeypatch):
+    """Makes the model stream the given texts; returns the setter"""
+    def stream(texts, fail_after=None):
+        async def call_model(contents, stream=False):
+            assert stream
+            return StreamedResponse(texts, fail_after)
+        monkeypatch.setattr(main.gemini_service, "_call_model", call_model)
+    return stream
+
+
+def test_text_stream_sends_chunks_then_done(streamed_model):
+    streamed_model(["# Minutes of Meeting", " — SSE"])
+
+    response = TestClient(main.app).post("/api/process-text/stream", json={"text": "Asha: SSE framing notes"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    events = parse_sse(response.text)
+    assert events[:2] == [("chunk", {"text": "# Minutes of Meeting"}), ("chunk", {"text": " — SSE"})]
+    event, done = events[2]
+    assert event == "done" and len(events) == 3
+    assert done["content"] == "# Minutes of Meeting — SSE"
+    assert done["cached"] is False
+    assert done["mom_id"]
+    assert "queue_wait_ms" in done
+
+
+def test_repeated_request_is_served_from_the_cache_in_one_chunk(streamed_model):
+    streamed_model(["# Cached", " MOM"])
+    client = TestClient(main.app)
+    client.post("/api/process-text/stream", json={"text": "Asha: SSE cache notes"})
+
+    events = parse_sse(client.post("/api/process-text/stream", json={"text": "Asha: SSE cache notes"}).text)
+
+    assert [event for event, _ in events] == ["chunk", "done"]
+    assert events[0][1] == {"text": "# Cached MOM"}
+    assert events[1][1]["cached"] is True
+
+
+def test_failure_mid_stream_ends_with_an_error_event(streamed_model):
+    streamed_model(["# Partial", " never sent"], fail_after=1)
+
+    response = TestClient(main.app).post("/api/process-text/stream", json={"text": "Asha: SSE failure notes"})
+
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert events == [
+        ("chunk", {"text": "# Partial"}),
+        ("error", {"detail": "Failed to generate MOM: connection reset"}),
+    ]
+
+
+def test_file_stream_sends_chunks_then_done(streamed_model):
+    streamed_model(["# From files"])
+
+    response = TestClient(main.app).post(
+        "/api/process-files/stream",
+        files=[("files", ("notes.txt", b"Ravi: SSE upload notes", "text/plain"))],
+    )
+
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["chunk", "done"]
+    assert events[1][1]["content"] == "# From files"
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import main
+from models.mom import MomDocument
+from services.structured_mom import StructuredOutput, response_schema
+
+MOM_JSON = {
+    "meetings": [{
+        "title": "Weekly Sync",
+        "date": "14-Oct-2026",
+        "attendees": [{"name": "Asha", "role": "PM"}, {"name": "Ravi"}],
+        "agenda": ["Release"],
+        "discussion_points": ["Release is on track"],
+        "decisions": [{"decision": "Ship on Friday", "owner": "Asha"}],
+        "action_items": [{"action": "Tag the build | notify QA", "owner": "Ravi", "due_date": "16-Oct-2026"}],
+    }]
+}
+
+
+def test_schema_valid_json_is_rendered_into_the_template():
+    structured = StructuredOutput("json")
+
+    markdown, details = structured.render("```json\n" + json.dumps(MOM_JSON) + "\n```")
+
+    assert markdown.startswith("# Minutes of Meeting — Weekly Sync")
+    assert "**Attendees:** Asha (PM), Ravi  " in markdown
+    assert "- Ship on Friday — Asha" in markdown
+    assert "| 1 | Tag the build / notify QA | Ravi | 16-Oct-2026 | Open |" in markdown
+    assert "## Risks / Dependencies\n- TBD" in markdown
+    assert details["structured"]["meetings"][0]["title"] == "Weekly Sync"
+    assert structured.stats()["rendered"] == 1
+
+
+def test_invalid_json_falls_back_to_the_raw_text():
+    structured = StructuredOutput("json")
+    raw = '{"meetings": [{"date": "14-Oct-2026"}]}'
+
+    markdown, details = structured.render(raw)
+
+    assert markdown == raw
+    assert details["structured_error"].startswith("Structured MOM did not match the schema")
+    assert structured.stats()["fallbacks"] == 1
+
+
+def test_unusable_input_renders_the_model_message():
+    markdown, _ = StructuredOutput("json").render('{"meetings": [], "message": "Photos are too blurry."}')
+
+    assert markdown == "Photos are too blurry."
+
+
+def test_response_schema_inlines_references_and_marks_optional_fields():
+    schema = response_schema(MomDocument)
+    meeting = schema["properties"]["meetings"]["items"]
+
+    assert meeting["properties"]["location"] == {"type": "string", "nullable": True}
+    assert meeting["properties"]["attendees"]["items"]["required"] == ["name"]
+    assert "$defs" not in json.dumps(schema)
+
+
+def test_json_mode_at_the_api(monkeypatch):
+    service = main.gemini_service
+
+    async def call_model(contents, stream=False):
+        return SimpleNamespace(text=json.dumps(MOM_JSON), usage_metadata=None)
+
+    monkeypatch.setattr(service, "structured", StructuredOutput("json"))
+    monkeypatch.setattr(service, "_call_model", call_model)
+
+    response = TestClient(main.app).post("/api/process-text", json={"text": "Asha: structured output test notes"})
+
+    assert response.status_code == 200
+    body = response.json()["data"]
+    assert body["content"].startswith("# Minutes of Meeting — Weekly Sync")
+    assert body["structured"]["meetings"][0]["decisions"][0]["decision"] == "Ship on Friday"
+    assert "structured_error" not in body
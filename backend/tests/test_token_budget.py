@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.token_budget import (
+    ACTION_ACCEPT,
+    ACTION_CHUNK,
+    ACTION_REJECT,
+    BudgetExceededError,
+    TokenBudget,
+)
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setenv("MAX_INPUT_TOKENS", "1000")
+    return TokenBudget(chunk_threshold_chars=2000)
+
+
+def test_short_text_is_accepted(budget):
+    plan = budget.plan_text("x" * 400, "prompt " * 10)
+
+    assert plan["action"] == ACTION_ACCEPT
+    assert plan["estimated_tokens"] == 100 + 18
+    budget.check(plan)
+
+
+def test_text_past_the_threshold_is_chunked(budget):
+    assert budget.plan_text("x" * 2400)["action"] == ACTION_CHUNK
+
+
+def test_text_past_the_token_limit_is_rejected(budget):
+    plan = budget.plan_text("x" * 4400)
+
+    assert plan["action"] == ACTION_REJECT
+    with pytest.raises(BudgetExceededError) as raised:
+        budget.check(plan)
+    assert raised.value.budget is plan
+
+
+class ServingModel:
+    """The model the prompt cache serves requests with; its count includes the system prompt it carries"""
+
+    def __init__(self, prompt_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.counted = []
+
+    async def count_tokens_async(self, contents):
+        self.counted.append(contents)
+        return SimpleNamespace(total_tokens=self.prompt_tokens + len(str(contents)) // 4)
+
+
+class UncountedModel:
+    async def count_tokens_async(self, contents):
+        raise AssertionError("counted without the system prompt")
+
+
+@pytest.fixture
+def exact_counting(monkeypatch):
+    service = main.gemini_service
+    serving = ServingModel(prompt_tokens=5000)
+
+    async def get_model():
+        return serving
+
+    monkeypatch.setattr(service.token_budget, "exact_counting", True)
+    monkeypatch.setattr(service.token_budget, "max_input_tokens", 4000)
+    monkeypatch.setattr(service, "model", UncountedModel())
+    monkeypatch.setattr(service.prompt_cache, "get_model", get_model)
+    monkeypatch.setattr(service.prompt_cache, "mode", "system_instruction")
+    return serving
+
+
+def test_exact_count_includes_the_prompt_carried_by_the_serving_model(exact_counting):
+    with pytest.raises(BudgetExceededError) as raised:
+        asyncio.run(main.gemini_service._prepare_text("Asha: short notes"))
+
+    assert raised.value.budget["exact"] is True
+    assert raised.value.budget["estimated_tokens"] > 5000
+    # In system_instruction mode the prompt is not repeated in the contents
+    assert "Asha: short notes" in exact_counting.counted[0]
+    assert main.gemini_service.system_prompt not in exact_counting.counted[0]
+
+
+def test_oversized_input_is_413_at_the_api(exact_counting):
+    response = TestClient(main.app).post("/api/process-text", json={"text": "Asha: short notes"})
+
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Input is too large")
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils import tracing as tracing_module
+from utils.tracing import TRACING_AVAILABLE, tracing
+
+pytestmark = pytest.mark.skipif(not TRACING_AVAILABLE, reason="opentelemetry-sdk is not installed")
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported_spans(monkeypatch):
+    """Route spans to memory; the fixture returns a function that flushes and lists them"""
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    monkeypatch.setenv("TRACING_EXPORTER", "file")
+    monkeypatch.setattr(tracing_module, "create_exporter", lambda name, path: exporter)
+    monkeypatch.setattr(tracing, "_configured", False)
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.setattr(tracing, "_provider", None)
+
+    def finished():
+        tracing._provider.force_flush()
+        return exporter.get_finished_spans()
+
+    yield finished
+    tracing.shutdown()
+
+
+def test_incoming_traceparent_is_the_parent_of_the_server_span(exported_spans):
+    response = TestClient(main.app).get(
+        "/api/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"}
+    )
+
+    assert response.status_code == 200
+    (server,) = [span for span in exported_spans() if span.name == "GET /api/health"]
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == PARENT_SPAN_ID
+    assert server.parent.is_remote
+    assert server.attributes["http.status_code"] == 200
+
+
+def test_unsampled_caller_keeps_the_trace_unsampled(exported_spans):
+    TestClient(main.app).get("/api/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-00"})
+
+    assert exported_spans() == ()
+
+
+def test_request_without_traceparent_starts_a_trace_with_stage_children(exported_spans, monkeypatch):
+    async def call_model(contents, stream=False):
+        return SimpleNamespace(text="# Minutes of Meeting — Tracing", usage_metadata=None)
+
+    monkeypatch.setattr(main.gemini_service, "_call_model", call_model)
+
+    response = TestClient(main.app).post("/api/process-text", json={"text": "Asha: tracing test notes"})
+
+    assert response.status_code == 200
+    spans = exported_spans()
+    (server,) = [span for span in spans if span.name == "POST /api/process-text"]
+    assert server.parent is None
+    stages = {span.name: span for span in spans if span.parent is not None and span.parent.span_id == server.context.span_id}
+    assert "prompt" in stages
+    assert all(span.context.trace_id == server.context.trace_id for span in stages.values())
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import main
+from services.transcript_chunker import SPEAKER_TURN_PATTERN, TranscriptChunker
+
+
+@pytest.mark.parametrize("line", [
+    "Asha: the release is on track",
+    "Dr. Ben Okafor: agreed",
+    "Asha (PM): one more thing",
+    "Speaker 2: can you hear me?",
+    "[10:32] Asha: the release is on track",
+    "10:32:05 Ben - agreed",
+    "[10:32] Asha",
+])
+def test_speaker_turns(line):
+    assert SPEAKER_TURN_PATTERN.match(line)
+
+
+@pytest.mark.parametrize("line", [
+    "Q3 Budget - approved",
+    "Hiring - two backend roles",
+    "the plan: ship on Friday",
+    "Action items were reviewed: none left",
+    "Asha:no space after the colon",
+])
+def test_not_speaker_turns(line):
+    assert not SPEAKER_TURN_PATTERN.match(line)
+
+
+def test_short_text_is_one_chunk():
+    assert TranscriptChunker.split("Asha: hi", 100) == ["Asha: hi"]
+
+
+def test_splits_between_speaker_turns_and_keeps_continuation_lines():
+    text = "\n".join([
+        "Asha: we reviewed the agenda",
+        "Q3 Budget - approved",
+        "Hiring - two backend roles",
+        "Ben: the migration is next",
+        "it needs one more week",
+        "Chen: I can help with it",
+    ])
+
+    chunks = TranscriptChunker.split(text, 90)
+
+    assert chunks == [
+        "Asha: we reviewed the agenda\nQ3 Budget - approved\nHiring - two backend roles",
+        "Ben: the migration is next\nit needs one more week\nChen: I can help with it",
+    ]
+
+
+def test_falls_back_to_paragraphs_without_speakers():
+    paragraphs = ["First topic " * 5, "Second topic " * 5, "Third topic " * 5]
+
+    chunks = TranscriptChunker.split("\n\n".join(paragraphs), 140)
+
+    assert [chunk.split("\n") for chunk in chunks] == [paragraphs[:2], paragraphs[2:]]
+
+
+def test_long_turn_is_split_on_sentences_then_characters():
+    sentences = [f"Sentence {index} is about the plan." for index in range(6)]
+    turn = "Asha: " + " ".join(sentences) + " " + "x" * 120
+
+    chunks = TranscriptChunker.split(turn, 80)
+
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert chunks[0].startswith("Asha: Sentence 0 is about the plan.")
+    # Every character survives, only the joining whitespace changes
+    assert "".join("".join(chunks).split()) == "".join(turn.split())
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+def test_long_transcript_is_mapped_per_chunk_and_merged(monkeypatch):
+    service = main.gemini_service
+    map_prompts = []
+    merge_calls = []
+
+    class MapModel:
+        async def generate_content_async(self, prompt):
+            map_prompts.append(prompt)
+            return Reply(f"notes {len(map_prompts)}")
+
+    async def call_model(contents, stream=False):
+        merge_calls.append(contents)
+        return Reply("# Minutes of Meeting")
+
+    monkeypatch.setattr(service, "model", MapModel())
+    monkeypatch.setattr(service, "_call_model", call_model)
+    monkeypatch.setattr(service, "chunk_max_chars", 200)
+    monkeypatch.setattr(service.token_budget, "chunk_threshold_chars", 300)
+    transcript = "\n".join(f"Speaker {index % 3}: point {index} about the chunked meeting" for index in range(20))
+
+    result = asyncio.run(service.generate_mom_from_text(transcript))
+
+    chunks = TranscriptChunker.split(transcript, 200)
+    assert len(chunks) > 1
+    assert len(map_prompts) == len(chunks)
+    assert all(chunk in prompt for chunk, prompt in zip(chunks, map_prompts))
+    merge_prompt = str(merge_calls[0])
+    assert f"--- Part 1 of {len(chunks)} ---\nnotes" in merge_prompt
+    assert "point 0 about" not in merge_prompt
+    assert result["content"] == "# Minutes of Meeting"
+    assert result["budget"]["action"] == "chunk"
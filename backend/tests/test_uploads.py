@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.bench_pdf_extraction import make_sample_pdf
+from services import extraction_pool
+
+docx = pytest.importorskip("docx")
+Image = pytest.importorskip("PIL.Image")
+
+# Starlette keeps multipart parts in memory up to 1 MB, then spools them to disk
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def make_docx(text):
+    document = docx.Document()
+    document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class Reply:
+    text = "# Minutes of Meeting\n\n- Ship the release\n"
+    usage_metadata = None
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    calls = []
+
+    async def call_model(contents, stream=False):
+        calls.append(contents)
+        return Reply()
+
+    monkeypatch.setattr(main.gemini_service, "_call_model", call_model)
+    return calls
+
+
+@pytest.fixture
+def worker_sources(monkeypatch):
+    """What the extraction workers receive for each file"""
+    sources = []
+    process_source = extraction_pool._process_source
+
+    def recording_process_source(mime_type, source):
+        sources.append((mime_type, source))
+        return process_source(mime_type, source)
+
+    monkeypatch.setattr(extraction_pool, "_process_source", recording_process_source)
+    return sources
+
+
+def test_mixed_multipart_upload_is_extracted_from_files_on_disk(model_calls, worker_sources):
+    transcript = b"Asha: the release ships on Friday\n" * (SPOOL_MAX_BYTES // 30)
+    files = [
+        ("files", ("agenda.pdf", make_sample_pdf(3), "application/pdf")),
+        ("files", ("whiteboard.png", make_png(), "image/png")),
+        ("files", ("notes.docx", make_docx("Decision: move the launch to Friday"), "application/octet-stream")),
+        ("files", ("transcript.txt", transcript, "text/plain")),
+    ]
+    assert len(transcript) > SPOOL_MAX_BYTES
+
+    response = TestClient(main.app).post("/api/process-files", files=files)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["content"] == Reply.text
+    # Every part, the rolled-over transcript included, reached the workers as a path
+    assert sorted(mime_type for mime_type, _ in worker_sources) == [
+        "application/pdf",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "image/png",
+        "text/plain",
+    ]
+    assert all(isinstance(source, str) for _, source in worker_sources)
+
+    prompt = str(model_calls[0])
+    assert "Page 3 line 0" in prompt
+    assert "Decision: move the launch to Friday" in prompt
+    assert "Asha: the release ships on Friday" in prompt
+    assert "image/" in prompt
+
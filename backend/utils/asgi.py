@@ -0,0 +1,16 @@
+from typing import Any, Dict
+
+from starlette.routing import Match
+
+# Label for requests that matched no route, so unknown paths cannot grow label sets
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the route a request matches, such as ``/api/jobs/{job_id}``"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
@@ -0,0 +1,226 @@
+import gzip
+import os
+import zlib
+from typing import List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+# zstd is optional; gzip is always available
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+    DECODE_ERRORS = (zlib.error, zstandard.ZstdError)
+except ImportError:
+    ZSTD_AVAILABLE = False
+    DECODE_ERRORS = (zlib.error,)
+
+SUPPORTED_ENCODINGS = ["zstd", "gzip"] if ZSTD_AVAILABLE else ["gzip"]
+
+# Response types worth compressing; streamed responses (SSE, NDJSON) are never buffered
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# Decompressed output produced per decompress call, so one small input chunk cannot expand unchecked
+DECODE_STEP_BYTES = 64 * 1024
+ZSTD_INPUT_STEP_BYTES = 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred supported coding from an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    best, best_quality = None, 0.0
+    for entry in accept_encoding.split(","):
+        name, _, params = entry.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name == "*":
+            name = SUPPORTED_ENCODINGS[-1]
+        # Ties go to the first supported coding (zstd before gzip)
+        if name in SUPPORTED_ENCODINGS and quality > 0 and (
+            quality > best_quality or (quality == best_quality and SUPPORTED_ENCODINGS.index(name) < SUPPORTED_ENCODINGS.index(best))
+        ):
+            best, best_quality = name, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+class BodyDecoder:
+    """Incrementally decompresses one request body, failing once it exceeds ``max_bytes``
+
+    Output is produced in bounded steps and counted as it goes, so a small
+    compressed body cannot expand into memory past the cap (a zip bomb).
+    """
+
+    def __init__(self, encoding: str, max_bytes: int):
+        self.encoding = encoding
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._decoder = self._new_decoder()
+
+    def _new_decoder(self):
+        if self.encoding == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decode(self, data: bytes, final: bool) -> bytes:
+        try:
+            output = self._decode_zstd(data) if self.encoding == "zstd" else self._decode_gzip(data)
+            if final and self.encoding == "gzip" and not self._decoder.eof:
+                raise zlib.error("truncated gzip stream")
+        except DECODE_ERRORS as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {self.encoding} request body: {e}")
+        return b"".join(output)
+
+    def _decode_gzip(self, data: bytes) -> List[bytes]:
+        output = []
+        while True:
+            if self._decoder.eof and data:
+                # Another gzip member follows
+                self._decoder = self._new_decoder()
+            chunk = self._decoder.decompress(data, DECODE_STEP_BYTES)
+            output.append(self._count(chunk))
+            data = self._decoder.unconsumed_tail or self._decoder.unused_data
+            # A full step may leave output pending even with no input left
+            if not data and len(chunk) < DECODE_STEP_BYTES:
+                return output
+
+    def _decode_zstd(self, data: bytes) -> List[bytes]:
+        # The zstd object has no output limit, so feed it small slices and check after each
+        return [
+            self._count(self._decoder.decompress(data[offset:offset + ZSTD_INPUT_STEP_BYTES]))
+            for offset in range(0, len(data), ZSTD_INPUT_STEP_BYTES)
+        ]
+
+    def _count(self, chunk: bytes) -> bytes:
+        self.total += len(chunk)
+        if self.total > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Decompressed request body exceeds {self.max_bytes} bytes")
+        return chunk
+
+
+class RequestDecompressionMiddleware:
+    """Accepts ``Content-Encoding: gzip`` (and ``zstd`` when installed) request bodies
+
+    Bodies are decompressed as they are received, before FastAPI parses them,
+    and rejected with 413 past ``REQUEST_MAX_DECOMPRESSED_BYTES``. Other
+    codings get 415.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes or int(os.getenv("REQUEST_MAX_DECOMPRESSED_BYTES", 100 * 1024 * 1024))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = Headers(scope=scope).get("content-encoding", "identity").strip().lower()
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        if encoding not in SUPPORTED_ENCODINGS:
+            response = JSONResponse(
+                {"detail": f"Unsupported Content-Encoding: {encoding}"},
+                status_code=415,
+                headers={"Accept-Encoding": ", ".join(SUPPORTED_ENCODINGS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        decoder = BodyDecoder(encoding, self.max_bytes)
+        scope = dict(scope, headers=[
+            (name, value) for name, value in scope["headers"] if name not in (b"content-encoding", b"content-length")
+        ])
+
+        async def receive_decoded():
+            message = await receive()
+            if message["type"] == "http.request":
+                body = decoder.decode(message.get("body", b""), final=not message.get("more_body", False))
+                message = dict(message, body=body)
+            return message
+
+        await self.app(scope, receive_decoded, send)
+
+
+class ResponseCompressionMiddleware:
+    """Compresses complete responses of at least ``RESPONSE_COMPRESSION_MIN_BYTES``
+
+    The coding is negotiated from Accept-Encoding (zstd when installed, then
+    gzip). Only whole 200 responses of text-like types are compressed:
+    streamed responses such as SSE and NDJSON pass through untouched so
+    their events are not held back, as do ranges and already-encoded bodies.
+    A strong ETag becomes weak, since the bytes on the wire differ from the
+    identity representation.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows whether the response is complete
+                start_message = message
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if message.get("more_body", False) or not self._compressible(start_message["status"], headers, body):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start_message)
+            await send(dict(message, body=compressed))
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, status: int, headers: MutableHeaders, body: bytes) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            status == 200
+            and len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
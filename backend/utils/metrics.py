@@ -0,0 +1,156 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.asgi import UNMATCHED_ROUTE, route_template
+from utils.stage_timer import StageTimer, timed_request
+
+# prometheus_client is in requirements.txt; if it is missing, every recorder is a no-op and /metrics returns 503
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
+# Stages run from sub-millisecond (prompt assembly) to minutes (generation on long inputs)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+FILE_COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+
+_current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_endpoint", default=UNMATCHED_ROUTE)
+
+if METRICS_AVAILABLE:
+    registry = CollectorRegistry()
+    REQUESTS = Counter(
+        "mom_requests", "HTTP requests by route template and status code",
+        ["endpoint", "status"], registry=registry,
+    )
+    REQUEST_SECONDS = Histogram(
+        "mom_request_duration_seconds", "Time from the request arriving to the last response byte",
+        ["endpoint"], buckets=STAGE_BUCKETS, registry=registry,
+    )
+    STAGE_SECONDS = Histogram(
+        "mom_stage_duration_seconds", "Time one request spent in each pipeline stage",
+        ["endpoint", "stage"], buckets=STAGE_BUCKETS, registry=registry,
+    )
+    INPUT_BYTES = Counter(
+        "mom_input_bytes", "Request body bytes received, as sent on the wire",
+        ["endpoint"], registry=registry,
+    )
+    FILES = Histogram(
+        "mom_files_per_request", "Files in one generation request",
+        ["endpoint"], buckets=FILE_COUNT_BUCKETS, registry=registry,
+    )
+    TOKENS = Counter(
+        "mom_tokens", "Tokens reported in Gemini usage metadata",
+        ["endpoint", "kind"], registry=registry,
+    )
+    CACHE_LOOKUPS = Counter(
+        "mom_cache_lookups", "Cache lookups by cache and outcome",
+        ["endpoint", "cache", "result"], registry=registry,
+    )
+    ERRORS = Counter(
+        "mom_errors", "Failed generations by error class",
+        ["endpoint", "error"], registry=registry,
+    )
+
+
+def current_endpoint() -> str:
+    return _current_endpoint.get()
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[StageTimer]:
+    """Label metrics recorded within this block with ``endpoint`` and observe its stage timings on exit"""
+    token = _current_endpoint.set(endpoint)
+    try:
+        with timed_request() as timer:
+            yield timer
+    finally:
+        _current_endpoint.reset(token)
+        if METRICS_AVAILABLE:
+            for name, ms in timer.stages.items():
+                STAGE_SECONDS.labels(endpoint, name).observe(ms / 1000)
+
+
+def record_files(count: int) -> None:
+    if METRICS_AVAILABLE:
+        FILES.labels(current_endpoint()).observe(count)
+
+
+def record_tokens(usage: Dict[str, int]) -> None:
+    """Count the prompt, output and cached prompt tokens of one Gemini response"""
+    if not METRICS_AVAILABLE:
+        return
+    endpoint = current_endpoint()
+    for kind in ("prompt", "output", "cached_prompt"):
+        count = usage.get(f"{kind}_tokens") or 0
+        if count:
+            TOKENS.labels(endpoint, kind).inc(count)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    if METRICS_AVAILABLE:
+        CACHE_LOOKUPS.labels(current_endpoint(), cache, "hit" if hit else "miss").inc()
+
+
+def error_class(error: BaseException) -> str:
+    """Name of the exception behind an error, looking through the generic wrappers the services raise"""
+    while type(error) is Exception:
+        cause = error.__cause__ or error.__context__
+        if cause is None:
+            break
+        error = cause
+    return type(error).__name__
+
+
+def record_error(error: BaseException) -> None:
+    if METRICS_AVAILABLE:
+        ERRORS.labels(current_endpoint(), error_class(error)).inc()
+
+
+def metrics_payload() -> Optional[Tuple[bytes, str]]:
+    """The registry in the Prometheus text format and its content type, or None without prometheus_client"""
+    if not METRICS_AVAILABLE:
+        return None
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Times each request and labels everything recorded while it runs with its route template
+
+    Added outside the compression middlewares (only tracing wraps it), so
+    the duration covers decompression and the whole streamed body, and
+    input bytes are counted as received on the wire.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_template(scope)
+        status = 500
+        started = time.perf_counter()
+
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                INPUT_BYTES.labels(endpoint).inc(len(message.get("body", b"")))
+            return message
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            with track_request(endpoint):
+                await self.app(scope, receive_counted, send_with_status)
+        finally:
+            REQUESTS.labels(endpoint, str(status)).inc()
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
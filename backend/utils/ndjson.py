@@ -0,0 +1,7 @@
+import json
+from typing import Any
+
+
+def format_ndjson(data: Any) -> str:
+    """Format one newline-delimited JSON record"""
+    return f"{json.dumps(data)}\n"
@@ -0,0 +1,273 @@
+import contextvars
+import cProfile
+import hmac
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from io import StringIO
+from typing import Any, Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from utils.asgi import route_template
+
+# pyinstrument is optional (a sampling profiler); without it cProfile is used
+try:
+    from pyinstrument import Profiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+PROFILE_HEADER = "x-profile-token"
+
+# Routes that can be profiled: file extraction and export rendering
+PROFILED_ROUTES = (
+    "/api/process-images",
+    "/api/process-files",
+    "/api/download-mom/{format}",
+    "/api/mom/{mom_id}.{format}",
+)
+
+# Allocation sites listed in the memory report
+MEMORY_REPORT_TOP_N = 25
+
+_profiler: "contextvars.ContextVar[Optional[RequestProfiler]]" = contextvars.ContextVar("profiler", default=None)
+
+
+def current_profiler() -> "Optional[RequestProfiler]":
+    """The profiler of the current request, or None when it is not profiled"""
+    return _profiler.get()
+
+
+async def run_sync(func: Callable, *args: Any) -> Any:
+    """Run blocking work in the threadpool; in a profiled request, under the request's profiler there"""
+    profiler = current_profiler()
+    if profiler is not None:
+        return await run_in_threadpool(profiler.run, func, *args)
+    return await run_in_threadpool(func, *args)
+
+
+def memory_report(snapshot: "tracemalloc.Snapshot", peak_bytes: int, current_bytes: int, concurrent_requests: int = 0) -> str:
+    """Peak and current traced memory and the largest allocation sites still held, by line
+
+    The CPU profiler's own sample buffers are traced too; their size is
+    reported separately and they are left out of the site list. tracemalloc
+    traces the whole process, so the header says how many other requests
+    were in flight while the numbers were taken.
+    """
+    profiler_filters = (tracemalloc.Filter(True, "*pyinstrument*"), tracemalloc.Filter(True, cProfile.__file__))
+    profiler_bytes = sum(stat.size for stat in snapshot.filter_traces(profiler_filters).statistics("filename"))
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "*pyinstrument*"),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ))
+    lines = [
+        f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MB",
+        f"Held at the end of the request: {current_bytes / 1024 / 1024:.1f} MB",
+        f"  of which CPU profiler samples: {profiler_bytes / 1024 / 1024:.1f} MB",
+        f"Other requests in flight while profiling: {concurrent_requests}",
+        "Memory is traced process-wide: the figures include allocations made by those requests.",
+        "",
+        f"Top {MEMORY_REPORT_TOP_N} allocation sites held at the end of the request:",
+    ]
+    for index, stat in enumerate(snapshot.statistics("lineno")[:MEMORY_REPORT_TOP_N], start=1):
+        frame = stat.traceback[0]
+        lines.append(f"{index:3}. {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KB in {stat.count} blocks")
+    return "\n".join(lines) + "\n"
+
+
+class RequestProfiler:
+    """CPU and memory profile of one request
+
+    CPU time is sampled with pyinstrument (HTML report, async-aware) when it
+    is installed, otherwise traced with cProfile (pstats dump plus a text
+    summary). tracemalloc records the peak allocation and the allocation
+    sites still held when the request ends.
+
+    Both CPU profilers only see the thread they were started on. Blocking
+    work the request hands to a thread goes through ``run``, which profiles
+    it there with a profiler of its own. tracemalloc, and cProfile on the
+    event loop, cover every request running meanwhile; their number is kept
+    in ``concurrent_requests`` for the report headers.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.concurrent_requests = 0
+        self._cpu = None
+        self._threads: List[Any] = []
+        self._threads_lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        if PYINSTRUMENT_AVAILABLE:
+            self._cpu = Profiler(interval=self.interval, async_mode="enabled")
+            self._cpu.start()
+        else:
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+
+    def run(self, func: Callable, *args: Any) -> Any:
+        """Call ``func`` under a CPU profiler on the current thread, kept for the report"""
+        if PYINSTRUMENT_AVAILABLE:
+            profiler = Profiler(interval=self.interval, async_mode="disabled")
+            profiler.start()
+            try:
+                return func(*args)
+            finally:
+                profiler.stop()
+                with self._threads_lock:
+                    self._threads.append(profiler)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            with self._threads_lock:
+                self._threads.append(profiler)
+
+    def stop(self) -> Any:
+        """Stop both profilers; returns what ``write`` needs"""
+        if PYINSTRUMENT_AVAILABLE:
+            self._cpu.stop()
+        else:
+            self._cpu.disable()
+
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        return snapshot, peak_bytes, current_bytes
+
+    def write(self, path_prefix: str, snapshot: "tracemalloc.Snapshot", peak_bytes: int, current_bytes: int) -> None:
+        """Write ``<prefix>.html`` (or ``.prof`` and ``.txt``) and ``<prefix>-memory.txt``
+
+        pyinstrument reports for work run through ``run`` go to
+        ``<prefix>-thread-<n>.html``; cProfile stats are merged into one file.
+        """
+        if PYINSTRUMENT_AVAILABLE:
+            for index, profiler in enumerate([self._cpu] + self._threads):
+                suffix = f"-thread-{index}" if index else ""
+                with open(f"{path_prefix}{suffix}.html", "w", encoding="utf-8") as file_obj:
+                    file_obj.write(profiler.output_html())
+        else:
+            summary = StringIO()
+            stats = pstats.Stats(self._cpu, *self._threads, stream=summary)
+            stats.dump_stats(f"{path_prefix}.prof")
+            stats.sort_stats("cumulative").print_stats(40)
+            with open(f"{path_prefix}.txt", "w", encoding="utf-8") as file_obj:
+                file_obj.write(
+                    f"Other requests in flight while profiling: {self.concurrent_requests}\n"
+                    "Event-loop time is profiled process-wide and includes those requests.\n"
+                )
+                file_obj.write(summary.getvalue())
+
+        with open(f"{path_prefix}-memory.txt", "w", encoding="utf-8") as file_obj:
+            file_obj.write(memory_report(snapshot, peak_bytes, current_bytes, self.concurrent_requests))
+
+
+class ProfilingMiddleware:
+    """Profiles single extraction and export requests on demand
+
+    A request is profiled when it carries ``X-Profile-Token`` matching
+    ``PROFILE_ADMIN_TOKEN``, or every request to ``PROFILED_ROUTES`` when
+    ``PROFILE_REQUESTS=true``. Reports go to ``PROFILE_DIR`` and the
+    response names them in an ``X-Profile`` header. A wrong token gets
+    403; without ``PROFILE_ADMIN_TOKEN`` the header is rejected too.
+
+    One request is profiled at a time; others run normally meanwhile and
+    are counted into the profile's ``concurrent_requests``. The
+    profiled request's file extraction runs on a thread instead of the
+    process pool, and its rendering stays in the threadpool. Both are
+    profiled in their thread (``RequestProfiler.run``), so the profile shows
+    ``FileProcessor`` and ``FileConverter`` while the event loop keeps
+    serving other requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.admin_token = os.getenv("PROFILE_ADMIN_TOKEN", "")
+        self.profile_all = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+        self.profile_dir = os.getenv("PROFILE_DIR", "profiles")
+        self.interval = float(os.getenv("PROFILE_INTERVAL_SECONDS", 0.001))
+        self._lock = threading.Lock()
+        # Requests in flight, and the profile being recorded (both touched on the event loop only)
+        self._active = 0
+        self._current: Optional[RequestProfiler] = None
+
+    def _authorized(self, token: str) -> bool:
+        return bool(self.admin_token) and hmac.compare_digest(token.encode("utf-8"), self.admin_token.encode("utf-8"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self._active += 1
+        if self._current is not None:
+            self._current.concurrent_requests += 1
+        try:
+            await self._dispatch(scope, receive, send)
+        finally:
+            self._active -= 1
+
+    async def _dispatch(self, scope, receive, send) -> None:
+        token = Headers(scope=scope).get(PROFILE_HEADER)
+        if token is None and not self.profile_all:
+            await self.app(scope, receive, send)
+            return
+
+        if token is not None and not self._authorized(token):
+            response = JSONResponse({"detail": "Invalid profile token"}, status_code=403)
+            await response(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        if route not in PROFILED_ROUTES or not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(scope, receive, send, route)
+        finally:
+            self._lock.release()
+
+    async def _profile(self, scope, receive, send, route: str) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = route.strip("/").replace("/", "-").replace("{", "").replace("}", "")
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_name(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])["X-Profile"] = name
+            await send(message)
+
+        profiler = RequestProfiler(self.interval)
+        # Requests already running when profiling starts; later ones are added as they arrive
+        profiler.concurrent_requests = self._active - 1
+        self._current = profiler
+        token = _profiler.set(profiler)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            result = profiler.stop()
+            self._current = None
+            _profiler.reset(token)
+            try:
+                await run_in_threadpool(profiler.write, os.path.join(self.profile_dir, name), *result)
+            except Exception as e:
+                print(f"Failed to write profile {name}: {e}")
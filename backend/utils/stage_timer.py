@@ -0,0 +1,52 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from utils.tracing import tracing
+
+
+class StageTimer:
+    """Wall-clock time spent in each named stage of one request, in milliseconds"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(ms, 1) for name, ms in self.stages.items()}
+
+
+_current_timer: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar("stage_timer", default=None)
+
+
+@contextmanager
+def timed_request() -> Iterator[StageTimer]:
+    """Collect the stages run within this block into a new StageTimer"""
+    timer = StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[None]:
+    """Time a block as one stage of the current request and trace it as a span with ``attributes``
+
+    Timing is a no-op outside timed_request(), tracing when it is not configured.
+    """
+    with tracing.span(name, attributes):
+        timer = _current_timer.get()
+        if timer is None:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer.add(name, time.perf_counter() - started)
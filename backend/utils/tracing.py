@@ -0,0 +1,135 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# OpenTelemetry is an opt-in extra (see requirements.txt); without it, or with TRACING_EXPORTER=none, spans are no-ops
+try:
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
+
+from utils.asgi import route_template
+
+EXPORTER_NONE = "none"
+EXPORTER_FILE = "file"
+EXPORTER_OTLP = "otlp"
+
+
+def create_exporter(exporter: str, file_path: str):
+    """Span exporter for ``file`` (one JSON span per line) or ``otlp`` (OTLP over HTTP)"""
+    if exporter == EXPORTER_FILE:
+        return ConsoleSpanExporter(
+            out=open(file_path, "a", buffering=1, encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    if exporter == EXPORTER_OTLP:
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+
+
+class Tracing:
+    """Request tracing through OpenTelemetry, configured on first use
+
+    ``TRACING_EXPORTER`` selects ``none`` (default), ``file`` (JSON lines
+    appended to ``TRACING_FILE``) or ``otlp``. New traces are sampled at
+    ``TRACING_SAMPLE_RATE`` (0 to 1); requests arriving with a
+    ``traceparent`` follow the caller's sampling decision, so a trace
+    started by the frontend is kept or dropped as a whole. Export failures
+    to set up print a warning and leave tracing off.
+    """
+
+    def __init__(self, service_name: str = "mom-builder-backend"):
+        self.service_name = service_name
+        self._tracer = None
+        self._provider = None
+        self._configured = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._get_tracer() is not None
+
+    def _get_tracer(self):
+        if self._configured:
+            return self._tracer
+        with self._lock:
+            if not self._configured:
+                self._tracer = self._configure()
+                self._configured = True
+        return self._tracer
+
+    def _configure(self):
+        exporter_name = os.getenv("TRACING_EXPORTER", EXPORTER_NONE).lower()
+        if exporter_name == EXPORTER_NONE or not TRACING_AVAILABLE:
+            return None
+
+        try:
+            exporter = create_exporter(exporter_name, os.getenv("TRACING_FILE", "traces.jsonl"))
+        except Exception as e:
+            print(f"Warning: tracing disabled, could not create the {exporter_name} exporter: {e}")
+            return None
+
+        sample_rate = float(os.getenv("TRACING_SAMPLE_RATE", 1.0))
+        resource = Resource.create({SERVICE_NAME: os.getenv("OTEL_SERVICE_NAME", self.service_name)})
+        self._provider = TracerProvider(resource=resource, sampler=ParentBased(TraceIdRatioBased(sample_rate)))
+        self._provider.add_span_processor(BatchSpanProcessor(exporter))
+        return self._provider.get_tracer(__name__)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind=None, context=None) -> Iterator[Any]:
+        """Run a block in a span that is a child of the current one; yields None when tracing is off"""
+        tracer = self._get_tracer()
+        if tracer is None:
+            yield None
+            return
+
+        attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+        with tracer.start_as_current_span(name, context=context, kind=kind or SpanKind.INTERNAL, attributes=attributes) as span:
+            yield span
+
+    def shutdown(self) -> None:
+        """Export the spans still buffered"""
+        if self._provider is not None:
+            self._provider.shutdown()
+
+
+tracing = Tracing()
+
+
+class TracingMiddleware:
+    """Opens a server span per request, continuing the trace from an incoming ``traceparent``
+
+    Stage spans (see ``utils.stage_timer.stage``) started while the request
+    runs become its children.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        carrier = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        attributes = {"http.method": scope["method"], "http.route": route, "http.target": scope["path"]}
+
+        with tracing.span(f"{scope['method']} {route}", attributes, kind=SpanKind.SERVER, context=extract(carrier)) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
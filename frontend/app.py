@@ -1,8 +1,22 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context, g
 import requests
+from requests.adapters import HTTPAdapter
+import gzip
 import os
 from dotenv import load_dotenv
-import json
+
+# Request tracing is an opt-in extra: see the commented OpenTelemetry lines in requirements.txt
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract, inject
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +27,93 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 # Backend API URL
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8000')
 
+# Backend timeouts in seconds: (connect, read)
+BACKEND_TIMEOUT = (
+    float(os.getenv('BACKEND_CONNECT_TIMEOUT', 5)),
+    float(os.getenv('BACKEND_READ_TIMEOUT', 120))
+)
+
+# Request headers forwarded to the backend as-is
+FORWARDED_REQUEST_HEADERS = ['Content-Type', 'Content-Encoding', 'Accept', 'Accept-Encoding', 'If-None-Match', 'Range', 'If-Range', 'traceparent', 'tracestate', 'X-Profile-Token']
+
+# Responses of the frontend's own pages and assets at least this large are gzipped
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Response headers relayed back to the browser as-is
+FORWARDED_RESPONSE_HEADERS = ['Content-Type', 'Content-Length', 'Content-Encoding', 'Content-Disposition', 'Cache-Control', 'X-Accel-Buffering', 'Location', 'ETag', 'Accept-Ranges', 'Content-Range', 'X-Profile']
+
+def create_backend_session():
+    """Shared HTTP session with a keep-alive connection pool to the backend"""
+    pool_size = int(os.getenv('BACKEND_POOL_SIZE', 32))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+backend_session = create_backend_session()
+
+def create_tracer():
+    """Tracer for proxied API requests, or None when tracing is off
+    
+    Uses the backend's settings: ``TRACING_EXPORTER`` (none, file or otlp),
+    ``TRACING_FILE`` and ``TRACING_SAMPLE_RATE``.
+    """
+    exporter_name = os.getenv('TRACING_EXPORTER', 'none').lower()
+    if exporter_name == 'none' or not TRACING_AVAILABLE:
+        return None
+    
+    try:
+        if exporter_name == 'file':
+            exporter = ConsoleSpanExporter(
+                out=open(os.getenv('TRACING_FILE', 'traces.jsonl'), 'a', buffering=1, encoding='utf-8'),
+                formatter=lambda span: span.to_json(indent=None) + '\n'
+            )
+        elif exporter_name == 'otlp':
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            raise ValueError(f"Unknown TRACING_EXPORTER: {exporter_name}")
+    except Exception as e:
+        print(f"Warning: tracing disabled, could not create the {exporter_name} exporter: {e}")
+        return None
+    
+    sample_rate = float(os.getenv('TRACING_SAMPLE_RATE', 1.0))
+    resource = Resource.create({SERVICE_NAME: os.getenv('OTEL_SERVICE_NAME', 'mom-builder-frontend')})
+    provider = TracerProvider(resource=resource, sampler=ParentBased(TraceIdRatioBased(sample_rate)))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    return provider.get_tracer(__name__)
+
+tracer = create_tracer()
+
+class RequestBodyStream:
+    """File-like view of the incoming request body with a known length
+    
+    Lets ``requests`` send a Content-Length header and stream the body in
+    blocks instead of reading it into memory or falling back to chunked
+    transfer encoding.
+    """
+    
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.len = length
+    
+    def __len__(self):
+        return self.len
+    
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+def request_body():
+    """Streaming body to forward to the backend, or None when the request has none"""
+    if request.content_length:
+        return RequestBodyStream(request.stream, request.content_length)
+    if request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        # Unknown length: requests sends a generator with chunked encoding
+        return iter(lambda: request.stream.read(8192), b'')
+    return None
+
 @app.route('/')
 def index():
     """Main page with text and image input options"""
@@ -39,112 +140,125 @@ def serve_assets(filename):
     except Exception as e:
         return jsonify({'error': f'Error serving asset: {str(e)}'}), 500
 
-@app.route('/api/process-text', methods=['POST'])
-def process_text():
-    """Process text input via backend API"""
+def proxy_to_backend(path, error_message):
+    """Stream the raw request body to the backend and stream its response back
+    
+    The body is never parsed or re-serialized here; validation happens in the
+    backend. Error responses are translated to the frontend's ``{'error': ...}``
+    format.
+    """
     try:
-        data = request.get_json()
-        
-        if not data or 'text' not in data:
-            return jsonify({'error': 'Text input is required'}), 400
+        headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+        if g.get('span') is not None:
+            # The backend's spans continue this request's trace
+            inject(headers, context=trace.set_span_in_context(g.span))
         
-        # Forward request to FastAPI backend
-        response = requests.post(
-            f"{BACKEND_URL}/api/process-text",
-            json={'text': data['text']},
-            headers={'Content-Type': 'application/json'}
+        response = backend_session.request(
+            request.method,
+            f"{BACKEND_URL}{path}",
+            data=request_body(),
+            headers=headers,
+            params=request.args,
+            stream=True,
+            timeout=BACKEND_TIMEOUT
         )
         
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            error_data = response.json() if response.headers.get('content-type') == 'application/json' else {'detail': 'Unknown error'}
-            return jsonify({'error': error_data.get('detail', 'Failed to process text')}), response.status_code
-            
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Backend connection error: {str(e)}'}), 500
-    except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
-
-@app.route('/api/process-images', methods=['POST'])
-def process_images():
-    """Process image inputs via backend API"""
-    try:
-        data = request.get_json()
+        if response.status_code >= 400:
+            return backend_error(response, error_message)
         
-        if not data or 'images' not in data:
-            return jsonify({'error': 'Images are required'}), 400
-        
-        if not isinstance(data['images'], list) or len(data['images']) == 0:
-            return jsonify({'error': 'At least one image is required'}), 400
-        
-        if len(data['images']) > 10:
-            return jsonify({'error': 'Maximum 10 images allowed'}), 400
+        def generate():
+            try:
+                # raw.stream keeps the backend's encoding; chunks are relayed as they arrive
+                for chunk in response.raw.stream(8192, decode_content=False):
+                    yield chunk
+            finally:
+                response.close()
         
-        # Forward request to FastAPI backend
-        response = requests.post(
-            f"{BACKEND_URL}/api/process-images",
-            json={'images': data['images']},
-            headers={'Content-Type': 'application/json'}
+        return Response(
+            stream_with_context(generate()),
+            status=response.status_code,
+            headers={name: response.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in response.headers},
+            direct_passthrough=True
         )
-        
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            error_data = response.json() if response.headers.get('content-type') == 'application/json' else {'detail': 'Unknown error'}
-            return jsonify({'error': error_data.get('detail', 'Failed to process images')}), response.status_code
             
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Backend connection error: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+def backend_error(response, error_message):
+    """Translate a backend error response into the frontend error format"""
+    try:
+        detail = response.json().get('detail') if 'application/json' in response.headers.get('content-type', '') else None
+    except ValueError:
+        detail = None
+    finally:
+        response.close()
+    
+    # Validation errors come back as a list of problems
+    if not isinstance(detail, str):
+        detail = error_message
+    
+    # Tells clients when to retry after a 503 from a full queue
+    headers = {'Retry-After': response.headers['Retry-After']} if 'Retry-After' in response.headers else {}
+    return jsonify({'error': detail}), response.status_code, headers
+
+@app.route('/api/process-text', methods=['POST'])
+def process_text():
+    """Process text input via backend API"""
+    return proxy_to_backend('/api/process-text', 'Failed to process text')
+
+@app.route('/api/process-images', methods=['POST'])
+def process_images():
+    """Process base64 file inputs via backend API"""
+    return proxy_to_backend('/api/process-images', 'Failed to process images')
+
+@app.route('/api/process-files', methods=['POST'])
+def process_files():
+    """Process multipart file uploads via backend API"""
+    return proxy_to_backend('/api/process-files', 'Failed to process files')
+
+@app.route('/api/process-text/stream', methods=['POST'])
+def process_text_stream():
+    """Stream MOM generation for text input from the backend as Server-Sent Events"""
+    return proxy_to_backend('/api/process-text/stream', 'Failed to generate MOM')
+
+@app.route('/api/process-files/stream', methods=['POST'])
+def process_files_stream():
+    """Stream MOM generation for multipart file uploads from the backend as Server-Sent Events"""
+    return proxy_to_backend('/api/process-files/stream', 'Failed to generate MOM')
+
+@app.route('/api/batch', methods=['POST'])
+def process_batch():
+    """Stream batch MOM generation results from the backend as NDJSON"""
+    return proxy_to_backend('/api/batch', 'Failed to process batch')
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue background MOM generation via backend API"""
+    return proxy_to_backend('/api/jobs', 'Failed to create job')
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a background MOM generation job via backend API"""
+    return proxy_to_backend(f'/api/jobs/{job_id}', 'Failed to get job status')
+
 @app.route('/api/download-mom/<format>', methods=['POST'])
 def download_mom(format):
     """Download MOM in specified format via backend API"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'content' not in data:
-            return jsonify({'error': 'Content is required'}), 400
-        
-        # Forward request to FastAPI backend
-        response = requests.post(
-            f"{BACKEND_URL}/api/download-mom/{format}",
-            json=data,
-            headers={'Content-Type': 'application/json'},
-            stream=True
-        )
-        
-        if response.status_code == 200:
-            # Forward the file response
-            def generate():
-                for chunk in response.iter_content(chunk_size=8192):
-                    yield chunk
-            
-            # Get filename from backend response headers
-            content_disposition = response.headers.get('Content-Disposition', '')
-            
-            return Response(
-                generate(),
-                mimetype=response.headers.get('Content-Type'),
-                headers={'Content-Disposition': content_disposition}
-            )
-        else:
-            error_data = response.json() if response.headers.get('content-type') == 'application/json' else {'detail': 'Unknown error'}
-            return jsonify({'error': error_data.get('detail', f'Failed to download {format} file')}), response.status_code
-            
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Backend connection error: {str(e)}'}), 500
-    except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    return proxy_to_backend(f'/api/download-mom/{format}', f'Failed to download {format} file')
+
+@app.route('/api/mom/<mom_file>', methods=['GET'])
+def get_mom(mom_file):
+    """Download a stored MOM by id (``<id>.<format>``) via backend API"""
+    return proxy_to_backend(f'/api/mom/{mom_file}', 'Failed to download MOM')
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
     try:
         # Check backend health
-        response = requests.get(f"{BACKEND_URL}/api/health", timeout=5)
+        response = backend_session.get(f"{BACKEND_URL}/api/health", timeout=(BACKEND_TIMEOUT[0], 5))
         backend_status = response.status_code == 200
     except:
         backend_status = False
@@ -156,6 +270,71 @@ def health():
         'service': 'MOM Builder Free Frontend'
     })
 
+@app.before_request
+def start_span():
+    """Trace each proxied API request, continuing the caller's trace when it sent a traceparent
+    
+    Streamed responses keep the request context until the last chunk is
+    relayed, so the span covers the whole stream.
+    """
+    if tracer is None or not request.path.startswith('/api/'):
+        return
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.span = tracer.start_span(
+        f"{request.method} {route}",
+        context=extract(request.headers),
+        kind=SpanKind.SERVER,
+        attributes={'http.method': request.method, 'http.route': route, 'http.target': request.path}
+    )
+
+@app.after_request
+def record_span_status(response):
+    span = g.get('span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+    return response
+
+@app.teardown_request
+def end_span(error):
+    span = g.pop('span', None)
+    if span is not None:
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+@app.after_request
+def compress_response(response):
+    """Gzip the frontend's own pages and assets when the browser accepts it
+    
+    API responses are proxied with the backend's own encoding (request
+    bodies are forwarded compressed too, and decompressed by the backend),
+    so they are left alone here.
+    """
+    if (request.path.startswith('/api/')
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE_TYPES)
+            or not request.accept_encodings['gzip']):
+        return response
+    
+    # Static files are sent as file wrappers; read them so they can be compressed
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The bytes sent differ from the uncompressed file
+        response.set_etag(etag, weak=True)
+    return response
+
 @app.errorhandler(404)
 def not_found(error):
     return render_template('404.html'), 404
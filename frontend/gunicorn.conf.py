@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration for the Flask frontend
+
+The frontend is an I/O-bound proxy, so threaded workers let each process hold
+many concurrent backend requests (including long-lived SSE streams) open.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+
+# Long enough for a full MOM generation behind the backend read timeout
+timeout = int(float(os.getenv("BACKEND_READ_TIMEOUT", 120))) + 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -6,6 +6,7 @@ class MOMBuilder {
         this.uploadedImages = [];
         this.isProcessing = false;
         this.currentMOMContent = '';
+        this.currentMOMId = null;
         
         this.initializeEventListeners();
     }
@@ -90,21 +91,10 @@ class MOMBuilder {
         this.hideError();
         
         try {
-            const response = await fetch('/api/process-text', {
+            await this.streamMOM('/api/process-text/stream', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ text })
-            });
-            
-            const data = await response.json();
-            
-            if (response.ok && data.success) {
-                this.displayMOM(data.data.content);
-            } else {
-                this.showError(data.error || 'Failed to process text');
-            }
+                ...await this.jsonBody({ text })
+            }, 'Failed to process text');
         } catch (error) {
             console.error('Error processing text:', error);
             this.showError('Network error. Please check your connection and try again.');
@@ -123,23 +113,14 @@ class MOMBuilder {
         this.hideError();
         
         try {
-            const imageStrings = this.uploadedImages.map(img => img.dataUrl);
+            // Send the original files as multipart parts instead of base64 JSON
+            const formData = new FormData();
+            this.uploadedImages.forEach(img => formData.append('files', img.file, img.name));
             
-            const response = await fetch('/api/process-images', {
+            await this.streamMOM('/api/process-files/stream', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ images: imageStrings })
-            });
-            
-            const data = await response.json();
-            
-            if (response.ok && data.success) {
-                this.displayMOM(data.data.content);
-            } else {
-                this.showError(data.error || 'Failed to process images');
-            }
+                body: formData
+            }, 'Failed to process images');
         } catch (error) {
             console.error('Error processing images:', error);
             this.showError('Network error. Please check your connection and try again.');
@@ -215,22 +196,17 @@ class MOMBuilder {
                 };
                 reader.readAsDataURL(file);
             } else {
-                // Handle documents (base64 for transmission)
-                const reader = new FileReader();
-                reader.onload = (e) => {
-                    const fileData = {
-                        id: Math.random().toString(36).substr(2, 9),
-                        file: file,
-                        dataUrl: e.target.result,
-                        type: this.getFileType(file),
-                        name: file.name,
-                        size: this.formatFileSize(file.size)
-                    };
-                    
-                    this.uploadedImages.push(fileData);
-                    this.updateImagePreview();
+                // Handle documents (sent as-is in the multipart upload)
+                const fileData = {
+                    id: Math.random().toString(36).substr(2, 9),
+                    file: file,
+                    type: this.getFileType(file),
+                    name: file.name,
+                    size: this.formatFileSize(file.size)
                 };
-                reader.readAsDataURL(file);
+                
+                this.uploadedImages.push(fileData);
+                this.updateImagePreview();
             }
         });
     }
@@ -328,8 +304,65 @@ class MOMBuilder {
         this.updateImagePreview();
     }
 
-    displayMOM(content) {
+    async streamMOM(url, options, errorMessage) {
+        // Render the MOM progressively from the backend's Server-Sent Events
+        const response = await fetch(url, options);
+        
+        if (!response.ok || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            this.showError(data.error || errorMessage);
+            return;
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let content = '';
+        let started = false;
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            
+            for (const rawEvent of events) {
+                const event = this.parseServerSentEvent(rawEvent);
+                if (!event) continue;
+                
+                if (event.type === 'chunk') {
+                    content += event.data.text;
+                    this.displayMOM(content, !started);
+                    started = true;
+                } else if (event.type === 'done') {
+                    this.displayMOM(event.data.content, !started, event.data.mom_id);
+                    started = true;
+                } else if (event.type === 'error') {
+                    this.showError(event.data.detail || errorMessage);
+                }
+            }
+        }
+    }
+    
+    parseServerSentEvent(rawEvent) {
+        let type = 'message';
+        const dataLines = [];
+        
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) type = line.slice(6).trim();
+            else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+        });
+        
+        if (dataLines.length === 0) return null;
+        return { type, data: JSON.parse(dataLines.join('\n')) };
+    }
+
+    displayMOM(content, scroll = true, momId = null) {
         this.currentMOMContent = content;
+        // Set once generation finishes; downloads then fetch the stored MOM by id
+        this.currentMOMId = momId;
         
         const container = document.getElementById('mom-container');
         const contentDiv = document.getElementById('mom-content');
@@ -340,7 +373,9 @@ class MOMBuilder {
         container.classList.remove('hidden');
         
         // Scroll to MOM section
-        container.scrollIntoView({ behavior: 'smooth' });
+        if (scroll) {
+            container.scrollIntoView({ behavior: 'smooth' });
+        }
     }
 
     toggleDownloadDropdown() {
@@ -402,16 +437,7 @@ class MOMBuilder {
         } else {
             // For txt and docx, call backend API
             try {
-                const response = await fetch(`/api/download-mom/${format}`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ 
-                        content: this.currentMOMContent,
-                        filename: agendaHeading
-                    })
-                });
+                const response = await this.fetchDownload(format, agendaHeading);
                 
                 if (response.ok) {
                     const blob = await response.blob();
@@ -436,6 +462,38 @@ class MOMBuilder {
         }
     }
 
+    async fetchDownload(format, agendaHeading) {
+        // Stored MOMs are fetched by id: no upload, and repeat downloads are served from cache
+        if (this.currentMOMId) {
+            const params = new URLSearchParams({ filename: agendaHeading });
+            const response = await fetch(`/api/mom/${this.currentMOMId}.${format}?${params}`);
+            if (response.status !== 404) return response;
+        }
+        
+        // Not stored, or expired: send the content to be converted
+        return fetch(`/api/download-mom/${format}`, {
+            method: 'POST',
+            ...await this.jsonBody({ 
+                content: this.currentMOMContent,
+                filename: agendaHeading
+            })
+        });
+    }
+
+    async jsonBody(data) {
+        // Long transcripts shrink several times over with gzip; the backend decompresses them
+        const json = JSON.stringify(data);
+        if (json.length < 8192 || typeof CompressionStream === 'undefined') {
+            return { headers: { 'Content-Type': 'application/json' }, body: json };
+        }
+        
+        const compressed = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+        return {
+            headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+            body: await new Response(compressed).blob()
+        };
+    }
+
     setProcessing(processing) {
         this.isProcessing = processing;
         